@@ -1,6 +1,7 @@
 from flask import Blueprint
 from flask_restx import Api
 
+from apis.namespaces.v1.admin import api as admin_ns
 from apis.namespaces.v1.vehicles import api as vehicles_ns
 
 
@@ -13,3 +14,4 @@ api = Api(
 )
 
 api.add_namespace(vehicles_ns)
+api.add_namespace(admin_ns)
@@ -0,0 +1,146 @@
+import flask
+import functools
+
+from flask_restx import Namespace, Resource, fields
+from http.client import responses
+
+from dal.result_cache import result_cache
+from dal.slow_query_log import slow_query_log
+from helpers.validation_helper import validate
+
+
+def no_store(view):
+    """
+    Admin responses, and the 403s in front of them, must not be kept by a shared cache.
+    """
+
+    @functools.wraps(view)
+    def inner(*args, **kwargs):
+        response = flask.make_response(view(*args, **kwargs))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    return inner
+
+
+api = Namespace(
+    "admin",
+    "Operational statistics, requires the `X-Admin-Token` header",
+    path="/admin",
+    decorators=[no_store],
+)
+
+forbidden_model = api.model(
+    "ForbiddenResult",
+    {
+        "message": fields.String(
+            "Admin token missing or invalid.", description="Details about the error."
+        )
+    },
+)
+
+cache_stats_model = api.model(
+    "ResultCacheStats",
+    {
+        "enabled": fields.Boolean(description="Whether results are cached."),
+        "entries": fields.Integer(description="Number of cached result sets."),
+        "bytes": fields.Integer(
+            description="Estimated size of the cached result sets."
+        ),
+        "max_entries": fields.Integer(
+            description="Maximum number of cached result sets."
+        ),
+        "max_bytes": fields.Integer(description="Maximum estimated size of the cache."),
+        "ttl_seconds": fields.Float(description="Seconds a result set stays cached."),
+        "hits": fields.Integer(description="Lookups served from the cache."),
+        "misses": fields.Integer(description="Lookups that went to the database."),
+        "evictions": fields.Integer(
+            description="Entries evicted to stay within bounds."
+        ),
+        "expirations": fields.Integer(description="Entries dropped after their TTL."),
+        "invalidations": fields.Integer(
+            description="Times the cache was cleared by a data change."
+        ),
+    },
+)
+
+fingerprint_model = api.model(
+    "QueryFingerprintStats",
+    {
+        "fingerprint": fields.String(
+            description="Hash of the vehicle, filter shape and sort of the queries."
+        ),
+        "vehicle": fields.String(description="Vehicle queried."),
+        "shape": fields.Raw(
+            description="Table, column, operator and constraint operators per filter."
+        ),
+        "sort": fields.String(description="Sort field and order, empty when unsorted."),
+        "sql": fields.String(description="SQL of the first query, without values."),
+        "count": fields.Integer(description="Queries executed."),
+        "slow": fields.Integer(description="Queries over the slow query threshold."),
+        "total_seconds": fields.Float(description="Time spent in all queries."),
+        "p50_seconds": fields.Float(description="Median latency of recent queries."),
+        "p95_seconds": fields.Float(
+            description="95th percentile latency of recent queries."
+        ),
+        "max_seconds": fields.Float(description="Slowest query."),
+        "rows": fields.Integer(description="Rows returned by all queries."),
+        "mean_rows": fields.Float(description="Rows returned per query."),
+        "max_rows": fields.Integer(description="Most rows returned by a query."),
+    },
+)
+
+query_stats_model = api.model(
+    "QueryStats",
+    {
+        "threshold_seconds": fields.Float(
+            description="Queries taking at least this long are logged."
+        ),
+        "sample_rate": fields.Float(
+            description="Fraction of the other queries that are logged."
+        ),
+        "max_fingerprints": fields.Integer(
+            description="Maximum number of fingerprints tracked."
+        ),
+        "dropped": fields.Integer(
+            description="Queries not aggregated because max_fingerprints was reached."
+        ),
+        "fingerprints": fields.List(
+            fields.Nested(fingerprint_model),
+            description="Statistics per fingerprint, most total time first.",
+        ),
+    },
+)
+
+
+@api.route("/cache")
+@api.response(403, responses[403], model=forbidden_model)
+class ResultCacheResource(Resource):
+    @api.response(200, responses[200], model=cache_stats_model)
+    @validate.admin_authorized()
+    def get(self):
+        """
+        Result cache statistics
+        """
+        return result_cache.stats()
+
+
+@api.route("/queries")
+@api.response(403, responses[403], model=forbidden_model)
+class QueryStatsResource(Resource):
+    @api.response(200, responses[200], model=query_stats_model)
+    @validate.admin_authorized()
+    def get(self):
+        """
+        Latency and rows per query fingerprint, queries that differ only in their values share a fingerprint
+        """
+        return slow_query_log.stats()
+
+    @api.response(204, responses[204])
+    @validate.admin_authorized()
+    def delete(self):
+        """
+        Clears the query statistics
+        """
+        slow_query_log.reset()
+        return None, 204
@@ -1,3 +1,9 @@
+from flask_restx import inputs
+
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+
 def get_query_parser(api):
     parser = api.parser()
     parser.add_argument(
@@ -28,4 +34,95 @@ def get_query_parser(api):
         trim=True,
     )
 
+    parser.add_argument(
+        "fields",
+        type=str,
+        help="Comma separated fields to return, e.g. `model,year`. No fields returns every field",
+        location="args",
+        required=False,
+        trim=True,
+    )
+
+    parser.add_argument(
+        "limit",
+        type=inputs.int_range(1, MAX_PAGE_SIZE),
+        help=f"Maximum number of records to return (1-{MAX_PAGE_SIZE}). No limit returns all records",
+        location="args",
+        required=False,
+    )
+
+    parser.add_argument(
+        "cursor",
+        type=str,
+        help="Opaque cursor from a previous response, returns the page after it. Requires limit",
+        location="args",
+        required=False,
+        trim=True,
+    )
+
+    parser.add_argument(
+        "stream",
+        type=inputs.boolean,
+        help="Stream all matching records as newline delimited JSON, same as `Accept: application/x-ndjson`",
+        location="args",
+        required=False,
+        default=False,
+    )
+
+    parser.add_argument(
+        "format",
+        type=str,
+        help="Shape of the results, an object per record or an array per field",
+        location="args",
+        required=False,
+        trim=True,
+        choices=["rows", "columnar"],
+        default="rows",
+    )
+
+    return parser
+
+
+def get_aggregate_parser(api):
+    parser = api.parser()
+    parser.add_argument(
+        "query",
+        type=str,
+        help="JSON object containing query constraints, see above for examples. No query aggregates all records",
+        location="args",
+        required=False,
+        trim=True,
+    )
+
+    parser.add_argument(
+        "group_by",
+        type=str,
+        help="Comma separated fields to group on, e.g. `make,year`. No group_by aggregates all matching records",
+        location="args",
+        required=False,
+        trim=True,
+    )
+
+    parser.add_argument(
+        "metrics",
+        type=str,
+        help="Comma separated metrics, `count` or `min`, `max`, `avg` or `sum` of a numeric field, e.g. `count,avg(horsepower)`. Defaults to `count`",
+        location="args",
+        required=False,
+        trim=True,
+    )
+
+    return parser
+
+
+def get_bulk_parser(api):
+    parser = api.parser()
+    parser.add_argument(
+        "batch_size",
+        type=inputs.int_range(1, MAX_BATCH_SIZE),
+        help=f"Number of records validated and committed together (1-{MAX_BATCH_SIZE})",
+        location="args",
+        required=False,
+    )
+
     return parser
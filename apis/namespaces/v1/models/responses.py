@@ -7,11 +7,74 @@ def get_query_result(api, result_object_name: str, result_model):
         {
             "results": fields.List(
                 fields.Nested(api.model(result_object_name, result_model)),
-                description=f"List of {result_object_name} objects",
+                description=f"List of {result_object_name} objects, with only the requested fields when fields was supplied",
             ),
             "count": fields.Integer(
                 1, description=f"Number of {result_object_name} in the results list"
             ),
+            "cursor": fields.String(
+                description="Cursor for the next page, only present when limit was supplied. Null on the last page"
+            ),
+            "debug": fields.Raw(
+                description="Query engine, EXPLAIN ANALYZE plan and rows examined, only present for debug requests"
+            ),
+        },
+    )
+
+
+def get_aggregate_result(api):
+    return api.model(
+        "AggregateResult",
+        {
+            "results": fields.List(
+                fields.Raw,
+                description="A record per group with its group_by fields and metrics, metrics are named `count` or `<metric>_<field>`, e.g. `avg_horsepower`",
+            ),
+            "count": fields.Integer(
+                1, description="Number of groups in the results list"
+            ),
+        },
+    )
+
+
+def get_bulk_result(api):
+    record_error = api.model(
+        "RecordError",
+        {
+            "record": fields.Integer(
+                0, description="Position of the record in the request body."
+            ),
+            "field": fields.String("year", description="Field that was rejected."),
+            "message": fields.String(description="Why the record was rejected."),
+        },
+    )
+    counts = {
+        "received": fields.Integer(description="Number of records read."),
+        "inserted": fields.Integer(description="Number of new records written."),
+        "duplicates": fields.Integer(
+            description="Number of valid records that were already present."
+        ),
+        "rejected": fields.Integer(description="Number of invalid records."),
+    }
+    batch = api.model(
+        "BatchResult",
+        {
+            "batch": fields.Integer(0, description="Position of the batch."),
+            **counts,
+            "errors": fields.List(
+                fields.Nested(record_error),
+                description="Errors of the rejected records, at most the first 100 per batch",
+            ),
+            "seconds": fields.Float(description="Time taken to write the batch."),
+        },
+    )
+    return api.model(
+        "BulkResult",
+        {
+            **counts,
+            "batches": fields.List(
+                fields.Nested(batch), description="Results of each committed batch"
+            ),
         },
     )
 
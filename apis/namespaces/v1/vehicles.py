@@ -1,8 +1,11 @@
 import flask
+import hashlib
 
-from typing import Optional
+from datetime import datetime
+from typing import Callable, Iterator, Optional
 from json import loads
 from flask_restx import Namespace, Resource
+from werkzeug.http import is_resource_modified
 from http.client import responses
 
 from sample_data.payloads import (
@@ -15,24 +18,59 @@ from sample_data.payloads import (
     spaceship_manufacturer_and_year
 )
 
-from apis.namespaces.v1.models.requests import get_query_parser
+from apis.namespaces.v1.models.requests import (
+    get_aggregate_parser,
+    get_bulk_parser,
+    get_query_parser,
+)
 from apis.namespaces.v1.models.responses import (
+    get_aggregate_result,
+    get_bulk_result,
     get_query_result,
     get_validation_result,
     get_unhandled_error,
 )
 from dal.models.dimensions import Manufacturer, Model
 from dal.models.facts import Spaceship, Car, Bike
-from dal.mysql import MySQLDal
-from helpers.parsing_helper import parse
-from helpers.validation_helper import validate
+from dal.columnar import ColumnarDal
+from dal.data_version import Version
+from dal.ingestion import JsonReadError
+from dal.mysql import BatchReport, MySQLDal, rows_examined
+from dal.pagination import Cursor
+from dal.query_compiler import Aggregation, CompiledQuery
+from dal.rows import Rows
+from helpers.compression_helper import compression
+from helpers.config_helper import config
+from helpers.metrics_helper import query_operators, result_rows
+from helpers.parsing_helper import JSON_MIMETYPE, NDJSON_MIMETYPE, parse
+from helpers.serialization_helper import (
+    ARROW_STREAM_MIMETYPE,
+    DEFAULT_SEPARATORS,
+    ResponseFormat,
+    RowEncoder,
+    arrow_stream,
+    format_response,
+)
+from helpers.timing_helper import timing
+from helpers.validation_helper import is_debug_request, validate
 
 api = Namespace("vehicles", "Vehicles", path="/vehicles")
 
 query_parser = get_query_parser(api)
+bulk_parser = get_bulk_parser(api)
+aggregate_parser = get_aggregate_parser(api)
 error_model = get_unhandled_error(api)
+bulk_result_model = get_bulk_result(api)
+aggregate_result_model = get_aggregate_result(api)
+
+# rejected records listed per batch, the counts always cover every record
+MAX_REPORTED_ERRORS = 100
+JSON_FORMAT = ResponseFormat(JSON_MIMETYPE)
 
 dal = MySQLDal()
+engine = (
+    ColumnarDal(dal) if config.get_str("VQE_QUERY_ENGINE", "mysql") == "columnar" else dal
+)
 
 shared_description = """
 ## Supported Functionality
@@ -57,6 +95,80 @@ shared_description = """
 - in
 - notIn
 
+### Fields
+
+Supply `fields` with a comma separated list, e.g. `fields=model,year`, to receive only those fields of every record.
+Fewer fields are read and written, and the manufacturer and model tables are not joined when no field, query or
+`sort_field` needs them. Every field of the models below is optional for this reason.
+
+### Pagination
+
+Supply `limit` to receive at most that many records along with a `cursor`.
+Pass the `cursor` back with the same `query`, `sort_field` and `sort_order` to receive the next page.
+A `cursor` of `null` means there are no further pages.
+
+### Streaming
+
+Supply `stream=true` or `Accept: application/x-ndjson` to receive every matching record as newline delimited JSON.
+Records are written as they are read from the database, so large result sets start arriving immediately.
+
+### Formats
+
+Supply `format=columnar` to receive `results` as one array of values per field instead of an object per record,
+so field names are not repeated on every record.
+
+Send `Accept: application/msgpack` to receive the same body as MessagePack, in either format, or
+`Accept: application/vnd.apache.arrow.stream` to receive the records as an Arrow IPC stream with `count`,
+`cursor` and `debug` as JSON in the schema metadata. Arrow responses can be streamed with `stream=true`, a
+record batch is written per chunk read from the database. Decimal fields are strings in JSON and MessagePack and
+decimals in Arrow.
+
+### Compression
+
+Responses, including streams, are compressed with `zstd`, `br` or `gzip` when the `Accept-Encoding` header allows it.
+
+### Caching
+
+Responses carry an `ETag` and `Last-Modified` that change whenever vehicles are loaded. Send them back in
+`If-None-Match` or `If-Modified-Since` to receive a `304 Not Modified` without the query being run.
+Streams may span a load, so they only carry a weak `ETag` and must not be stored by caches.
+
+### Debugging
+
+Admin requests with the `X-Debug: explain` header receive a `debug` object with the `EXPLAIN ANALYZE` plan of the
+query, without pagination, and the number of rows it examined. Setting `VQE_SERVER_TIMING` adds a `Server-Timing`
+header with the time spent in each phase of the request.
+
+"""
+bulk_description = """
+## Bulk Loading
+
+`POST` vehicles as a JSON array (`Content-Type: application/json`) or as newline delimited JSON
+(`Content-Type: application/x-ndjson`), using the same fields the query endpoint returns.
+Requires the `X-Admin-Token` header.
+
+The body is read as it arrives and written in batches of `batch_size` records, each batch in a single transaction.
+Invalid records are rejected individually and reported with their position in the body, the rest of their batch is still written.
+Records that are already present are counted as duplicates.
+
+A malformed body stops reading with a 400, batches before it have already been committed and are reported.
+"""
+aggregate_description = """
+## Aggregation
+
+Computes metrics of the vehicles matching `query`, the same constraints the query endpoint takes, in the database.
+Only the aggregated rows are returned.
+
+Supply `group_by` with a comma separated list of fields, e.g. `group_by=make,year`, to receive a record per
+combination of their values, ordered by them. Supply `metrics` with a comma separated list of `count` and
+`min`, `max`, `avg` or `sum` of a numeric field, e.g. `metrics=count,avg(horsepower),max(top_speed)`. Metrics are
+named `count` or `<metric>_<field>`, e.g. `avg_horsepower`. Decimal metrics are strings like decimal fields.
+
+Without `group_by` and `metrics` the response only has the `count` of matching vehicles, read with a single
+`COUNT(*)` that does not join the manufacturer and model tables unless the query filters on them. Use it for the
+number of pages next to a paginated list.
+
+Responses carry an `ETag` and `Last-Modified` like the query endpoints.
 """
 spaceship_query_description = (
     """# Examples
@@ -84,11 +196,287 @@ Query Spaceships that have a `manufacturer` of `AetherForge` after year `2010`:
 )
 
 
-def build_response(results: Optional[list[dict]]):
-    if results:
-        return flask.make_response({"results": results, "count": len(results)})
+def build_response(
+    results: Rows,
+    page: Optional[dict] = None,
+    debug: Optional[dict] = None,
+    response_format: ResponseFormat = JSON_FORMAT,
+):
+    body = {"results": results, "count": len(results)}
+    if page is not None:
+        body.update(page)
+    if debug is not None:
+        body["debug"] = debug
+
+    with timing.phase("serialize"):
+        return format_response(body, response_format)
+
+
+def explain_query(
+    cls, query: CompiledQuery, sort_field: Optional[str], sort_order: Optional[str]
+) -> dict:
+    rows = dal.explain(cls, query, sort_field, sort_order, analyze=True)
+    plan = "\n".join(str(next(iter(row.values()))) for row in rows)
+    return {
+        "engine": type(engine).__name__,
+        "plan": plan,
+        "rows_examined": rows_examined(plan),
+    }
+
+
+def build_stream_response(chunks: Iterator[Rows], labels: dict):
+    def generate():
+        provider = flask.current_app.json
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            if not chunk:
+                continue
+            # one record per line, written as json.dumps writes them
+            encoder = RowEncoder(chunk.columns, provider, DEFAULT_SEPARATORS)
+            yield encoder.encode_all(chunk.data, "\n") + "\n"
+        result_rows.observe(rows, **labels)
+
+    return flask.Response(
+        flask.stream_with_context(generate()), mimetype=NDJSON_MIMETYPE
+    )
+
+
+def build_arrow_stream_response(chunks: Iterator[Rows], labels: dict):
+    def generate():
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        yield from arrow_stream(counted())
+        result_rows.observe(rows, **labels)
+
+    return flask.Response(
+        flask.stream_with_context(generate()), mimetype=ARROW_STREAM_MIMETYPE
+    )
+
+
+def response_etag(
+    version: Version,
+    query: CompiledQuery,
+    sort_field: Optional[str],
+    sort_order: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[Cursor],
+    stream: bool,
+    response_format: ResponseFormat,
+    encoding: Optional[str],
+    aggregation: Optional[Aggregation] = None,
+) -> str:
+    """
+    Strong ETag of a vehicle response, the same for the same data version, normalized request, response
+    format and content encoding.
+    """
+    key = (
+        version.number,
+        version.modified_at.timestamp(),
+        query.key,
+        sort_field,
+        sort_order,
+        limit,
+        cursor,
+        stream,
+        response_format,
+        encoding,
+        aggregation,
+    )
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def add_validators(response: flask.Response, etag: str, last_modified: datetime):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.vary.add("Accept")
+    # an admin asking for the plan must not be served a cached copy without it
+    response.vary.add("X-Debug")
+    # revalidating is cheap, the query does not run when nothing changed
+    response.headers["Cache-Control"] = "public, no-cache"
+    return response
+
+
+def query_vehicles(
+    cls,
+    query: CompiledQuery,
+    sort_field: Optional[str],
+    sort_order: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[Cursor],
+    stream: bool = False,
+    response_format: ResponseFormat = JSON_FORMAT,
+):
+    # the operators also label the request latency, see flask_server.py
+    flask.g.query_operators = query_operators(query)
+    if is_debug_request():
+        response = run_query(
+            cls, query, sort_field, sort_order, limit, cursor, stream, response_format
+        )
+        # the plan is for admins only, no shared cache may keep it
+        response.headers["Cache-Control"] = "private, no-store"
+        response.vary.update(["X-Debug", "X-Admin-Token"])
+        return response
+
+    version = dal.versions.current()
+    etag = response_etag(
+        version,
+        query,
+        sort_field,
+        sort_order,
+        limit,
+        cursor,
+        stream,
+        response_format,
+        compression.negotiate(flask.request.accept_encodings),
+    )
+    return conditional_response(
+        version,
+        etag,
+        lambda: run_query(
+            cls, query, sort_field, sort_order, limit, cursor, stream, response_format
+        ),
+        stream,
+    )
+
+
+def add_weak_validators(response: flask.Response, etag: str):
+    response.set_etag(etag, weak=True)
+    response.vary.update(["Accept", "X-Debug"])
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def conditional_response(
+    version: Version,
+    etag: str,
+    run: Callable[[], flask.Response],
+    stream: bool = False,
+) -> flask.Response:
+    """
+    A 304 when the client has the current response, the response of run otherwise.
+
+    The validators are those of version, so they are only strong when the data did not change while run read it.
+    Streams only read their rows after run returns, so a write may always come in between and their validators are
+    weak. Reads go to the primary until the replicas have a write, see MySQLDal.clear_caches.
+    """
+    last_modified = None if stream else version.modified_at
+    if not is_resource_modified(
+        flask.request.environ, etag, last_modified=last_modified
+    ):
+        if stream:
+            return add_weak_validators(flask.Response(status=304), etag)
+        return add_validators(flask.Response(status=304), etag, version.modified_at)
+
+    data_version = dal.data_version
+    response = run()
+    if stream or dal.data_version != data_version:
+        # the rows may be of the previous or the next version
+        return add_weak_validators(response, etag)
+    return add_validators(response, etag, version.modified_at)
+
+
+def aggregate_vehicles(cls, query: CompiledQuery, aggregation: Aggregation):
+    flask.g.query_operators = query_operators(query)
+    labels = {
+        "resource": flask.request.url_rule.rule,
+        "operators": flask.g.query_operators,
+    }
+
+    def run():
+        # always MySQL, the columnar engine has no aggregates
+        results = dal.aggregate(cls, query, aggregation)
+        result_rows.observe(len(results), **labels)
+        return build_response(results)
+
+    version = dal.versions.current()
+    etag = response_etag(
+        version,
+        query,
+        None,
+        None,
+        None,
+        None,
+        False,
+        JSON_FORMAT,
+        compression.negotiate(flask.request.accept_encodings),
+        aggregation,
+    )
+    return conditional_response(version, etag, run)
+
+
+def run_query(
+    cls,
+    query: CompiledQuery,
+    sort_field: Optional[str],
+    sort_order: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[Cursor],
+    stream: bool,
+    response_format: ResponseFormat = JSON_FORMAT,
+):
+    labels = {
+        "resource": flask.request.url_rule.rule,
+        "operators": flask.g.query_operators,
+    }
+    if stream:
+        chunks = engine.stream(cls, query, sort_field, sort_order)
+        if response_format.mimetype == ARROW_STREAM_MIMETYPE:
+            return build_arrow_stream_response(chunks, labels)
+        return build_stream_response(chunks, labels)
+
+    debug = None
+    if is_debug_request():
+        debug = explain_query(cls, query, sort_field, sort_order)
+
+    if limit is None:
+        results = engine.query(cls, query, sort_field, sort_order)
+        result_rows.observe(len(results), **labels)
+        return build_response(results, debug=debug, response_format=response_format)
+
+    results, next_cursor = engine.query_page(
+        cls, query, sort_field, sort_order, limit, cursor
+    )
+    result_rows.observe(len(results), **labels)
+    return build_response(results, {"cursor": next_cursor}, debug, response_format)
+
+
+def build_bulk_response(batches: list[BatchReport], error: Optional[str] = None):
+    body = {
+        counter: sum(getattr(b, counter) for b in batches)
+        for counter in ["received", "inserted", "duplicates", "rejected"]
+    }
+    body["batches"] = [
+        {
+            **b._asdict(),
+            "errors": [e._asdict() for e in b.errors[:MAX_REPORTED_ERRORS]],
+        }
+        for b in batches
+    ]
+    if error is None:
+        return flask.make_response(body)
+
+    body.update(
+        {"errors": {"body": error}, "message": "Input payload validation failed."}
+    )
+    return flask.make_response(body, 400)
+
+
+def ingest_vehicles(cls, records: Iterator, batch_size: Optional[int]):
+    batches = []
+    try:
+        for batch in dal.ingest(cls, records, batch_size):
+            batches.append(batch)
+    except JsonReadError as ex:
+        return build_bulk_response(batches, str(ex))
 
-    return flask.make_response({"results": [], "count": 0})
+    return build_bulk_response(batches)
 
 
 spaceship_model = Spaceship.get_swagger_model(api)
@@ -110,16 +498,64 @@ class SpaceshipsResource(Resource):
     @validate.sort_field_exists(
         Spaceship.query_columns + Manufacturer.query_columns + Model.query_columns
     )
+    @validate.query_compiles(Spaceship)
     def get(
         self,
         sort_field: Optional[str],
         sort_order: Optional[str],
-        query: Optional[dict],
+        query: CompiledQuery,
+        limit: Optional[int],
+        cursor: Optional[Cursor],
+        stream: bool,
+        response_format: ResponseFormat,
     ):
         """
         Query Spaceship Vehicles
         """
-        return build_response(dal.query(Spaceship, query, sort_field, sort_order))
+        return query_vehicles(
+            Spaceship,
+            query,
+            sort_field,
+            sort_order,
+            limit,
+            cursor,
+            stream,
+            response_format,
+        )
+
+
+@api.doc(description=bulk_description)
+@api.route("/spaceships/bulk")
+@api.response(200, responses[200], model=bulk_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(403, responses[403])
+@api.response(500, responses[500], model=error_model)
+class SpaceshipsBulkResource(Resource):
+    @api.expect(bulk_parser)
+    @validate.admin_authorized()
+    @parse.bulk_request(bulk_parser)
+    def post(self, records: Iterator, batch_size: Optional[int]):
+        """
+        Bulk Load Spaceship Vehicles
+        """
+        return ingest_vehicles(Spaceship, records, batch_size)
+
+
+@api.doc(description=aggregate_description)
+@api.route("/spaceships/aggregate")
+@api.response(200, responses[200], model=aggregate_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(500, responses[500], model=error_model)
+class SpaceshipsAggregateResource(Resource):
+    @api.expect(aggregate_parser)
+    @parse.aggregate_request(aggregate_parser)
+    @validate.query_compiles(Spaceship)
+    @validate.aggregation_compiles(Spaceship)
+    def get(self, query: CompiledQuery, aggregation: Aggregation):
+        """
+        Aggregate Spaceship Vehicles
+        """
+        return aggregate_vehicles(Spaceship, query, aggregation)
 
 
 car_query_description = (
@@ -166,16 +602,57 @@ class CarsResource(Resource):
     @validate.sort_field_exists(
         Car.query_columns + Manufacturer.query_columns + Model.query_columns
     )
+    @validate.query_compiles(Car)
     def get(
         self,
         sort_field: Optional[str],
         sort_order: Optional[str],
-        query: Optional[dict],
+        query: CompiledQuery,
+        limit: Optional[int],
+        cursor: Optional[Cursor],
+        stream: bool,
+        response_format: ResponseFormat,
     ):
         """
         Query Car Vehicles
         """
-        return build_response(dal.query(Car, query, sort_field, sort_order))
+        return query_vehicles(
+            Car, query, sort_field, sort_order, limit, cursor, stream, response_format
+        )
+
+
+@api.doc(description=bulk_description)
+@api.route("/cars/bulk")
+@api.response(200, responses[200], model=bulk_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(403, responses[403])
+@api.response(500, responses[500], model=error_model)
+class CarsBulkResource(Resource):
+    @api.expect(bulk_parser)
+    @validate.admin_authorized()
+    @parse.bulk_request(bulk_parser)
+    def post(self, records: Iterator, batch_size: Optional[int]):
+        """
+        Bulk Load Car Vehicles
+        """
+        return ingest_vehicles(Car, records, batch_size)
+
+
+@api.doc(description=aggregate_description)
+@api.route("/cars/aggregate")
+@api.response(200, responses[200], model=aggregate_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(500, responses[500], model=error_model)
+class CarsAggregateResource(Resource):
+    @api.expect(aggregate_parser)
+    @parse.aggregate_request(aggregate_parser)
+    @validate.query_compiles(Car)
+    @validate.aggregation_compiles(Car)
+    def get(self, query: CompiledQuery, aggregation: Aggregation):
+        """
+        Aggregate Car Vehicles
+        """
+        return aggregate_vehicles(Car, query, aggregation)
 
 
 bike_query_description = (
@@ -210,13 +687,54 @@ class BikesResource(Resource):
     @validate.sort_field_exists(
         Bike.query_columns + Manufacturer.query_columns + Model.query_columns
     )
+    @validate.query_compiles(Bike)
     def get(
         self,
         sort_field: Optional[str],
         sort_order: Optional[str],
-        query: Optional[dict],
+        query: CompiledQuery,
+        limit: Optional[int],
+        cursor: Optional[Cursor],
+        stream: bool,
+        response_format: ResponseFormat,
     ):
         """
         Query Bike Vehicles
         """
-        return build_response(dal.query(Bike, query, sort_field, sort_order))
+        return query_vehicles(
+            Bike, query, sort_field, sort_order, limit, cursor, stream, response_format
+        )
+
+
+@api.doc(description=bulk_description)
+@api.route("/bikes/bulk")
+@api.response(200, responses[200], model=bulk_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(403, responses[403])
+@api.response(500, responses[500], model=error_model)
+class BikesBulkResource(Resource):
+    @api.expect(bulk_parser)
+    @validate.admin_authorized()
+    @parse.bulk_request(bulk_parser)
+    def post(self, records: Iterator, batch_size: Optional[int]):
+        """
+        Bulk Load Bike Vehicles
+        """
+        return ingest_vehicles(Bike, records, batch_size)
+
+
+@api.doc(description=aggregate_description)
+@api.route("/bikes/aggregate")
+@api.response(200, responses[200], model=aggregate_result_model)
+@api.response(400, responses[400], model=get_validation_result(api))
+@api.response(500, responses[500], model=error_model)
+class BikesAggregateResource(Resource):
+    @api.expect(aggregate_parser)
+    @parse.aggregate_request(aggregate_parser)
+    @validate.query_compiles(Bike)
+    @validate.aggregation_compiles(Bike)
+    def get(self, query: CompiledQuery, aggregation: Aggregation):
+        """
+        Aggregate Bike Vehicles
+        """
+        return aggregate_vehicles(Bike, query, aggregation)
@@ -0,0 +1,315 @@
+"""
+ASGI app serving the vehicle queries on the asyncio DAL, a single process keeps thousands of queries in flight
+without monkey patching.
+
+    python3 -m uvicorn asgi:app --host 0.0.0.0 --port 80
+
+It serves `GET /api/v1/vehicles/{cars,bikes,spaceships}` with the same parameters, validation and JSON bodies
+as the Flask app. Unlike the Flask app it
+
+- has no `stream`, `format`, `Accept` negotiation or compression, responses are always uncompressed JSON,
+- sends no `ETag` or `Last-Modified` and never a 304, responses are `Cache-Control: no-store` instead,
+- always queries MySQL, `VQE_QUERY_ENGINE` is ignored,
+- ignores `X-Debug` and sends no `Server-Timing`.
+
+Documentation, aggregates, bulk loads and the admin endpoints stay on the Flask app.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import parse_qs
+
+from flask_restx import Namespace
+
+from apis.namespaces.v1.models.requests import get_query_parser
+from dal.models.base import Base
+from dal.models.dimensions import Manufacturer, Model
+from dal.models.facts import Bike, Car, Spaceship
+from dal.mysql import MySQLDal
+from dal.mysql_async import AsyncMySQLDal
+from dal.pagination import Cursor, coerce_cursor, decode_cursor
+from dal.query_compiler import CompiledQuery, QueryValidationError, compile_query
+from dal.rows import Rows
+from helpers.metrics_helper import (
+    CONTENT_TYPE,
+    errors_total,
+    metrics,
+    query_operators,
+    request_duration,
+    requests_total,
+    result_rows,
+)
+from helpers.parsing_helper import parse_json_string
+
+API_PATH = "/api/v1/vehicles/"
+VEHICLES: dict[str, type[Base]] = {
+    "spaceships": Spaceship,
+    "cars": Car,
+    "bikes": Bike,
+}
+# the arguments are converted and reported exactly as the Flask app's request parser does
+query_parser = get_query_parser(Namespace("vehicles"))
+ARGUMENTS = {argument.name: argument for argument in query_parser.args}
+
+Send = Callable[[dict], Awaitable[None]]
+
+
+def to_json(value: Any) -> Any:
+    # matches the Flask JSON provider
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Rows):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ArgumentError(QueryValidationError):
+    """
+    An argument the request parser rejects, reported in the shape flask-restx uses for them.
+    """
+
+    summary = "Input payload validation failed"
+
+
+def parse_argument(name: str, value: str) -> Any:
+    argument = ARGUMENTS[name]
+    try:
+        converted = argument.convert(value, "=")
+    except Exception as error:
+        raise ArgumentError(f"{argument.help} {error}", name)
+    if argument.choices and converted not in argument.choices:
+        raise ArgumentError(
+            f"{argument.help} The value '{converted}' is not a valid choice for '{name}'.",
+            name,
+        )
+    return converted
+
+
+class VehicleRequest:
+    """
+    The parsed and validated parameters of a vehicle query, see Parse.query_request and Validate.
+    """
+
+    def __init__(self, cls: type[Base], query_string: bytes) -> None:
+        params = {
+            k: v[-1].strip()
+            for k, v in parse_qs(query_string.decode(), errors="strict").items()
+        }
+        self.sort_field: Optional[str] = params.get("sort_field") or None
+        self.sort_order: Optional[str] = None
+        if params.get("sort_order"):
+            self.sort_order = parse_argument("sort_order", params["sort_order"])
+
+        self.limit: Optional[int] = None
+        if params.get("limit"):
+            self.limit = parse_argument("limit", params["limit"])
+
+        if params.get("stream") and parse_argument("stream", params["stream"]):
+            raise QueryValidationError(
+                "Streaming is only available from the WSGI app.", "stream"
+            )
+
+        query = None
+        if params.get("query"):
+            query = parse_json_string(params["query"])
+            if not query:
+                raise QueryValidationError(
+                    "Invalid query supplied, see Examples for query payload.", "query"
+                )
+
+        self.cursor = self.__cursor(params.get("cursor"))
+
+        available = cls.query_columns + Manufacturer.query_columns + Model.query_columns
+        if self.sort_field is not None and self.sort_field not in available:
+            raise QueryValidationError(
+                f"Sort field `{self.sort_field}` was not in available list of columns.",
+                "sort_field",
+            )
+        if self.cursor is not None:
+            try:
+                self.cursor = coerce_cursor(cls, self.cursor)
+            except ValueError:
+                raise QueryValidationError(
+                    "Invalid cursor supplied, use the cursor from a previous response.",
+                    "cursor",
+                )
+
+        self.query: CompiledQuery = compile_query(cls, query, params.get("fields"))
+
+    def __cursor(self, content: Optional[str]) -> Optional[Cursor]:
+        if not content:
+            return None
+        if self.limit is None:
+            raise QueryValidationError(
+                "A cursor can only be used together with limit.", "cursor"
+            )
+
+        try:
+            cursor = decode_cursor(content)
+        except ValueError:
+            raise QueryValidationError(
+                "Invalid cursor supplied, use the cursor from a previous response.",
+                "cursor",
+            )
+
+        if cursor.sort_field != self.sort_field or (
+            cursor.sort_order != (self.sort_order or "ASC")
+        ):
+            raise QueryValidationError(
+                "Cursor was issued for a different sort_field or sort_order.", "cursor"
+            )
+        return cursor
+
+
+class AsgiApp:
+    def __init__(self, dal_factory: Callable[[], MySQLDal] = MySQLDal) -> None:
+        self.dal_factory = dal_factory
+        self.dal: Optional[AsyncMySQLDal] = None
+        self._starting = asyncio.Lock()
+
+    async def __call__(self, scope: dict, receive: Callable, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, send)
+
+    async def startup(self) -> AsyncMySQLDal:
+        async with self._starting:
+            if self.dal is None:
+                dal = self.dal_factory()
+                await asyncio.to_thread(dal.scaffold)
+                self.dal = AsyncMySQLDal(dal)
+        return self.dal
+
+    async def lifespan(self, receive: Callable, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as ex:
+                    logging.exception("Unable to scaffold database!")
+                    await send({"type": "lifespan.startup.failed", "message": str(ex)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.dal is not None:
+                    await self.dal.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope: dict, send: Send) -> None:
+        started = time.perf_counter()
+        path = scope["path"]
+        method = scope["method"]
+        resource = "unmatched"
+        operators = "none"
+        headers = []
+
+        if path == "/ping":
+            resource = path
+            status, body, content_type = 200, b"PONG", "text/plain"
+        elif path == "/metrics":
+            resource = path
+            status, body, content_type = 200, metrics.render().encode(), CONTENT_TYPE
+        elif path.startswith(API_PATH) and path[len(API_PATH) :] in VEHICLES:
+            resource = path
+            cls = VEHICLES[path[len(API_PATH) :]]
+            if method != "GET":
+                status, payload = 405, {
+                    "message": "The method is not allowed for the requested URL."
+                }
+            else:
+                status, payload, operators = await self.query_vehicles(
+                    cls, scope["query_string"], resource
+                )
+            body = json.dumps(payload, default=to_json).encode()
+            content_type = "application/json"
+            # without validators a cache could not tell when the vehicles change
+            headers.append((b"cache-control", b"no-store"))
+        else:
+            status, content_type = 404, "application/json"
+            body = json.dumps(
+                {"message": "The requested URL was not found on the server."}
+            ).encode()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+        request_duration.observe(
+            time.perf_counter() - started,
+            resource=resource,
+            method=method,
+            operators=operators,
+        )
+        requests_total.inc(resource=resource, method=method, status=status)
+        if status >= 500:
+            errors_total.inc(source="http", type=status)
+
+    async def query_vehicles(
+        self, cls: type[Base], query_string: bytes, resource: str
+    ) -> tuple[int, dict, str]:
+        try:
+            request = VehicleRequest(cls, query_string)
+        except UnicodeDecodeError:
+            return 400, {"message": "The query string is not valid UTF-8."}, "none"
+        except ArgumentError as ex:
+            return (
+                400,
+                {"errors": {ex.field: ex.message}, "message": ex.summary},
+                "none",
+            )
+        except QueryValidationError as ex:
+            return (
+                400,
+                {
+                    "errors": {ex.field: ex.message},
+                    "message": "Input payload validation failed.",
+                },
+                "none",
+            )
+
+        operators = query_operators(request.query)
+        try:
+            dal = self.dal or await self.startup()
+            # like the Flask app, picks up writes from other processes
+            await dal.current_version()
+            if request.limit is None:
+                results = await dal.query(
+                    cls, request.query, request.sort_field, request.sort_order
+                )
+                page = {}
+            else:
+                results, next_cursor = await dal.query_page(
+                    cls,
+                    request.query,
+                    request.sort_field,
+                    request.sort_order,
+                    request.limit,
+                    request.cursor,
+                )
+                page = {"cursor": next_cursor}
+        except Exception:
+            logging.exception(f"Unable to query {resource}")
+            return 500, {"message": "Internal Server Error!"}, operators
+
+        result_rows.observe(len(results), resource=resource, operators=operators)
+        return 200, {"results": results, "count": len(results), **page}, operators
+
+
+app = AsgiApp()
@@ -0,0 +1,365 @@
+import logging
+
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from threading import Lock
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is only needed for this engine
+    np = None
+
+from dal.dimension_cache import fold
+from dal.models.base import Base
+from dal.models.facts import Bike, Car, Spaceship
+from dal.mysql import MySQLDal
+from dal.pagination import Cursor, encode_cursor
+from dal.query_compiler import (
+    ColumnFilter,
+    CompiledQuery,
+    Constraint,
+    output_name,
+    qualify_column,
+    resolve_field,
+    result_columns,
+)
+from dal.rows import Rows
+from helpers.timing_helper import timing
+
+
+class Column(NamedTuple):
+    """
+    A single column, text columns are dictionary encoded and their codes index into the dictionary.
+    Decimal columns hold their values as integers, scaled by 10 ** scale.
+    """
+
+    column_type: type
+    values: Any
+    output: Any
+    dictionary: Any = None
+    folded: Any = None
+    ranks: Any = None
+    scale: int = 0
+
+    def text_view(self) -> Any:
+        if self.dictionary is not None:
+            return self.folded[self.values]
+        return np.array([fold(str(v)) for v in self.output], dtype=str)
+
+
+class Table(NamedTuple):
+    cls: type[Base]
+    keys: Any
+    columns: dict[str, Column]
+    output_names: list[str]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class ColumnarDal:
+    """
+    In-memory, NumPy backed engine over the fact tables with the same query interface as MySQLDal.
+
+    Text comparisons are case and accent insensitive to follow the default MySQL collation, decimals
+    are compared exactly like MySQL does.
+    """
+
+    vehicle_classes: list[type[Base]] = [Car, Bike, Spaceship]
+
+    def __init__(self, dal: MySQLDal) -> None:
+        if np is None:
+            raise RuntimeError("The columnar query engine requires numpy")
+
+        self.dal = dal
+        self.loaded_version: Optional[int] = None
+        self._tables: dict[str, Table] = {}
+        self._lock = Lock()
+
+    def load(self) -> None:
+        with self._lock:
+            version = self.dal.data_version
+            tables = {}
+            for cls in self.vehicle_classes:
+                tables[cls.__name__] = self.__load_table(cls)
+                logging.info(
+                    f"Loaded {len(tables[cls.__name__])} {cls.table_name} rows into memory"
+                )
+            self._tables = tables
+            self.loaded_version = version
+
+    def query(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+    ) -> Rows:
+        table = self.__get_table(cls)
+        compiled = self.__compile(cls, query)
+        with timing.phase("filter"):
+            indexes = np.flatnonzero(self.__evaluate(table, compiled))
+            if sort_field and sort_order:
+                indexes = indexes[self.__order(table, indexes, sort_field, sort_order)]
+
+        return self.__materialize(table, indexes, compiled.fields)
+
+    def query_page(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[Cursor] = None,
+    ) -> tuple[Rows, Optional[str]]:
+        sort_order = sort_order or "ASC"
+        table = self.__get_table(cls)
+        compiled = self.__compile(cls, query)
+        mask = self.__evaluate(table, compiled)
+
+        if cursor is not None:
+            comparison = "gt" if sort_order == "ASC" else "lt"
+            seek = self.__compare(table.keys, comparison, cursor.key)
+            if sort_field:
+                column = self.__get_column(table, sort_field)
+                seek = self.__constraint_mask(
+                    column, Constraint(comparison, self.__cursor_value(column, cursor))
+                ) | (
+                    self.__constraint_mask(
+                        column,
+                        Constraint("equals", self.__cursor_value(column, cursor)),
+                    )
+                    & seek
+                )
+            mask &= seek
+
+        indexes = np.flatnonzero(mask)
+        indexes = indexes[self.__order(table, indexes, sort_field, sort_order)]
+        results = self.__materialize(table, indexes[:limit], compiled.fields)
+
+        next_cursor = None
+        if len(indexes) > limit:
+            # the sort field need not be one of the fields
+            last = self.__materialize(table, indexes[limit - 1 : limit])[0]
+            next_cursor = encode_cursor(
+                Cursor(
+                    sort_field,
+                    sort_order,
+                    last[output_name(cls, sort_field)] if sort_field else None,
+                    int(table.keys[indexes[limit - 1]]),
+                )
+            )
+
+        return results, next_cursor
+
+    def stream(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        chunk_size: int = 1000,
+    ) -> Iterator[Rows]:
+        results = self.query(cls, query, sort_field, sort_order)
+        for i in range(0, len(results), chunk_size):
+            yield results[i : i + chunk_size]
+
+    def __compile(
+        self, cls: Base, query: Union[CompiledQuery, dict, None]
+    ) -> CompiledQuery:
+        return self.dal.compiler.compile(cls, query)
+
+    def __get_table(self, cls: Base) -> Table:
+        if self.loaded_version != self.dal.data_version:
+            self.load()
+        return self._tables[cls.__name__]
+
+    def __load_table(self, cls: Base) -> Table:
+        key_alias = "__key"
+        rows = self.dal.read_sql_query(
+            self.dal.compiler.build_select(
+                cls, f"{qualify_column(cls, cls.primary_key)} AS `{key_alias}`"
+            ),
+            primary=True,
+        )
+
+        output_names = [output_name(cls, c) for _, c in result_columns(cls)]
+        columns = {}
+        for model, column in result_columns(cls):
+            name = output_name(cls, column)
+            columns[column] = self.__build_column(
+                model, column, [row[name] for row in rows]
+            )
+
+        keys = np.array([row[key_alias] for row in rows], dtype=np.int64)
+        return Table(cls, keys, columns, output_names)
+
+    def __build_column(self, model: type[Base], column: str, values: list) -> Column:
+        column_type = model.column_types[column]
+        if column_type is str:
+            dictionary = sorted(set(values), key=lambda v: (fold(v), v))
+            positions = {v: i for i, v in enumerate(dictionary)}
+            codes = np.array([positions[v] for v in values], dtype=np.int32)
+            dictionary = np.array(dictionary, dtype=object)
+            folded = np.array([fold(v) for v in dictionary], dtype=str)
+            # codes follow the collation order, values that only differ in case or accents share a rank
+            ranks = np.unique(folded, return_inverse=True)[1]
+            return Column(column_type, codes, dictionary, dictionary, folded, ranks)
+
+        output = np.empty(len(values), dtype=object)
+        output[:] = values
+        if column_type is int:
+            return Column(column_type, np.array(values, dtype=np.int64), output)
+
+        # the largest value of a DECIMAL column has every digit of its scale
+        scale = -model.column_ranges[column][1].as_tuple().exponent
+        scaled = [round(Decimal(str(v)).scaleb(scale)) for v in values]
+        return Column(
+            column_type, np.array(scaled, dtype=np.int64), output, scale=scale
+        )
+
+    def __get_column(self, table: Table, field: str) -> Column:
+        return table.columns[resolve_field(table.cls, field)[1]]
+
+    def __evaluate(self, table: Table, compiled: CompiledQuery) -> Any:
+        mask = np.ones(len(table), dtype=bool)
+        for column_filter in compiled.filters:
+            mask &= self.__filter_mask(table, column_filter)
+        return mask
+
+    def __filter_mask(self, table: Table, column_filter: ColumnFilter) -> Any:
+        column = table.columns[column_filter.column]
+        masks = [self.__constraint_mask(column, c) for c in column_filter.constraints]
+        combined = masks[0]
+        for mask in masks[1:]:
+            combined = (
+                combined & mask if column_filter.operator == "AND" else combined | mask
+            )
+        return combined
+
+    def __constraint_mask(self, column: Column, constraint: Constraint) -> Any:
+        operator, value = constraint.operator, constraint.value
+        if operator in ("startsWith", "endsWith", "contains", "notContains"):
+            return self.__like_mask(column, operator, fold(value))
+
+        if column.dictionary is not None:
+            # evaluate against the (small) dictionary, then map back through the codes
+            if isinstance(value, list):
+                value = [fold(v) for v in value]
+            else:
+                value = fold(value)
+            return self.__compare(column.folded, operator, value)[column.values]
+
+        if column.column_type is not int:
+            return self.__decimal_mask(column, operator, value)
+
+        if isinstance(value, list):
+            value = [int(v) for v in value]
+        else:
+            value = int(value)
+        return self.__compare(column.values, operator, value)
+
+    def __decimal_mask(self, column: Column, operator: str, value: Any) -> Any:
+        if isinstance(value, list):
+            scaled = [Decimal(str(v)).scaleb(column.scale) for v in value]
+            # a value with more digits than the column matches none of its values
+            return self.__compare(
+                column.values,
+                operator,
+                [int(v) for v in scaled if v == v.to_integral_value()],
+            )
+
+        scaled = Decimal(str(value)).scaleb(column.scale)
+        if scaled != scaled.to_integral_value():
+            if operator in ("equals", "notEquals"):
+                return np.full(len(column.values), operator == "notEquals")
+            # rounds to the neighbouring column value that keeps the comparison the same
+            scaled = scaled.to_integral_value(
+                ROUND_CEILING if operator in ("lt", "gte") else ROUND_FLOOR
+            )
+        return self.__compare(column.values, operator, int(scaled))
+
+    def __like_mask(self, column: Column, operator: str, value: str) -> Any:
+        if column.dictionary is not None:
+            text = column.folded
+        else:
+            text = column.text_view()
+
+        if operator == "startsWith":
+            mask = np.char.startswith(text, value)
+        elif operator == "endsWith":
+            mask = np.char.endswith(text, value)
+        else:
+            mask = np.char.find(text, value) >= 0
+            if operator == "notContains":
+                mask = ~mask
+
+        return mask[column.values] if column.dictionary is not None else mask
+
+    def __compare(self, values: Any, operator: str, value: Any) -> Any:
+        if operator == "equals":
+            return values == value
+        if operator == "notEquals":
+            return values != value
+        if operator == "lt":
+            return values < value
+        if operator == "lte":
+            return values <= value
+        if operator == "gt":
+            return values > value
+        if operator == "gte":
+            return values >= value
+        if operator == "in":
+            return np.isin(values, value)
+        if operator == "notIn":
+            return ~np.isin(values, value)
+        raise ValueError(f"Unsupported operator {operator}")
+
+    def __cursor_value(self, column: Column, cursor: Cursor) -> Any:
+        if column.column_type is str:
+            return str(cursor.sort_value)
+        return (
+            int(cursor.sort_value)
+            if column.column_type is int
+            else Decimal(str(cursor.sort_value))
+        )
+
+    def __order(
+        self,
+        table: Table,
+        indexes: Any,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+    ) -> Any:
+        keys = table.keys[indexes]
+        if not sort_field:
+            order = np.argsort(keys, kind="stable")
+            return order[::-1] if sort_order == "DESC" else order
+
+        column = self.__get_column(table, sort_field)
+        sort_keys = column.values[indexes]
+        if column.dictionary is not None:
+            sort_keys = column.ranks[sort_keys]
+
+        order = np.lexsort((keys, sort_keys))
+        return order[::-1] if sort_order == "DESC" else order
+
+    def __materialize(
+        self, table: Table, indexes: Any, fields: tuple[str, ...] = ()
+    ) -> Rows:
+        names = (
+            [output_name(table.cls, c) for c in fields]
+            if fields
+            else table.output_names
+        )
+        with timing.phase("materialize"):
+            columns = []
+            for name in names:
+                column = self.__get_column(table, name)
+                positions = (
+                    column.values[indexes] if column.dictionary is not None else indexes
+                )
+                columns.append(column.output[positions].tolist())
+
+            return Rows(tuple(names), list(zip(*columns)))
@@ -0,0 +1,104 @@
+import time
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
+from dal.models.metadata import DataVersion
+
+if TYPE_CHECKING:
+    from dal.mysql import MySQLDal
+
+ROW_ID = 1
+
+
+class Version(NamedTuple):
+    number: int
+    # UTC, in whole seconds like HTTP dates
+    modified_at: datetime
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class DataVersionTracker:
+    """
+    Version of the vehicle data, persisted in MySQL so every worker and process agrees on it.
+
+    Every write bumps it. It is read at most every ttl_seconds, when a read finds that another process
+    changed the data the DAL drops its caches.
+    """
+
+    def __init__(
+        self,
+        dal: "MySQLDal",
+        ttl_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.dal = dal
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._version: Optional[Version] = None
+        self._read_at = 0.0
+        self._lock = Lock()
+
+    def create(self) -> None:
+        self.dal.execute(DataVersion.get_create_table())
+        self.dal.execute(
+            f"INSERT IGNORE INTO `{self.dal.db_name}`.`{DataVersion.table_name}`"
+            f" (`{DataVersion.primary_key}`, `version`, `modified_at`)"
+            " VALUES (:id, 0, :modified_at)",
+            {"id": ROW_ID, "modified_at": utc_now().replace(tzinfo=None)},
+        )
+
+    def expired(self) -> bool:
+        """
+        Whether the next call to current reads the version from MySQL.
+        """
+        return self._version is None or self.clock() - self._read_at >= self.ttl_seconds
+
+    def current(self) -> Version:
+        with self._lock:
+            now = self.clock()
+            if self._version is not None and now - self._read_at < self.ttl_seconds:
+                return self._version
+
+            previous = self._version
+            self._version = self.__read()
+            self._read_at = now
+            changed = previous is not None and previous != self._version
+
+        if changed:
+            self.dal.clear_caches()
+        return self._version
+
+    def bump(self) -> Version:
+        """
+        Called by the DAL after a write, which drops its own caches.
+        """
+        self.dal.execute(
+            f"UPDATE `{self.dal.db_name}`.`{DataVersion.table_name}`"
+            " SET `version` = `version` + 1, `modified_at` = :modified_at"
+            f" WHERE `{DataVersion.primary_key}` = :id",
+            {"id": ROW_ID, "modified_at": utc_now().replace(tzinfo=None)},
+        )
+        with self._lock:
+            self._version = self.__read()
+            self._read_at = self.clock()
+            return self._version
+
+    def __read(self) -> Version:
+        rows = self.dal.read_sql_query(
+            f"SELECT `version`, `modified_at` FROM `{self.dal.db_name}`.`{DataVersion.table_name}`"
+            f" WHERE `{DataVersion.primary_key}` = :id",
+            {"id": ROW_ID},
+            # a replica may not have the latest write yet
+            primary=True,
+        )
+        if not rows:
+            return Version(0, datetime.fromtimestamp(0, timezone.utc))
+        return Version(
+            int(rows[0]["version"]),
+            rows[0]["modified_at"].replace(tzinfo=timezone.utc),
+        )
@@ -0,0 +1,149 @@
+import logging
+import unicodedata
+
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
+
+from dal.models.base import Base
+from dal.models.dimensions import Manufacturer, Model
+from dal.query_compiler import ColumnFilter, CompiledQuery, Constraint
+
+if TYPE_CHECKING:
+    from dal.mysql import MySQLDal
+
+
+def fold(value: str) -> str:
+    """
+    Approximates the accent and case insensitive comparisons of the default utf8mb4_0900_ai_ci collation.
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+# operator -> test of a folded dimension value against the folded constraint value
+MATCHERS: dict[str, Callable[[str, Any], bool]] = {
+    "equals": lambda value, other: value == other,
+    "notEquals": lambda value, other: value != other,
+    "startsWith": lambda value, other: value.startswith(other),
+    "endsWith": lambda value, other: value.endswith(other),
+    "contains": lambda value, other: other in value,
+    "notContains": lambda value, other: other not in value,
+    "in": lambda value, others: value in others,
+    "notIn": lambda value, others: value not in others,
+}
+
+
+class DimensionTable(NamedTuple):
+    ids: list[int]
+    # folded values, in the same order as ids
+    values: list[str]
+
+
+class DimensionCache:
+    """
+    In-process copy of the dimension tables, reloaded whenever the data version of the DAL changes.
+
+    Manufacturer and model filters are resolved against it into the matching ids, so the fact table
+    is filtered on its integer foreign keys instead of comparing strings across the join.
+    """
+
+    models: list[type[Base]] = [Manufacturer, Model]
+
+    def __init__(self, dal: "MySQLDal", max_ids: int = 1000) -> None:
+        self.dal = dal
+        self.max_ids = max_ids
+        self.loaded_version: Optional[int] = None
+        self._tables: dict[str, DimensionTable] = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_ids > 0
+
+    def load(self) -> None:
+        with self._lock:
+            version = self.dal.data_version
+            tables = {}
+            for model in self.models:
+                column = model.query_columns[0]
+                rows = self.dal.read_sql_query(
+                    f"SELECT `{model.primary_key}`, `{column}`"
+                    f" FROM `{self.dal.db_name}`.`{model.table_name}`",
+                    # reloaded after writes, a replica may not have them yet
+                    primary=True,
+                )
+                tables[model.__name__] = DimensionTable(
+                    [row[model.primary_key] for row in rows],
+                    [fold(row[column]) for row in rows],
+                )
+                logging.info(f"Loaded {len(rows)} {model.table_name} rows into memory")
+            self._tables = tables
+            self.loaded_version = version
+
+    def rewrite(self, compiled: CompiledQuery) -> Optional[CompiledQuery]:
+        """
+        Replaces dimension filters with `<dimension>_id IN (...)` on the fact table.
+
+        Returns None when a filter matches no dimension rows, so the query has no results.
+        """
+        if not self.enabled or not any(
+            f.model in self.models for f in compiled.filters
+        ):
+            return compiled
+
+        filters = []
+        for column_filter in compiled.filters:
+            ids = self.resolve(column_filter)
+            if ids is None:
+                filters.append(column_filter)
+            elif not ids:
+                return None
+            elif len(ids) < len(self.__get_table(column_filter.model).ids):
+                filters.append(
+                    ColumnFilter(
+                        column_filter.field,
+                        compiled.cls,
+                        column_filter.model.primary_key,
+                        "AND",
+                        (Constraint("in", sorted(ids)),),
+                    )
+                )
+            # a filter matching every dimension row does not narrow the facts
+
+        return compiled._replace(filters=tuple(filters))
+
+    def resolve(self, column_filter: ColumnFilter) -> Optional[set[int]]:
+        """
+        Ids of the dimension rows matching the filter, None when it has to be evaluated by MySQL.
+
+        Range comparisons follow the collation order and too many ids make for a slower IN list,
+        both are left to MySQL.
+        """
+        if column_filter.model not in self.models or any(
+            c.operator not in MATCHERS for c in column_filter.constraints
+        ):
+            return None
+
+        tests = [
+            (MATCHERS[c.operator], self.__fold_value(c.value))
+            for c in column_filter.constraints
+        ]
+        combine = all if column_filter.operator == "AND" else any
+        table = self.__get_table(column_filter.model)
+        ids = {
+            key
+            for key, value in zip(table.ids, table.values)
+            if combine(match(value, other) for match, other in tests)
+        }
+
+        return ids if len(ids) <= self.max_ids else None
+
+    def __fold_value(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return {fold(v) for v in value}
+        return fold(value)
+
+    def __get_table(self, model: type[Base]) -> DimensionTable:
+        if self.loaded_version != self.dal.data_version:
+            self.load()
+        return self._tables[model.__name__]
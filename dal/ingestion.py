@@ -0,0 +1,320 @@
+import codecs
+import gzip
+import json
+import logging
+import os
+
+from typing import Any, BinaryIO, Iterable, Iterator, NamedTuple, Optional
+
+from dal.models.base import Base
+from dal.models.dimensions import Manufacturer, Model
+from dal.query_compiler import QueryValidationError, coerce_value, output_name
+
+GZIP_MAGIC = b"\x1f\x8b"
+WHITESPACE = " \t\n\r"
+
+
+class JsonReadError(ValueError):
+    pass
+
+
+def chunked(items: Iterable[Any], chunk_size: int) -> Iterator[list[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_source(path: str) -> BinaryIO:
+    """
+    Opens a file for reading, gzip compressed files are detected by their magic number.
+    """
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+
+class JsonArrayReader:
+    """
+    Reads the items of a top-level JSON array one at a time, without loading the whole document.
+
+    `offset` is the position in the (decompressed) stream after the last item read and can be passed
+    back as `start_offset` to continue reading after that item.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        start_offset: int = 0,
+        block_size: int = 64 * 1024,
+        max_item_size: int = 16 * 1024 * 1024,
+    ) -> None:
+        self.stream = stream
+        self.block_size = block_size
+        self.max_item_size = max_item_size
+        self.offset = start_offset
+        self.count = 0
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        self._started = start_offset > 0
+        self._after_item = start_offset > 0
+        self._finished = False
+
+        if start_offset > 0:
+            stream.seek(start_offset)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            item = self.read()
+            if item is _END:
+                return
+            yield item
+
+    def chunks(self, chunk_size: int) -> Iterator[list[Any]]:
+        return chunked(self, chunk_size)
+
+    def read(self) -> Any:
+        """
+        Returns the next item, or the _END sentinel once the closing bracket has been read.
+        """
+        if self._finished:
+            return _END
+
+        if not self._started:
+            if self.__next_char() != "[":
+                raise JsonReadError("Expected a JSON array")
+            self.__consume(1)
+            self._started = True
+            if self.__next_char() == "]":
+                return self.__finish()
+        elif self._after_item:
+            char = self.__next_char()
+            if char == "]":
+                return self.__finish()
+            if char != ",":
+                raise JsonReadError(f"Expected ',' or ']' at offset {self.offset}")
+            self.__consume(1)
+
+        self.__next_char()
+        while True:
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, self._position)
+                # a number or literal cut off at the end of the buffer may continue in the next block
+                if (
+                    not isinstance(item, (dict, list, str))
+                    and not self._eof
+                    and (
+                        end == len(self._buffer)
+                        or self._buffer[end] not in f"{WHITESPACE},]"
+                    )
+                ):
+                    raise ValueError("Incomplete item")
+            except ValueError:
+                if self._eof:
+                    raise JsonReadError(f"Invalid JSON item at offset {self.offset}")
+                if len(self._buffer) - self._position > self.max_item_size:
+                    raise JsonReadError(
+                        f"Item at offset {self.offset} is larger than {self.max_item_size} bytes"
+                    )
+                self.__fill()
+                continue
+
+            self.__consume(end - self._position)
+            self.count += 1
+            self._after_item = True
+            return item
+
+    def __finish(self) -> Any:
+        self.__consume(1)
+        self._finished = True
+        return _END
+
+    def __next_char(self) -> str:
+        while True:
+            length = len(self._buffer)
+            position = self._position
+            while position < length and self._buffer[position] in WHITESPACE:
+                position += 1
+            self.__consume(position - self._position)
+            if self._position < length:
+                return self._buffer[self._position]
+            if self._eof:
+                raise JsonReadError("Unexpected end of JSON array")
+            self.__fill()
+
+    def __consume(self, length: int) -> None:
+        if length <= 0:
+            return
+        consumed = self._buffer[self._position : self._position + length]
+        self.offset += len(consumed.encode("utf-8"))
+        self._position += length
+
+    def __fill(self) -> None:
+        self._buffer = self._buffer[self._position :]
+        self._position = 0
+        block = self.stream.read(self.block_size)
+        if not block:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b"", final=True)
+            return
+        self._buffer += self._text_decoder.decode(block)
+
+
+_END = object()
+
+
+def read_ndjson(stream: BinaryIO) -> Iterator[Any]:
+    """
+    Reads newline delimited JSON one line at a time, blank lines are skipped.
+    """
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise JsonReadError(f"Invalid JSON on line {number}")
+
+
+class RecordError(NamedTuple):
+    record: int
+    field: str
+    message: str
+
+
+def record_fields(cls: type[Base]) -> list[tuple[str, type[Base], str]]:
+    """
+    The fields a vehicle record of cls consists of, with the model and column each is stored in.
+    """
+    return [(output_name(cls, "manufacturer"), Manufacturer, "manufacturer")] + [
+        (column, model, column)
+        for model, columns in ((Model, Model.query_columns), (cls, cls.query_columns))
+        for column in columns
+    ]
+
+
+def validate_record(cls: type[Base], record: Any) -> dict:
+    """
+    Returns the record with its values converted to the column types of cls.
+
+    Raises QueryValidationError for the first field that is missing or does not fit its column.
+    """
+    if not isinstance(record, dict):
+        raise QueryValidationError("Record must be a JSON object.", "record")
+
+    validated = {}
+    for field, model, column in record_fields(cls):
+        if record.get(field) is None:
+            raise QueryValidationError(f"`{field}` is required.", field)
+
+        try:
+            value = coerce_value(field, model.column_types[column], record[field])
+        except QueryValidationError as ex:
+            raise QueryValidationError(ex.message, field)
+
+        if isinstance(value, str):
+            if not value.strip():
+                raise QueryValidationError(f"`{field}` must not be empty.", field)
+            if len(value) > model.column_lengths.get(column, len(value)):
+                raise QueryValidationError(
+                    f"`{field}` must be at most {model.column_lengths[column]} characters.",
+                    field,
+                )
+            choices = model.column_choices.get(column)
+            if choices:
+                match = [c for c in choices if c.casefold() == value.casefold()]
+                if not match:
+                    raise QueryValidationError(
+                        f"`{field}` must be one of {', '.join(choices)}.", field
+                    )
+                value = match[0]
+        elif column in model.column_ranges:
+            low, high = model.column_ranges[column]
+            if not low <= value <= high:
+                raise QueryValidationError(
+                    f"`{field}` must be between {low} and {high}.", field
+                )
+
+        validated[field] = value
+
+    return validated
+
+
+def validate_records(
+    cls: type[Base], records: list[Any], first_index: int = 0
+) -> tuple[list[dict], list[RecordError]]:
+    """
+    Splits records into the valid ones, converted to their column types, and the errors of the rest.
+
+    Errors reference records by their position in the request, starting at first_index.
+    """
+    valid = []
+    errors = []
+    for index, record in enumerate(records, start=first_index):
+        try:
+            valid.append(validate_record(cls, record))
+        except QueryValidationError as ex:
+            errors.append(RecordError(index, ex.field, ex.message))
+    return valid, errors
+
+
+class Checkpoint(NamedTuple):
+    source: str
+    source_size: int
+    source_mtime: float
+    offset: int
+    records: int
+
+
+class CheckpointStore:
+    """
+    Persists how far a file has been loaded so an interrupted load can resume after the last committed chunk.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+
+    def path_for(self, source: str) -> str:
+        directory = self.directory or os.path.dirname(os.path.abspath(source))
+        return os.path.join(directory, f"{os.path.basename(source)}.checkpoint")
+
+    def load(self, source: str) -> Optional[Checkpoint]:
+        path = self.path_for(source)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, encoding="utf-8") as f:
+            checkpoint = Checkpoint(**json.load(f))
+
+        stat = os.stat(source)
+        if (
+            checkpoint.source_size != stat.st_size
+            or checkpoint.source_mtime != stat.st_mtime
+        ):
+            logging.warning(f"{source} changed since {path} was written, ignoring it")
+            return None
+
+        return checkpoint
+
+    def save(self, source: str, offset: int, records: int) -> Checkpoint:
+        stat = os.stat(source)
+        checkpoint = Checkpoint(
+            os.path.abspath(source), stat.st_size, stat.st_mtime, offset, records
+        )
+        path = self.path_for(source)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(checkpoint._asdict(), f)
+        os.replace(f"{path}.tmp", path)
+        return checkpoint
+
+    def clear(self, source: str) -> None:
+        path = self.path_for(source)
+        if os.path.exists(path):
+            os.remove(path)
@@ -7,6 +7,15 @@ class Base:
     primary_key: str
     query_columns: list[str]
     column_map: dict[str, str]
+    column_types: dict[str, type]
+    # limits of the column definitions, records outside of them are rejected before writing
+    column_ranges: dict[str, tuple] = {}
+    column_lengths: dict[str, int] = {}
+    column_choices: dict[str, list[str]] = {}
+    # text columns with a REVERSE() generated column for suffix matches
+    reversed_columns: list[str] = []
+    # text columns with an ngram FULLTEXT index for substring matches
+    ngram_columns: list[str] = []
 
     @classmethod
     @abstractmethod
@@ -6,17 +6,24 @@ class Manufacturer(Base):
     alias: str = "manu"
     primary_key: str = "manufacturer_id"
     query_columns: list[str] = ["manufacturer"]
+    column_types: dict[str, type] = {"manufacturer": str}
+    column_lengths: dict[str, int] = {"manufacturer": 128}
+    reversed_columns: list[str] = ["manufacturer"]
+    ngram_columns: list[str] = ["manufacturer"]
 
     @classmethod
     def get_create_table(cls) -> str:
         return f"""CREATE TABLE IF NOT EXISTS `vqe`.`{cls.table_name}` (
             `{cls.primary_key}` SMALLINT UNSIGNED AUTO_INCREMENT NOT NULL,
             `manufacturer` VARCHAR(128) NOT NULL,
+            `manufacturer_reversed` VARCHAR(128) AS (REVERSE(`manufacturer`)) VIRTUAL NOT NULL,
             `created_on` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
             `modified_on` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
             PRIMARY KEY (`{cls.primary_key}`),
             UNIQUE KEY (`manufacturer`),
-            INDEX (`manufacturer`)
+            INDEX (`manufacturer`),
+            INDEX (`manufacturer_reversed`),
+            FULLTEXT INDEX (`manufacturer`) WITH PARSER ngram
         )
         ENGINE = INNODB
         AUTO_INCREMENT = 0;"""
@@ -27,17 +34,24 @@ class Model(Base):
     alias: str = "mdl"
     primary_key: str = "model_id"
     query_columns: list[str] = ["model"]
+    column_types: dict[str, type] = {"model": str}
+    column_lengths: dict[str, int] = {"model": 128}
+    reversed_columns: list[str] = ["model"]
+    ngram_columns: list[str] = ["model"]
 
     @classmethod
     def get_create_table(cls) -> str:
         return f"""CREATE TABLE IF NOT EXISTS `vqe`.`{cls.table_name}` (
             `{cls.primary_key}` SMALLINT UNSIGNED AUTO_INCREMENT NOT NULL,
             `model` VARCHAR(128) NOT NULL,
+            `model_reversed` VARCHAR(128) AS (REVERSE(`model`)) VIRTUAL NOT NULL,
             `created_on` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
             `modified_on` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
             PRIMARY KEY (`{cls.primary_key}`),
             UNIQUE KEY (`model`),
-            INDEX (`model`)
+            INDEX (`model`),
+            INDEX (`model_reversed`),
+            FULLTEXT INDEX (`model`) WITH PARSER ngram
         )
         ENGINE = INNODB
         AUTO_INCREMENT = 0;"""
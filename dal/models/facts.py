@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from dal.models.base import Base
 from dal.models.dimensions import Manufacturer, Model
 
@@ -15,6 +17,24 @@ class Car(Base):
         "year",
     ]
     column_map: dict[str, str] = {"make": "manufacturer"}
+    column_types: dict[str, type] = {
+        "colour": str,
+        "engine_size": Decimal,
+        "horsepower": int,
+        "seats": int,
+        "top_speed": Decimal,
+        "year": int,
+    }
+    column_ranges: dict[str, tuple] = {
+        "engine_size": (0, Decimal("9.9")),
+        "horsepower": (0, 65535),
+        "seats": (0, 255),
+        "top_speed": (0, Decimal("9999.9")),
+        "year": (0, 65535),
+    }
+    column_lengths: dict[str, int] = {"colour": 64}
+    reversed_columns: list[str] = ["colour"]
+    ngram_columns: list[str] = ["colour"]
 
     @classmethod
     def get_create_table(cls) -> str:
@@ -23,6 +43,7 @@ class Car(Base):
             `{Manufacturer.primary_key}` SMALLINT UNSIGNED NOT NULL,
             `{Model.primary_key}` SMALLINT UNSIGNED NOT NULL,
             `colour` VARCHAR(64) NOT NULL,
+            `colour_reversed` VARCHAR(64) AS (REVERSE(`colour`)) VIRTUAL NOT NULL,
             `engine_size` DECIMAL(2,1) NOT NULL DEFAULT 0,
             `horsepower` SMALLINT UNSIGNED NOT NULL DEFAULT 0,
             `seats` TINYINT UNSIGNED NOT NULL DEFAULT 0,
@@ -42,6 +63,8 @@ class Car(Base):
                 `year`
             ),
             INDEX (`colour`),
+            INDEX (`colour_reversed`),
+            FULLTEXT INDEX (`colour`) WITH PARSER ngram,
             INDEX (`engine_size`),
             INDEX (`horsepower`),
             INDEX (`seats`),
@@ -91,6 +114,20 @@ class Bike(Base):
         "year",
     ]
     column_map: dict[str, str] = {"brand": "manufacturer"}
+    column_types: dict[str, type] = {
+        "gears": int,
+        "type": str,
+        "wheel_size": Decimal,
+        "year": int,
+    }
+    column_ranges: dict[str, tuple] = {
+        "gears": (0, 255),
+        "wheel_size": (0, Decimal("99.9")),
+        "year": (0, 65535),
+    }
+    column_choices: dict[str, list[str]] = {
+        "type": ["Road", "BMX", "City", "Mountain", "Hybrid"]
+    }
 
     @classmethod
     def get_create_table(cls) -> str:
@@ -162,6 +199,16 @@ class Spaceship(Base):
         "year",
     ]
     column_map: dict[str, str] = {"manufacturer": "manufacturer"}
+    column_types: dict[str, type] = {
+        "max_crew": int,
+        "top_speed": Decimal,
+        "year": int,
+    }
+    column_ranges: dict[str, tuple] = {
+        "max_crew": (0, 65535),
+        "top_speed": (0, Decimal("9.99999")),
+        "year": (0, 65535),
+    }
 
     @classmethod
     def get_create_table(cls) -> str:
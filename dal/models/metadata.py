@@ -0,0 +1,38 @@
+from dal.models.base import Base
+
+
+class DataVersion(Base):
+    """
+    Single row counting the writes to the vehicle data, see DataVersionTracker.
+    """
+
+    table_name: str = "data_version"
+    primary_key: str = "data_version_id"
+
+    @classmethod
+    def get_create_table(cls) -> str:
+        return f"""CREATE TABLE IF NOT EXISTS `vqe`.`{cls.table_name}` (
+            `{cls.primary_key}` TINYINT UNSIGNED NOT NULL,
+            `version` BIGINT UNSIGNED NOT NULL,
+            `modified_at` DATETIME NOT NULL,
+            PRIMARY KEY (`{cls.primary_key}`)
+        )
+        ENGINE = INNODB;"""
+
+
+class ScaffoldStep(Base):
+    """
+    A row per sample data file that scaffold finished loading, so an interrupted scaffold is resumed.
+    """
+
+    table_name: str = "scaffold_steps"
+    primary_key: str = "step"
+
+    @classmethod
+    def get_create_table(cls) -> str:
+        return f"""CREATE TABLE IF NOT EXISTS `vqe`.`{cls.table_name}` (
+            `{cls.primary_key}` VARCHAR(32) NOT NULL,
+            `completed_at` DATETIME NOT NULL,
+            PRIMARY KEY (`{cls.primary_key}`)
+        )
+        ENGINE = INNODB;"""
@@ -1,145 +1,481 @@
 import logging
-import json
+import os
+import re
+import time
 
+from contextlib import contextmanager
 from decimal import Decimal
-from typing import Optional
+from threading import Lock
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Union
+from weakref import WeakSet
 
 from sqlalchemy import create_engine, text
 
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from sqlalchemy.sql.elements import TextClause
 
 from dal.models.base import Base
 from dal.models.dimensions import Manufacturer, Model
 from dal.models.facts import Car, Bike, Spaceship
+from dal.models.metadata import ScaffoldStep
+from dal.data_version import DataVersionTracker, utc_now
+from dal.dimension_cache import DimensionCache
+from dal.ingestion import (
+    CheckpointStore,
+    JsonArrayReader,
+    RecordError,
+    chunked,
+    open_source,
+    validate_records,
+)
+from dal.pagination import Cursor, encode_cursor
+from dal.replicas import Replica, ReplicaRouter
+from dal.query_compiler import (
+    Aggregation,
+    CompiledQuery,
+    QueryCompiler,
+    output_name,
+)
+from dal.result_cache import ResultCache, result_cache
+from dal.rows import Rows
+from dal.slow_query_log import SlowQueryLog, slow_query_log
+from dal.workload import WorkloadRecorder, workload_recorder
+from helpers.config_helper import config
+from helpers.metrics_helper import errors_total, metrics, pool_checkout_seconds
+from helpers.timing_helper import timing
+
+
+class LoadReport(NamedTuple):
+    table_name: str
+    records: int
+    inserted: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds > 0 else float(self.records)
+
+
+class BatchReport(NamedTuple):
+    batch: int
+    received: int
+    inserted: int
+    duplicates: int
+    rejected: int
+    errors: list[RecordError]
+    seconds: float
+
+
+# deadlock and lock wait timeout, the transaction is rolled back and can be retried
+RETRYABLE_ERRORS = (1213, 1205)
+# MySQL client errors, e.g. the server cannot be reached or has gone away
+CLIENT_ERRORS = range(2000, 3000)
+
+# table and index accesses in EXPLAIN ANALYZE output, with the rows they read per loop
+_ACCESS = re.compile(
+    r"-> .*?(?:scan|lookup|search) on .*?\(actual time=[\d.]+\.\.[\d.]+ rows=([\d.]+) loops=(\d+)\)"
+)
+
+
+_pools: "WeakSet[Pool]" = WeakSet()
+
+
+def _pool_connections() -> list[tuple[tuple[str], int]]:
+    totals = {"in_use": 0, "idle": 0, "overflow": 0, "size": 0}
+    for pool in list(_pools):
+        # only queue pools track their connections
+        if not hasattr(pool, "checkedout"):
+            continue
+        totals["in_use"] += pool.checkedout()
+        totals["idle"] += pool.checkedin()
+        totals["overflow"] += max(0, pool.overflow())
+        totals["size"] += pool.size()
+    return [((state,), count) for state, count in totals.items()]
+
+
+def monitor_pool(pool: Pool) -> None:
+    """
+    Includes the connections of pool in the `vqe_db_pool_connections` gauge.
+    """
+    _pools.add(pool)
+
+
+metrics.gauge(
+    "vqe_db_pool_connections",
+    "Connections of the MySQLDal engine pools by state",
+    ["state"],
+    _pool_connections,
+)
+
+
+def create_pooled_engine(url: str) -> Engine:
+    """
+    Engine for url with the pool settings from the `VQE_DB_POOL_*` configuration.
+    """
+    engine = create_engine(
+        url,
+        pool_size=config.get_int("VQE_DB_POOL_SIZE", 2),
+        max_overflow=config.get_int("VQE_DB_MAX_OVERFLOW", 8),
+        pool_timeout=config.get_float("VQE_DB_POOL_TIMEOUT", 30.0),
+        pool_recycle=config.get_int("VQE_DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=config.get_bool("VQE_DB_POOL_PRE_PING", True),
+        pool_use_lifo=config.get_bool("VQE_DB_POOL_LIFO", False),
+    )
+    monitor_pool(engine.pool)
+    return engine
+
+
+class EngineRegistry:
+    """
+    One engine per database URL in the process, so every MySQLDal shares its connection pool.
+
+    A forked process, e.g. a gunicorn worker of a `--preload` app, drops the pooled connections it inherited
+    and opens its own when it first needs one.
+    """
+
+    def __init__(self) -> None:
+        self._engines: dict[str, Engine] = {}
+        self._lock = Lock()
+
+    def get(self, url: str) -> Engine:
+        with self._lock:
+            engine = self._engines.get(url)
+            if engine is None:
+                engine = self._engines[url] = create_pooled_engine(url)
+            return engine
+
+    def dispose(self, close: bool = True) -> None:
+        for engine in list(self._engines.values()):
+            engine.dispose(close=close)
+            # dispose replaces the pool
+            monitor_pool(engine.pool)
+
+    def after_fork(self) -> None:
+        self._lock = Lock()
+        # the parent still uses the inherited sockets, closing them here would break its connections
+        self.dispose(close=False)
+
+
+engines = EngineRegistry()
+os.register_at_fork(after_in_child=engines.after_fork)
+
+
+def _error_code(ex: OperationalError) -> Optional[int]:
+    return ex.orig.args[0] if ex.orig and ex.orig.args else None
+
+
+@contextmanager
+def _count_errors() -> Iterator[None]:
+    try:
+        yield
+    except SQLAlchemyError as ex:
+        errors_total.inc(source="db", type=type(ex).__name__)
+        raise
+
+
+def rows_examined(plan: str) -> int:
+    """
+    Rows read by the table and index accesses of an EXPLAIN ANALYZE plan.
+    """
+    return round(
+        sum(float(rows) * int(loops) for rows, loops in _ACCESS.findall(plan))
+    )
 
 
 class MySQLDal:
     engine: Engine
+    replicas: ReplicaRouter
+    compiler: QueryCompiler
+    dimensions: DimensionCache
+    versions: DataVersionTracker
+    result_cache: ResultCache = result_cache
+    workload: WorkloadRecorder = workload_recorder
+    slow_queries: SlowQueryLog = slow_query_log
+    # shared by every instance in the process, bumped whenever the data changes, see versions for the
+    # version shared by all processes
+    data_version: int = 0
     db_name: str = "vqe"
 
     def __init__(self) -> None:
         logging.info("Creating engine...")
-        self.engine = create_engine(
-            f"mysql+pymysql://root:root@db:3306",
-            pool_size=2,
-            max_overflow=8,
-            pool_pre_ping=True,
-            pool_recycle=1800,
+        self.engine = engines.get(
+            config.get_str("VQE_DATABASE_URL", "mysql+pymysql://root:root@db:3306")
+        )
+        self.replicas = ReplicaRouter(
+            [
+                Replica(engines.get(url.strip()))
+                for url in config.get_str("VQE_REPLICA_URLS", "").split(",")
+                if url.strip()
+            ],
+            config.get_float("VQE_REPLICA_MAX_LAG_SECONDS", 5.0),
+            config.get_float("VQE_REPLICA_CHECK_SECONDS", 5.0),
+        )
+        self.compiler = QueryCompiler(
+            self.db_name, config.get_int("VQE_QUERY_PLAN_CACHE_SIZE", 256)
+        )
+        self.dimensions = DimensionCache(
+            self, config.get_int("VQE_DIMENSION_ID_LIMIT", 1000)
         )
+        self.versions = DataVersionTracker(
+            self, config.get_float("VQE_DATA_VERSION_TTL_SECONDS", 1.0)
+        )
+        self.__dimension_ids: dict[str, dict[str, int]] = {}
+        self.__dimension_lock = Lock()
 
     def scaffold(self):
+        """
+        Creates and loads the database. The sample data files that were not completely loaded yet are
+        loaded again, resuming from their checkpoints.
+        """
         if self.database_exists(self.db_name):
+            # databases scaffolded before the data version was persisted
+            self.versions.create()
+            # databases scaffolded before the reversed columns and ngram indexes
+            self.migrate_schema()
+            if not self.table_exists(self.db_name, ScaffoldStep.table_name):
+                # scaffolded before its steps were recorded, which only happened once it completed
+                logging.info(f"{self.db_name} already exists, skipping scaffold...")
+                return
+        else:
+            logging.info(f"Scaffolding database {self.db_name}...")
+            self.create_schema()
+
+        completed = {
+            row[ScaffoldStep.primary_key]
+            for row in self.read_sql_query(
+                f"SELECT `{ScaffoldStep.primary_key}` FROM `{self.db_name}`.`{ScaffoldStep.table_name}`",
+                primary=True,
+            )
+        }
+        steps = [
+            ("spaceships", self.load_spaceships),
+            ("bikes", self.load_bikes),
+            ("cars", self.load_cars),
+        ]
+        for step, load in steps:
+            if step in completed:
+                continue
+            load()
+            self.execute(
+                f"INSERT IGNORE INTO `{self.db_name}`.`{ScaffoldStep.table_name}`"
+                f" (`{ScaffoldStep.primary_key}`, `completed_at`) VALUES (:step, :completed_at)",
+                {"step": step, "completed_at": utc_now().replace(tzinfo=None)},
+            )
+        if len(completed) == len(steps):
             logging.info(f"{self.db_name} already exists, skipping scaffold...")
-            return
 
-        logging.info(f"Scaffolding database {self.db_name}...")
+    def create_schema(self) -> None:
         self.execute(f"CREATE DATABASE `{self.db_name}`")
+        for cls in [Manufacturer, Model, Car, Bike, Spaceship, ScaffoldStep]:
+            self.execute(cls.get_create_table())
+        self.versions.create()
 
+    def migrate_schema(self) -> None:
+        """
+        Adds the reversed columns and ngram FULLTEXT indexes the query compiler relies on to tables created
+        before they were part of the schema. Structures that already exist are left untouched.
+        """
         for cls in [Manufacturer, Model, Car, Bike, Spaceship]:
-            self.execute(cls.get_create_table())
+            table = f"`{self.db_name}`.`{cls.table_name}`"
+            columns = self.column_names(self.db_name, cls.table_name)
+            for column in cls.reversed_columns:
+                if f"{column}_reversed" in columns:
+                    continue
+                logging.info(f"Adding {column}_reversed to {cls.table_name}...")
+                self.execute(
+                    f"ALTER TABLE {table}"
+                    f" ADD COLUMN `{column}_reversed` VARCHAR({cls.column_lengths[column]})"
+                    f" AS (REVERSE(`{column}`)) VIRTUAL NOT NULL,"
+                    f" ADD INDEX (`{column}_reversed`)"
+                )
+            fulltext = self.fulltext_columns(self.db_name, cls.table_name)
+            for column in cls.ngram_columns:
+                if column in fulltext:
+                    continue
+                logging.info(
+                    f"Adding the ngram index on {column} to {cls.table_name}..."
+                )
+                self.execute(
+                    f"ALTER TABLE {table} ADD FULLTEXT INDEX (`{column}`) WITH PARSER ngram"
+                )
+
+    def load_spaceships(self) -> LoadReport:
+        logging.info("Loading Spaceships...")
+        return self.load_file(Spaceship, self.__sample_data_path("spaceships.json"))
 
-        self.load_spaceships()
-        self.load_bikes()
-        self.load_cars()
+    def load_bikes(self) -> LoadReport:
+        logging.info("Loading Bikes...")
+        return self.load_file(Bike, self.__sample_data_path("bikes.json"))
 
-    def load_spaceships(self) -> None:
-        logging.info("Loading Spaceships...")
-        spaceships = self.__load_sample_data("spaceships.json")
-        self.load_manufacturers(spaceships, ":manufacturer")
-        self.load_models(spaceships)
-
-        query = f"""INSERT INTO `{self.db_name}`.`{Spaceship.table_name}`
-            (
-               `{Manufacturer.primary_key}`,
-               `{Model.primary_key}`,
-               `max_crew`,
-               `top_speed`,
-               `year`
+    def load_cars(self) -> LoadReport:
+        logging.info("Loading Cars...")
+        return self.load_file(Car, self.__sample_data_path("cars.json"))
+
+    def load_file(
+        self,
+        cls: Base,
+        path: str,
+        chunk_size: Optional[int] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ) -> LoadReport:
+        """
+        Streams a (optionally gzip compressed) JSON array of vehicles into the fact table of cls.
+
+        The first item is the schema description. A checkpoint is written after every committed chunk,
+        so an interrupted load resumes after the last chunk that was committed.
+        """
+        chunk_size = chunk_size or config.get_int("VQE_BULK_BATCH_SIZE", 5000)
+        checkpoints = checkpoints or CheckpointStore(
+            config.get_str("VQE_CHECKPOINT_DIR")
+        )
+        checkpoint = checkpoints.load(path)
+        if checkpoint:
+            logging.info(
+                f"Resuming {path} after {checkpoint.records} records (offset {checkpoint.offset})"
             )
-            SELECT
-                (
-                    SELECT `{Manufacturer.primary_key}` FROM `{self.db_name}`.`{Manufacturer.table_name}`
-                    WHERE `manufacturer` = :manufacturer
-                ) AS {Manufacturer.primary_key!r},
-                (
-                    SELECT `{Model.primary_key}` FROM `{self.db_name}`.`{Model.table_name}`
-                    WHERE `model` = :model
-                ) AS {Model.primary_key!r},
-                :max_crew,
-                :top_speed,
-                :year
-        """
-
-        self.execute_many(query, spaceships)
-
-    def load_bikes(self) -> None:
-        logging.info("Loading Bikes...")
-        bikes = self.__load_sample_data("bikes.json")
-        self.load_manufacturers(bikes, ":brand")
-        self.load_models(bikes)
-
-        query = f"""INSERT INTO `{self.db_name}`.`{Bike.table_name}`
-            (
-               `{Manufacturer.primary_key}`,
-               `{Model.primary_key}`,
-               `gears`,
-               `type`,
-               `wheel_size`,
-               `year`
+
+        started = time.perf_counter()
+        resumed = checkpoint.records if checkpoint else 0
+        records = 0
+        inserted = 0
+        with open_source(path) as stream:
+            reader = JsonArrayReader(stream, checkpoint.offset if checkpoint else 0)
+            if not checkpoint:
+                # first item in list is schema description
+                next(iter(reader), None)
+
+            for chunk in reader.chunks(chunk_size):
+                inserted += self.bulk_load(cls, chunk, chunk_size).inserted
+                records += len(chunk)
+                checkpoints.save(path, reader.offset, resumed + records)
+
+        checkpoints.clear(path)
+        report = LoadReport(
+            cls.table_name, records, inserted, time.perf_counter() - started
+        )
+        logging.info(
+            f"Loaded {path}: {report.inserted} new of {report.records} records"
+            f" in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/sec)"
+        )
+        return report
+
+    def ingest(
+        self, cls: Base, records: Iterable[Any], batch_size: Optional[int] = None
+    ) -> Iterator[BatchReport]:
+        """
+        Validates and writes records in batches of batch_size, yielding a report after each committed batch.
+
+        Invalid records are rejected individually, the rest of their batch is still written.
+        """
+        batch_size = batch_size or config.get_int("VQE_BULK_BATCH_SIZE", 5000)
+        received = 0
+        for number, batch in enumerate(chunked(records, batch_size)):
+            started = time.perf_counter()
+            valid, errors = validate_records(cls, batch, received)
+            inserted = self.bulk_load(cls, valid, batch_size).inserted if valid else 0
+            received += len(batch)
+            yield BatchReport(
+                number,
+                len(batch),
+                inserted,
+                len(valid) - inserted,
+                len(errors),
+                errors,
+                time.perf_counter() - started,
             )
-            SELECT
-                (
-                    SELECT `{Manufacturer.primary_key}` FROM `{self.db_name}`.`{Manufacturer.table_name}`
-                    WHERE `manufacturer` = :brand
-                ) AS {Manufacturer.primary_key!r},
-                (
-                    SELECT `{Model.primary_key}` FROM `{self.db_name}`.`{Model.table_name}`
-                    WHERE `model` = :model
-                ) AS {Model.primary_key!r},
-                :gears,
-                :type,
-                :wheel_size,
-                :year
-        """
-
-        self.execute_many(query, bikes)
-
-    def load_cars(self) -> None:
-        logging.info("Loading Cars...")
-        cars = self.__load_sample_data("cars.json")
-        self.load_manufacturers(cars, ":make")
-        self.load_models(cars)
-
-        query = f"""INSERT INTO `{self.db_name}`.`{Car.table_name}`
-            (
-               `{Manufacturer.primary_key}`,
-               `{Model.primary_key}`,
-               `colour`,
-               `engine_size`,
-               `horsepower`,
-               `seats`,
-               `top_speed`,
-               `year`
+
+    def bulk_load(
+        self, cls: Base, records: list[dict], batch_size: Optional[int] = None
+    ) -> LoadReport:
+        """
+        Inserts vehicle records into the fact table of cls in multi-row batches, committing each batch.
+
+        Manufacturers and models are upserted once per batch and resolved through an in-memory map
+        instead of subqueries per row. Records already present are skipped. Rows are written in unique
+        key order so concurrent batches lock index entries in the same order.
+        """
+        batch_size = batch_size or config.get_int("VQE_BULK_BATCH_SIZE", 5000)
+        manufacturer_field = output_name(cls, "manufacturer")
+        columns = [Manufacturer.primary_key, Model.primary_key] + cls.query_columns
+        query = (
+            f"INSERT IGNORE INTO `{self.db_name}`.`{cls.table_name}` (`{'`,`'.join(columns)}`)"
+            f" VALUES ({','.join(f':{c}' for c in columns)})"
+        )
+
+        started = time.perf_counter()
+        rows = 0
+        for i in range(0, len(records), batch_size):
+            batch = records[i : i + batch_size]
+            manufacturer_ids = self.resolve_dimension_ids(
+                Manufacturer, [r[manufacturer_field] for r in batch]
+            )
+            model_ids = self.resolve_dimension_ids(Model, [r["model"] for r in batch])
+            params = [
+                {
+                    Manufacturer.primary_key: manufacturer_ids[
+                        r[manufacturer_field].casefold()
+                    ],
+                    Model.primary_key: model_ids[r["model"].casefold()],
+                    **{c: r[c] for c in cls.query_columns},
+                }
+                for r in batch
+            ]
+            params.sort(key=lambda p: [p[c] for c in columns])
+            rows += self.execute_many(query, params)
+
+        report = LoadReport(
+            cls.table_name, len(records), rows, time.perf_counter() - started
+        )
+        logging.info(
+            f"Loaded {report.inserted} of {report.records} records into {report.table_name}"
+            f" in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/sec)"
+        )
+        self.data_changed(rows)
+        return report
+
+    def resolve_dimension_ids(self, cls: Base, names: list[str]) -> dict[str, int]:
+        """
+        Ids of the given dimension values keyed by their casefolded name, missing values are inserted.
+        """
+        column = cls.query_columns[0]
+        ids = self.__dimension_ids.setdefault(cls.table_name, {})
+        if all(n.casefold() in ids for n in names):
+            return ids
+
+        with self.__dimension_lock:
+            missing = sorted({n for n in names if n.casefold() not in ids})
+            if not missing:
+                return ids
+
+            self.load_dimension(
+                cls.table_name,
+                [column],
+                [f":{column}"],
+                [{column: n} for n in missing],
             )
-            SELECT
-                (
-                    SELECT `{Manufacturer.primary_key}` FROM `{self.db_name}`.`{Manufacturer.table_name}`
-                    WHERE `manufacturer` = :make
-                ) AS {Manufacturer.primary_key!r},
-                (
-                    SELECT `{Model.primary_key}` FROM `{self.db_name}`.`{Model.table_name}`
-                    WHERE `model` = :model
-                ) AS {Model.primary_key!r},
-                :colour,
-                :engine_size,
-                :horsepower,
-                :seats,
-                :top_speed,
-                :year
-        """
-
-        self.execute_many(query, cars)
+            rows = self.read_sql_query(
+                f"SELECT `{cls.primary_key}`, `{column}` FROM `{self.db_name}`.`{cls.table_name}`"
+                f" WHERE `{column}` IN :names",
+                {"names": missing},
+                primary=True,
+            )
+            for row in rows:
+                ids[row[column].casefold()] = row[cls.primary_key]
+
+            # the collation may also equate values that differ by more than case, e.g. accents
+            for name in missing:
+                if name.casefold() not in ids:
+                    ids[name.casefold()] = self.read_sql_query(
+                        f"SELECT `{cls.primary_key}` FROM `{self.db_name}`.`{cls.table_name}`"
+                        f" WHERE `{column}` = :name",
+                        {"name": name},
+                        primary=True,
+                    )[0][cls.primary_key]
+
+        return ids
 
     def load_models(self, data: list[dict]) -> int:
         return self.load_dimension(
@@ -168,112 +504,321 @@ class MySQLDal:
         )
 
         logging.info(f"Loaded {rows} into {table_name}")
+        self.data_changed(rows)
         return rows
 
+    def data_changed(self, rows: int = 1) -> None:
+        """
+        Called after writes, the persisted data version is bumped and caches are dropped when any rows changed.
+        """
+        if rows > 0:
+            self.versions.bump()
+            self.clear_caches()
+
+    def clear_caches(self) -> None:
+        """
+        Drops cached results and reloads in-memory data, after a write by this or another process. Reads go to
+        the primary until the replicas have caught up with the write.
+        """
+        MySQLDal.data_version += 1
+        self.result_cache.invalidate()
+        self.replicas.data_changed()
+
     def query(
         self,
         cls: Base,
-        query: Optional[dict] = None,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+    ) -> Rows:
+        """
+        Results are served from the shared result cache when possible and must be treated as read-only.
+        """
+        compiled = self.compiler.compile(cls, query)
+        cache_key = ("query", compiled.key, sort_field, sort_order)
+        with timing.phase("cache"):
+            results = self.result_cache.get(cache_key)
+        if results is not None:
+            return results
+
+        # a write while reading may leave the results between versions
+        generation = self.result_cache.generation
+        built = self.build_query(cls, compiled, sort_field, sort_order)
+        results = Rows((), [])
+        if built:
+            statement, params = built
+            started = time.perf_counter()
+            results = self.read_sql_rows(statement, params)
+            self.record_query(
+                compiled,
+                sort_field,
+                sort_order,
+                statement.text,
+                params,
+                time.perf_counter() - started,
+                len(results),
+            )
+        self.result_cache.set(cache_key, results, generation)
+        return results
+
+    def stream(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
         sort_field: Optional[str] = None,
         sort_order: Optional[str] = None,
-    ) -> dict:
-        columns = "`,`".join(cls.query_columns)
-        query_string = f"""
-            SELECT
-                `{columns}`,
-                {Manufacturer.alias}.`manufacturer` AS {[c for c, v in cls.column_map.items() if v == 'manufacturer'][0]!r},
-                {Model.alias}.`model`
-            FROM `{self.db_name}`.`{cls.table_name}` {cls.alias}
-            JOIN `{self.db_name}`.`{Manufacturer.table_name}` {Manufacturer.alias}
-                USING (`{Manufacturer.primary_key}`)
-            JOIN `{self.db_name}`.`{Model.table_name}` {Model.alias}
-                USING (`{Model.primary_key}`)
-        """
-
-        where = self.__build_where_clause(cls, query)
-        query_string += where[0]
-
-        if sort_field and sort_order:
-            query_string += f" ORDER BY `{sort_field}` {sort_order}"
-
-        logging.info(query_string)
-        logging.info(where[1])
-        return self.read_sql_query(query_string, where[1])
-
-    def __build_where_clause(
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Rows]:
+        """
+        Same as query, but yields the results in chunks read through a server-side cursor.
+        """
+        compiled = self.compiler.compile(cls, query)
+        built = self.build_query(cls, compiled, sort_field, sort_order)
+        if not built:
+            return iter([])
+        return self.__record_stream(
+            compiled, sort_field, sort_order, *built, chunk_size
+        )
+
+    def build_query(
         self,
         cls: Base,
-        query: Optional[dict] = None,
-    ) -> tuple[str, dict]:
-        if not query:
-            return "", {}
-
-        params = {}
-        parts = []
-
-        for column_name, column_value in query.items():
-            if (
-                "constraints" not in column_value
-                or len(column_value["constraints"]) < 1
-            ):
-                continue
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+    ) -> Optional[tuple[TextClause, dict]]:
+        """
+        Statement and params for the query, None when it cannot have any results.
+        """
+        with timing.phase("plan"):
+            compiled = self.dimensions.rewrite(self.compiler.compile(cls, query))
+            if compiled is None:
+                return None
+
+            plan = self.compiler.plan(compiled, sort_field, sort_order)
+            params = self.compiler.bind(plan, compiled)
+
+        return plan.statement, params
 
-            col = (
-                cls.column_map[column_name]
-                if column_name in cls.column_map
-                else column_name
+    def explain(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        analyze: bool = False,
+    ) -> list[dict]:
+        """
+        MySQL's EXPLAIN output for the statement query would run, empty when it would not run any.
+
+        With analyze the statement is run and the plan is annotated with actual timings and row counts.
+        """
+        built = self.build_query(cls, query, sort_field, sort_order)
+        if not built:
+            return []
+
+        statement, params = built
+        explain = "EXPLAIN ANALYZE" if analyze else "EXPLAIN"
+        return self.read_sql_query(f"{explain} {statement.text}", params)
+
+    def query_page(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[Cursor] = None,
+    ) -> tuple[Rows, Optional[str]]:
+        """
+        Keyset pagination on (sort_field, primary key), returns the page and the cursor for the next page.
+        """
+        sort_order = sort_order or "ASC"
+        compiled = self.compiler.compile(cls, query)
+        cache_key = ("page", compiled.key, sort_field, sort_order, limit, cursor)
+        with timing.phase("cache"):
+            page = self.result_cache.get(cache_key)
+        if page is not None:
+            return page
+
+        generation = self.result_cache.generation
+        built = self.build_page(compiled, sort_field, sort_order, limit, cursor)
+        if not built:
+            self.result_cache.set(cache_key, (Rows((), []), None), generation)
+            return Rows((), []), None
+
+        statement, params = built
+        started = time.perf_counter()
+        results = self.read_sql_rows(statement, params)
+        self.record_query(
+            compiled,
+            sort_field,
+            sort_order,
+            statement.text,
+            params,
+            time.perf_counter() - started,
+            len(results),
+            paginate=True,
+        )
+
+        page = self.complete_page(cls, results, sort_field, sort_order, limit)
+        self.result_cache.set(cache_key, page, generation)
+        return page
+
+    def build_page(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: str,
+        limit: int,
+        cursor: Optional[Cursor],
+    ) -> Optional[tuple[TextClause, dict]]:
+        """
+        Statement and params for a page of the query, None when it cannot have any results.
+        """
+        with timing.phase("plan"):
+            resolved = self.dimensions.rewrite(compiled)
+            if resolved is None:
+                return None
+
+            plan = self.compiler.plan(
+                resolved, sort_field, sort_order, paginate=True, seek=cursor is not None
+            )
+            params = self.compiler.bind(plan, resolved)
+            params["page_limit"] = limit + 1
+            if cursor is not None:
+                params["cursor_key"] = cursor.key
+                if sort_field:
+                    params["cursor_value"] = cursor.sort_value
+
+        return plan.statement, params
+
+    def complete_page(
+        self,
+        cls: Base,
+        results: Rows,
+        sort_field: Optional[str],
+        sort_order: str,
+        limit: int,
+    ) -> tuple[Rows, Optional[str]]:
+        """
+        Trims the extra row fetched to detect a next page and encodes the cursor for it.
+        """
+        page_key = self.compiler.page_key
+        page_sort_key = self.compiler.page_sort_key
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            last = results[-1]
+            sort_value = None
+            if sort_field:
+                sort_value = last[
+                    page_sort_key
+                    if page_sort_key in results.columns
+                    else output_name(cls, sort_field)
+                ]
+            next_cursor = encode_cursor(
+                Cursor(
+                    sort_field,
+                    sort_order,
+                    sort_value,
+                    last[page_key],
+                )
             )
-            op = column_value["operator"]
-            i = 0
-            inner_parts = []
-            for constraint in column_value["constraints"]:
-                value = constraint["value"]
-                param = f":arg_{col}_{i}"
-                if constraint["operator"] == "equals":
-                    inner_parts.append(f"`{col}` = {param}")
-                elif constraint["operator"] == "notEquals":
-                    inner_parts.append(f"`{col}` != {param}")
-                elif constraint["operator"] == "startsWith":
-                    inner_parts.append(f"`{col}` LIKE {param}")
-                    value = f"{constraint['value']}%"
-                elif constraint["operator"] == "endsWith":
-                    inner_parts.append(f"`{col}` LIKE {param}")
-                    value = f"%{constraint['value']}"
-                elif constraint["operator"] == "contains":
-                    inner_parts.append(f"`{col}` LIKE {param}")
-                    value = f"%{constraint['value']}%"
-                elif constraint["operator"] == "notContains":
-                    inner_parts.append(f"`{col}` NOT LIKE {param}")
-                    value = f"%{constraint['value']}%"
-                elif constraint["operator"] == "lt":
-                    inner_parts.append(f"`{col}` < {param}")
-                elif constraint["operator"] == "lte":
-                    inner_parts.append(f"`{col}` <= {param}")
-                elif constraint["operator"] == "gt":
-                    inner_parts.append(f"`{col}` > {param}")
-                elif constraint["operator"] == "gte":
-                    inner_parts.append(f"`{col}` >= {param}")
-                elif constraint["operator"] == "in":
-                    inner_parts.append(f"`{col}` IN {param}")
-                    if type(value) is not list:
-                        value = [value]
-                elif constraint["operator"] == "notIn":
-                    inner_parts.append(f"`{col}` NOT IN {param}")
-                    if type(value) is not list:
-                        value = [value]
-                params[param[1:]] = value
-                i += 1
-
-            parts.append(f"({f' {op} '.join(inner_parts)})")
-
-        if parts and len(parts) > 0:
-            return f" WHERE ({f' AND '.join(parts)})", params
-
-        return "", {}
+
+        results = results.without(page_key)
+        if page_sort_key in results.columns:
+            results = results.without(page_sort_key)
+        return results, next_cursor
+
+    def aggregate(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None],
+        aggregation: Aggregation,
+    ) -> Rows:
+        """
+        Metrics of the vehicles matching query per group, computed by MySQL. Without groups a single row is
+        returned, even when nothing matches.
+        """
+        compiled = self.compiler.compile(cls, query)
+        cache_key = ("aggregate", compiled.key, aggregation)
+        with timing.phase("cache"):
+            results = self.result_cache.get(cache_key)
+        if results is not None:
+            return results
+
+        generation = self.result_cache.generation
+        built = self.build_aggregate(compiled, aggregation)
+        if built:
+            statement, params = built
+            started = time.perf_counter()
+            results = self.read_sql_rows(statement, params)
+            self.record_query(
+                compiled,
+                None,
+                None,
+                statement.text,
+                params,
+                time.perf_counter() - started,
+                len(results),
+            )
+        else:
+            results = Rows(
+                aggregation.output_names(cls), aggregation.no_matches()
+            )
+        self.result_cache.set(cache_key, results, generation)
+        return results
+
+    def build_aggregate(
+        self, compiled: CompiledQuery, aggregation: Aggregation
+    ) -> Optional[tuple[TextClause, dict]]:
+        """
+        Statement and params for the aggregation of the query, None when no vehicles can match it.
+        """
+        with timing.phase("plan"):
+            resolved = self.dimensions.rewrite(compiled)
+            if resolved is None:
+                return None
+
+            plan = self.compiler.plan_aggregate(resolved, aggregation)
+            params = self.compiler.bind(plan, resolved)
+
+        return plan.statement, params
+
+    def table_exists(self, db_name: str, table_name: str) -> bool:
+        rows = self.read_sql_query(
+            "SELECT `TABLE_NAME` FROM `INFORMATION_SCHEMA`.`TABLES`"
+            " WHERE `TABLE_SCHEMA` = :db_name AND `TABLE_NAME` = :table_name",
+            {"db_name": db_name, "table_name": table_name},
+            primary=True,
+        )
+        return bool(rows)
+
+    def column_names(self, db_name: str, table_name: str) -> set[str]:
+        rows = self.read_sql_query(
+            "SELECT `COLUMN_NAME` FROM `INFORMATION_SCHEMA`.`COLUMNS`"
+            " WHERE `TABLE_SCHEMA` = :db_name AND `TABLE_NAME` = :table_name",
+            {"db_name": db_name, "table_name": table_name},
+            primary=True,
+        )
+        return {row["COLUMN_NAME"] for row in rows}
+
+    def fulltext_columns(self, db_name: str, table_name: str) -> set[str]:
+        rows = self.read_sql_query(
+            "SELECT `COLUMN_NAME` FROM `INFORMATION_SCHEMA`.`STATISTICS`"
+            " WHERE `TABLE_SCHEMA` = :db_name AND `TABLE_NAME` = :table_name"
+            " AND `INDEX_TYPE` = 'FULLTEXT'",
+            {"db_name": db_name, "table_name": table_name},
+            primary=True,
+        )
+        return {row["COLUMN_NAME"] for row in rows}
 
     def database_exists(self, db_name: str) -> bool:
         query_string = f"SELECT `SCHEMA_NAME` FROM `INFORMATION_SCHEMA`.`SCHEMATA` WHERE `SCHEMA_NAME` = :db_name"
-        result = self.read_sql_query(query_string, {"db_name": db_name})
+        result = self.read_sql_query(
+            query_string, {"db_name": db_name}, primary=True
+        )
         if result is None or not result or len(result) < 1:
             return False
         return True
@@ -281,39 +826,177 @@ class MySQLDal:
     def execute(
         self, query: str, params: Optional[dict] = None, return_row_id: bool = False
     ) -> int:
-        with self.get_session() as session:
-            result = session.connection().execute(text(query), params)
+        with _count_errors(), self.get_session() as session:
+            result = self.__connect(session).execute(text(query), params)
             session.commit()
             return result.lastrowid if return_row_id else result.rowcount
 
     def execute_many(self, query: str, params: list[dict]) -> int:
+        """
+        Executes query once for every set of params, INSERT ... VALUES statements are sent as multi-row inserts.
+
+        All params are written in one transaction, which is retried when it is rolled back by a deadlock.
+        """
+        if not params:
+            return 0
+
+        # a write is always attempted once
+        attempts = max(1, config.get_int("VQE_WRITE_ATTEMPTS", 3))
+        for attempt in range(1, attempts + 1):
+            try:
+                with _count_errors(), self.get_session() as session:
+                    result = self.__connect(session).execute(text(query), params)
+                    session.commit()
+                    return result.rowcount
+            except OperationalError as ex:
+                code = _error_code(ex)
+                if code not in RETRYABLE_ERRORS or attempt == attempts:
+                    raise
+                logging.warning(f"Retrying write after error {code}, attempt {attempt}")
+                time.sleep(0.05 * attempt)
+
+    def read_sql_query(
+        self,
+        query: Union[str, TextClause],
+        params: Optional[dict] = None,
+        primary: bool = False,
+    ) -> list[dict]:
+        return list(self.read_sql_rows(query, params, primary))
+
+    def read_sql_rows(
+        self,
+        query: Union[str, TextClause],
+        params: Optional[dict] = None,
+        primary: bool = False,
+    ) -> Rows:
+        """
+        Runs on a read replica when one is healthy, primary is for reads that must see the latest writes.
+        """
+        statement = text(query) if isinstance(query, str) else query
+        if not primary:
+            with self.replicas.acquire() as replica:
+                if replica is not None:
+                    try:
+                        return self.__read(replica.engine, statement, params)
+                    except OperationalError as ex:
+                        if _error_code(ex) not in CLIENT_ERRORS:
+                            raise
+                        self.replicas.mark_down(replica, ex)
+
+        return self.__read(self.engine, statement, params)
+
+    def stream_sql_query(
+        self,
+        query: Union[str, TextClause],
+        params: Optional[dict] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Rows]:
+        """
+        Streams from a read replica when one is healthy, falling back to the primary like read_sql_rows
+        as long as no chunk was yielded yet.
+        """
+        statement = text(query) if isinstance(query, str) else query
+        chunk_size = chunk_size or config.get_int("VQE_STREAM_CHUNK_SIZE", 1000)
+        with self.replicas.acquire() as replica:
+            if replica is not None:
+                chunks = self.__stream(replica.engine, statement, params, chunk_size)
+                try:
+                    first = next(chunks, None)
+                except OperationalError as ex:
+                    if _error_code(ex) not in CLIENT_ERRORS:
+                        raise
+                    self.replicas.mark_down(replica, ex)
+                else:
+                    if first is not None:
+                        yield first
+                        yield from chunks
+                    return
+
+        yield from self.__stream(self.engine, statement, params, chunk_size)
+
+    def get_session(self):
+        return Session(self.engine)
+
+    def record_query(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+        sql: str,
+        params: dict,
+        seconds: float,
+        rows: int,
+        paginate: bool = False,
+    ) -> None:
+        self.slow_queries.record(
+            compiled, sort_field, sort_order, sql, params, seconds, rows, paginate
+        )
+        self.workload.record(compiled, sort_field, sort_order, seconds, rows, paginate)
+
+    def __record_stream(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+        statement: TextClause,
+        params: dict,
+        chunk_size: Optional[int],
+    ) -> Iterator[Rows]:
+        # recorded once every chunk was read, with the time the whole stream took
+        started = time.perf_counter()
         rows = 0
-        with self.get_session() as session:
-            for p in params:
-                result = session.connection().execute(text(query), p)
-                rows += result.rowcount
-            session.commit()
+        for chunk in self.stream_sql_query(statement, params, chunk_size):
+            rows += len(chunk)
+            yield chunk
+        self.record_query(
+            compiled,
+            sort_field,
+            sort_order,
+            statement.text,
+            params,
+            time.perf_counter() - started,
+            rows,
+        )
 
-        return rows
+    def __connect(self, session: Session, **execution_options):
+        """
+        Checks out the session's connection, timing how long the pool made us wait for it.
+        """
+        started = time.perf_counter()
+        connection = session.connection(execution_options=execution_options or None)
+        pool_checkout_seconds.observe(time.perf_counter() - started)
+        return connection
 
-    def read_sql_query(self, query: str, params: Optional[dict] = None) -> list:
+    def __stream(
+        self,
+        engine: Engine,
+        statement: TextClause,
+        params: Optional[dict],
+        chunk_size: int,
+    ) -> Iterator[Rows]:
+        with _count_errors(), Session(engine) as session:
+            connection = self.__connect(
+                session, stream_results=True, max_row_buffer=chunk_size
+            )
+            raw_results = connection.execute(statement, params)
+            columns = tuple(raw_results.keys())
+            for partition in raw_results.partitions(chunk_size):
+                yield Rows(columns, [tuple(row) for row in partition])
+
+    def __read(
+        self, engine: Engine, statement: TextClause, params: Optional[dict]
+    ) -> Rows:
         raw_results = {}
-        with self.get_session() as session:
+        with timing.phase("db"), _count_errors(), Session(engine) as session:
             if params is None:
-                raw_results = session.connection().execute(text(query))
+                raw_results = self.__connect(session).execute(statement)
             else:
-                raw_results = session.connection().execute(text(query), params)
+                raw_results = self.__connect(session).execute(statement, params)
 
-        data = []
-        for row in raw_results:
-            data.append(row._asdict())
+        with timing.phase("materialize"):
+            return Rows(tuple(raw_results.keys()), [tuple(row) for row in raw_results])
 
-        return data
-
-    def get_session(self):
-        return Session(self.engine)
-
-    def __load_sample_data(self, file_name: str) -> list[dict]:
-        with open(f"/app/sample_data/{file_name}", encoding="utf-8") as f:
-            # first item in list is schema description
-            return json.load(f)[1:]
+    def __sample_data_path(self, file_name: str) -> str:
+        return os.path.join(
+            config.get_str("VQE_SAMPLE_DATA_PATH", "/app/sample_data"), file_name
+        )
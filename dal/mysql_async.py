@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+from typing import Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.elements import TextClause
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:  # pragma: no cover - greenlet is only needed for this DAL
+    create_async_engine = None
+
+from dal.data_version import Version
+from dal.models.base import Base
+from dal.mysql import MySQLDal, monitor_pool
+from dal.pagination import Cursor
+from dal.query_compiler import CompiledQuery
+from dal.rows import Rows
+from helpers.config_helper import config
+from helpers.metrics_helper import errors_total, pool_checkout_seconds
+
+
+class AsyncMySQLDal:
+    """
+    Asyncio counterpart of the MySQLDal queries, for the ASGI app.
+
+    Statements are built by the MySQLDal it wraps, so both share the query compiler, the dimension cache,
+    the result cache and the query logs. Only executing the statement is awaited, a query waiting on MySQL
+    or on a pooled connection does not hold a thread.
+    """
+
+    engine: "AsyncEngine"
+
+    def __init__(self, dal: MySQLDal) -> None:
+        if create_async_engine is None:
+            raise RuntimeError("The async DAL requires SQLAlchemy's asyncio extension")
+
+        self.dal = dal
+        self.engine = create_async_engine(
+            config.get_str(
+                "VQE_ASYNC_DATABASE_URL", "mysql+aiomysql://root:root@db:3306"
+            ),
+            pool_size=config.get_int("VQE_ASYNC_POOL_SIZE", 10),
+            max_overflow=config.get_int("VQE_ASYNC_MAX_OVERFLOW", 40),
+            pool_pre_ping=True,
+            pool_recycle=1800,
+        )
+        monitor_pool(self.engine.sync_engine.pool)
+
+    async def current_version(self) -> Version:
+        """
+        The version of the vehicle data, see DataVersionTracker.current. Reading it drops the caches when
+        another process changed the data.
+        """
+        versions = self.dal.versions
+        if versions.expired():
+            return await asyncio.to_thread(versions.current)
+        return versions.current()
+
+    async def query(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+    ) -> Rows:
+        """
+        Results are served from the shared result cache when possible and must be treated as read-only.
+        """
+        dal = self.dal
+        compiled = dal.compiler.compile(cls, query)
+        cache_key = ("query", compiled.key, sort_field, sort_order)
+        results = dal.result_cache.get(cache_key)
+        if results is not None:
+            return results
+
+        await self.__load_dimensions()
+        built = dal.build_query(cls, compiled, sort_field, sort_order)
+        results = Rows((), [])
+        if built:
+            statement, params = built
+            started = time.perf_counter()
+            results = await self.read_sql_rows(statement, params)
+            dal.record_query(
+                compiled,
+                sort_field,
+                sort_order,
+                statement.text,
+                params,
+                time.perf_counter() - started,
+                len(results),
+            )
+        dal.result_cache.set(cache_key, results)
+        return results
+
+    async def query_page(
+        self,
+        cls: Base,
+        query: Union[CompiledQuery, dict, None] = None,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[Cursor] = None,
+    ) -> tuple[Rows, Optional[str]]:
+        dal = self.dal
+        sort_order = sort_order or "ASC"
+        compiled = dal.compiler.compile(cls, query)
+        cache_key = ("page", compiled.key, sort_field, sort_order, limit, cursor)
+        page = dal.result_cache.get(cache_key)
+        if page is not None:
+            return page
+
+        await self.__load_dimensions()
+        built = dal.build_page(compiled, sort_field, sort_order, limit, cursor)
+        if not built:
+            dal.result_cache.set(cache_key, (Rows((), []), None))
+            return Rows((), []), None
+
+        statement, params = built
+        started = time.perf_counter()
+        results = await self.read_sql_rows(statement, params)
+        dal.record_query(
+            compiled,
+            sort_field,
+            sort_order,
+            statement.text,
+            params,
+            time.perf_counter() - started,
+            len(results),
+            paginate=True,
+        )
+
+        page = dal.complete_page(cls, results, sort_field, sort_order, limit)
+        dal.result_cache.set(cache_key, page)
+        return page
+
+    async def read_sql_rows(
+        self, query: Union[str, TextClause], params: Optional[dict] = None
+    ) -> Rows:
+        statement = text(query) if isinstance(query, str) else query
+        try:
+            started = time.perf_counter()
+            async with self.engine.connect() as connection:
+                pool_checkout_seconds.observe(time.perf_counter() - started)
+                raw_results = await connection.execute(statement, params)
+                return Rows(
+                    tuple(raw_results.keys()), [tuple(row) for row in raw_results]
+                )
+        except SQLAlchemyError as ex:
+            errors_total.inc(source="db", type=type(ex).__name__)
+            raise
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+
+    async def __load_dimensions(self) -> None:
+        # the dimension tables are small and rarely reloaded, that happens on the sync engine in a thread
+        dimensions = self.dal.dimensions
+        if dimensions.enabled and dimensions.loaded_version != self.dal.data_version:
+            await asyncio.to_thread(dimensions.load)
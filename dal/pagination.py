@@ -0,0 +1,74 @@
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+from typing import Any, NamedTuple, Optional
+
+from dal.models.base import Base
+from dal.query_compiler import QueryValidationError, coerce_value, resolve_field
+
+
+class Cursor(NamedTuple):
+    sort_field: Optional[str]
+    sort_order: str
+    sort_value: Any
+    key: int
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    payload = json.dumps(
+        {
+            "f": cursor.sort_field,
+            "o": cursor.sort_order,
+            "v": (
+                str(cursor.sort_value)
+                if isinstance(cursor.sort_value, Decimal)
+                else cursor.sort_value
+            ),
+            "k": cursor.key,
+        },
+        separators=(",", ":"),
+    )
+    return urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(content: str) -> Cursor:
+    """
+    Decodes an opaque cursor string, raises ValueError when it is malformed.
+    """
+    try:
+        padded = content + "=" * (-len(content) % 4)
+        payload = json.loads(urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError) as ex:
+        raise ValueError("Cursor is not valid") from ex
+
+    if (
+        not isinstance(payload, dict)
+        or payload.get("o") not in ("ASC", "DESC")
+        or type(payload.get("k")) is not int
+        or not isinstance(payload.get("f"), (str, type(None)))
+        or type(payload.get("v")) not in (str, int, float, type(None))
+    ):
+        raise ValueError("Cursor is not valid")
+
+    return Cursor(payload["f"], payload["o"], payload.get("v"), payload["k"])
+
+
+def coerce_cursor(cls: type[Base], cursor: Cursor) -> Cursor:
+    """
+    Converts the sort value of a decoded cursor to the type of its sort column, raises ValueError when it cannot be.
+    """
+    if cursor.sort_field is None:
+        return cursor
+
+    resolved = resolve_field(cls, cursor.sort_field)
+    if resolved is None:
+        raise ValueError("Cursor is not valid")
+    model, column = resolved
+    try:
+        value = coerce_value(
+            cursor.sort_field, model.column_types[column], cursor.sort_value
+        )
+    except QueryValidationError as ex:
+        raise ValueError("Cursor is not valid") from ex
+    return cursor._replace(sort_value=value)
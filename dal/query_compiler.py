@@ -0,0 +1,713 @@
+import re
+
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from threading import Lock
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Union
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+from dal.models.base import Base
+from dal.models.dimensions import Manufacturer, Model
+
+
+class QueryValidationError(ValueError):
+    def __init__(self, message: str, field: str = "query") -> None:
+        super().__init__(message)
+        self.field = field
+        self.message = message
+
+
+class Constraint(NamedTuple):
+    operator: str
+    value: Any
+    # how the constraint is lowered when it depends on the value, e.g. "ngram" for indexable contains
+    variant: str = ""
+
+
+class ColumnFilter(NamedTuple):
+    field: str
+    model: type[Base]
+    column: str
+    operator: str
+    constraints: tuple[Constraint, ...]
+
+
+class CompiledQuery(NamedTuple):
+    """
+    Validated and typed form of the `query` JSON supplied to the vehicle endpoints.
+    """
+
+    cls: type[Base]
+    filters: tuple[ColumnFilter, ...]
+    # columns of the results in select order, every column when empty
+    fields: tuple[str, ...] = ()
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(
+            (
+                f.column,
+                f.operator,
+                tuple((c.operator, c.variant) for c in f.constraints),
+            )
+            for f in self.filters
+        )
+
+    @property
+    def key(self) -> tuple:
+        """
+        Hashable, normalized form of the query including its values.
+        """
+        return (
+            self.cls.__name__,
+            tuple(
+                (
+                    f.column,
+                    f.operator,
+                    tuple(
+                        (
+                            c.operator,
+                            tuple(c.value) if isinstance(c.value, list) else c.value,
+                        )
+                        for c in f.constraints
+                    ),
+                )
+                for f in self.filters
+            ),
+            self.fields,
+        )
+
+    @property
+    def values(self) -> tuple:
+        return tuple(c.value for f in self.filters for c in f.constraints)
+
+    def as_query(self) -> dict:
+        """
+        The `query` JSON this compiles from, numbers are written as strings to keep their precision.
+        """
+
+        def dump(value: Any) -> Any:
+            if isinstance(value, list):
+                return [dump(v) for v in value]
+            return str(value) if isinstance(value, Decimal) else value
+
+        return {
+            f.field: {
+                "operator": f.operator,
+                "constraints": [
+                    {"operator": c.operator, "value": dump(c.value)}
+                    for c in f.constraints
+                ],
+            }
+            for f in self.filters
+        }
+
+
+class Metric(NamedTuple):
+    function: str
+    # numeric column of the fact table, empty for count
+    column: str = ""
+
+    @property
+    def name(self) -> str:
+        return f"{self.function}_{self.column}" if self.column else self.function
+
+
+class Aggregation(NamedTuple):
+    """
+    Validated and typed form of the `group_by` and `metrics` supplied to the aggregate endpoints.
+    """
+
+    # columns in select order, no grouping when empty
+    group_by: tuple[str, ...]
+    metrics: tuple[Metric, ...]
+
+    def output_names(self, cls: type[Base]) -> tuple[str, ...]:
+        return tuple(output_name(cls, c) for c in self.group_by) + tuple(
+            m.name for m in self.metrics
+        )
+
+    def no_matches(self) -> list[tuple]:
+        """
+        Rows of the aggregation when no vehicles match, without groups that is a count of 0.
+        """
+        if self.group_by:
+            return []
+        return [tuple(0 if m.function == "count" else None for m in self.metrics)]
+
+
+class QueryPlan(NamedTuple):
+    sql: str
+    statement: TextClause
+    # per constraint, the parameters it binds and how its value is transformed for each
+    binders: tuple[tuple[tuple[str, Callable[[Any], Any]], ...], ...]
+
+
+def _escape_like(value: str) -> str:
+    """
+    Escapes the LIKE wildcards in value with MySQL's default escape character, so it only matches literally.
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like_prefix(value: str) -> str:
+    return f"{_escape_like(value)}%"
+
+
+def _like_suffix(value: str) -> str:
+    return f"%{_escape_like(value)}"
+
+
+def _like_substring(value: str) -> str:
+    return f"%{_escape_like(value)}%"
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _reversed_prefix(value: str) -> str:
+    # escaped after reversing, an escape character must precede the character it escapes
+    return f"{_escape_like(value[::-1])}%"
+
+
+def _ngram_phrase(value: str) -> str:
+    return f'"{value}"'
+
+
+# operator -> (SQL template, value transform, kind of value expected)
+OPERATORS: dict[str, tuple[str, Callable[[Any], Any], str]] = {
+    "equals": ("{column} = {param}", _identity, "scalar"),
+    "notEquals": ("{column} != {param}", _identity, "scalar"),
+    "startsWith": ("{column} LIKE {param}", _like_prefix, "text"),
+    "endsWith": ("{column} LIKE {param}", _like_suffix, "text"),
+    "contains": ("{column} LIKE {param}", _like_substring, "text"),
+    "notContains": ("{column} NOT LIKE {param}", _like_substring, "text"),
+    "lt": ("{column} < {param}", _identity, "scalar"),
+    "lte": ("{column} <= {param}", _identity, "scalar"),
+    "gt": ("{column} > {param}", _identity, "scalar"),
+    "gte": ("{column} >= {param}", _identity, "scalar"),
+    "in": ("{column} IN {param}", _identity, "list"),
+    "notIn": ("{column} NOT IN {param}", _identity, "list"),
+}
+
+LOGICAL_OPERATORS = ("AND", "OR")
+
+# function -> SQL template over the qualified column
+AGGREGATES: dict[str, str] = {
+    "count": "COUNT(*)",
+    "min": "MIN({column})",
+    "max": "MAX({column})",
+    "avg": "AVG({column})",
+    "sum": "SUM({column})",
+}
+
+_METRIC = re.compile(r"^(\w+)\((\w+)\)$")
+
+_INTEGER = re.compile(r"^[+-]?\d+$")
+
+# must match the ngram_token_size the MySQL server runs with
+NGRAM_TOKEN_SIZE = 2
+
+
+def reversed_column(column: str) -> str:
+    return f"{column}_reversed"
+
+
+def _variant(model: type[Base], column: str, operator: str, value: Any) -> str:
+    # the ngram index cannot find values shorter than a token, or phrases split by delimiters
+    if (
+        operator == "contains"
+        and column in model.ngram_columns
+        and len(value) >= NGRAM_TOKEN_SIZE
+        and value.isalnum()
+    ):
+        return "ngram"
+    return ""
+
+
+def lower_constraint(
+    model: type[Base], column: str, constraint: Constraint, name: str
+) -> tuple[str, tuple[tuple[str, Callable[[Any], Any]], ...]]:
+    """
+    SQL for a single constraint and the parameters it binds.
+
+    Suffix matches seek the reversed generated column, substring matches are narrowed with the
+    ngram FULLTEXT index before the exact LIKE.
+    """
+    qualified = qualify_column(model, column)
+    if constraint.operator == "endsWith" and column in model.reversed_columns:
+        return (
+            f"{qualify_column(model, reversed_column(column))} LIKE :{name}",
+            ((name, _reversed_prefix),),
+        )
+
+    if constraint.variant == "ngram":
+        return (
+            f"(MATCH ({qualified}) AGAINST (:{name}_ft IN BOOLEAN MODE)"
+            f" AND {qualified} LIKE :{name})",
+            ((f"{name}_ft", _ngram_phrase), (name, _like_substring)),
+        )
+
+    template, transform, _ = OPERATORS[constraint.operator]
+    return template.format(column=qualified, param=f":{name}"), ((name, transform),)
+
+
+def resolve_field(cls: type[Base], field: str) -> Optional[tuple[type[Base], str]]:
+    """
+    Returns the model and physical column a query or sort field refers to.
+    """
+    column = cls.column_map.get(field, field)
+    for model in (cls, Manufacturer, Model):
+        if column in model.query_columns:
+            return model, column
+    return None
+
+
+def result_columns(cls: type[Base]) -> list[tuple[type[Base], str]]:
+    """
+    Model and column of every field in the results of cls, in select order.
+    """
+    return [(cls, c) for c in cls.query_columns] + [
+        (Manufacturer, "manufacturer"),
+        (Model, "model"),
+    ]
+
+
+def qualify_column(model: type[Base], column: str) -> str:
+    return f"{model.alias}.`{column}`"
+
+
+def output_name(cls: type[Base], field: str) -> str:
+    """
+    Name of the result key a field is returned under, e.g. `manufacturer` is `make` for cars.
+    """
+    if field in Manufacturer.query_columns:
+        return [c for c, v in cls.column_map.items() if v == "manufacturer"][0]
+    return field
+
+
+def coerce_value(field: str, column_type: type, value: Any) -> Any:
+    """
+    Converts a JSON value to the type of a column, raising QueryValidationError when it cannot be.
+    """
+    if isinstance(value, (dict, list)) or value is None:
+        raise QueryValidationError(f"Value for `{field}` must be a single value.")
+
+    if column_type is str:
+        if isinstance(value, bool):
+            raise QueryValidationError(f"Value for `{field}` must be text.")
+        return value if isinstance(value, str) else str(value)
+
+    if column_type is int:
+        if isinstance(value, bool):
+            raise QueryValidationError(f"Value for `{field}` must be a whole number.")
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and _INTEGER.match(value.strip()):
+            return int(value)
+        raise QueryValidationError(f"Value for `{field}` must be a whole number.")
+
+    if isinstance(value, bool):
+        raise QueryValidationError(f"Value for `{field}` must be a number.")
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise QueryValidationError(f"Value for `{field}` must be a number.")
+    if not number.is_finite():
+        raise QueryValidationError(f"Value for `{field}` must be a number.")
+    return number
+
+
+def _compile_constraint(
+    field: str, model: type[Base], column: str, constraint: Any
+) -> Constraint:
+    if (
+        not isinstance(constraint, dict)
+        or "operator" not in constraint
+        or "value" not in constraint
+    ):
+        raise QueryValidationError(
+            f"Constraints for `{field}` must have an operator and a value."
+        )
+
+    operator = constraint["operator"]
+    if operator not in OPERATORS:
+        raise QueryValidationError(
+            f"Constraint operator `{operator}` for `{field}` is not supported."
+        )
+
+    value = constraint["value"]
+    column_type = model.column_types[column]
+    kind = OPERATORS[operator][2]
+    if kind == "text":
+        value = coerce_value(field, str, value)
+        return Constraint(operator, value, _variant(model, column, operator, value))
+
+    if kind == "list":
+        values = value if isinstance(value, list) else [value]
+        if len(values) < 1:
+            raise QueryValidationError(
+                f"Value for `{field}` must contain at least one item."
+            )
+        return Constraint(
+            operator, [coerce_value(field, column_type, v) for v in values]
+        )
+
+    return Constraint(operator, coerce_value(field, column_type, value))
+
+
+def compile_fields(
+    cls: type[Base], fields: Optional[str], name: str = "fields"
+) -> tuple[str, ...]:
+    """
+    Validates the comma separated `fields` against the columns of cls, returns their columns in select order.
+
+    name is the parameter the fields were supplied in, errors are reported for it.
+    """
+    if fields is None:
+        return ()
+
+    requested = set()
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            raise QueryValidationError(
+                f"`{name}` must be a comma separated list of field names.", name
+            )
+        resolved = resolve_field(cls, field)
+        if resolved is None:
+            raise QueryValidationError(
+                f"Field `{field}` was not in available list of columns.", name
+            )
+        requested.add(resolved[1])
+
+    return tuple(c for _, c in result_columns(cls) if c in requested)
+
+
+def compile_metric(cls: type[Base], metric: str) -> Metric:
+    if metric == "count":
+        return Metric(metric)
+
+    match = _METRIC.match(metric)
+    if not match or match.group(1) not in AGGREGATES or match.group(1) == "count":
+        raise QueryValidationError(
+            f"Metric `{metric}` must be `count` or one of"
+            f" {', '.join(f'{f}(field)' for f in AGGREGATES if f != 'count')}.",
+            "metrics",
+        )
+
+    function, column = match.groups()
+    if cls.column_types.get(column, str) is str or column not in cls.query_columns:
+        raise QueryValidationError(
+            f"Metric field `{column}` was not in available list of numeric columns.",
+            "metrics",
+        )
+    return Metric(function, column)
+
+
+def compile_aggregation(
+    cls: type[Base], group_by: Optional[str], metrics: Optional[str]
+) -> Aggregation:
+    """
+    Validates the comma separated `group_by` fields and `metrics` against the columns of cls, raises
+    QueryValidationError when either is not valid. Without metrics the groups are counted.
+    """
+    compiled = []
+    for metric in (metrics or "count").split(","):
+        metric = compile_metric(cls, metric.strip())
+        if metric not in compiled:
+            compiled.append(metric)
+
+    return Aggregation(compile_fields(cls, group_by, "group_by"), tuple(compiled))
+
+
+def compile_query(
+    cls: type[Base], query: Optional[dict], fields: Optional[str] = None
+) -> CompiledQuery:
+    """
+    Validates the `query` JSON and `fields` against the columns of cls, raises QueryValidationError when either is
+    not valid.
+    """
+    selected = compile_fields(cls, fields)
+    if not query:
+        return CompiledQuery(cls, (), selected)
+
+    if not isinstance(query, dict):
+        raise QueryValidationError(
+            "Invalid query supplied, see Examples for query payload."
+        )
+
+    filters = []
+    for field in sorted(query):
+        column_value = query[field]
+        resolved = resolve_field(cls, field)
+        if resolved is None:
+            raise QueryValidationError(
+                f"Query field `{field}` was not in available list of columns."
+            )
+
+        if not isinstance(column_value, dict):
+            raise QueryValidationError(
+                f"Query for `{field}` must have an operator and constraints."
+            )
+
+        constraints = column_value.get("constraints")
+        if not constraints:
+            continue
+        if not isinstance(constraints, list):
+            raise QueryValidationError(f"Constraints for `{field}` must be a list.")
+
+        operator = str(column_value.get("operator", "AND")).upper()
+        if operator not in LOGICAL_OPERATORS:
+            raise QueryValidationError(
+                f"Operator for `{field}` must be one of {', '.join(LOGICAL_OPERATORS)}."
+            )
+
+        model, column = resolved
+        filters.append(
+            ColumnFilter(
+                field,
+                model,
+                column,
+                operator,
+                tuple(
+                    _compile_constraint(field, model, column, c) for c in constraints
+                ),
+            )
+        )
+
+    return CompiledQuery(cls, tuple(filters), selected)
+
+
+class QueryCompiler:
+    """
+    Lowers compiled queries to SQL, plans are cached by query shape so only the values change between requests.
+    """
+
+    page_key: str = "__page_key"
+    # the sort value of a page's last row, selected when the sort field is not one of the fields
+    page_sort_key: str = "__page_sort"
+
+    def __init__(self, db_name: str, max_plans: int = 256) -> None:
+        self.db_name = db_name
+        self.max_plans = max_plans
+        self._plans: OrderedDict[tuple, QueryPlan] = OrderedDict()
+        self._lock = Lock()
+
+    def compile(
+        self, cls: type[Base], query: Union[CompiledQuery, dict, None]
+    ) -> CompiledQuery:
+        if isinstance(query, CompiledQuery):
+            return query
+        return compile_query(cls, query)
+
+    def plan(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        paginate: bool = False,
+        seek: bool = False,
+    ) -> QueryPlan:
+        key = (
+            compiled.cls.__name__,
+            compiled.shape,
+            compiled.fields,
+            sort_field,
+            sort_order,
+            paginate,
+            seek,
+        )
+        return self.__cached(
+            key,
+            lambda: self.__lower(compiled, sort_field, sort_order, paginate, seek),
+        )
+
+    def plan_aggregate(
+        self, compiled: CompiledQuery, aggregation: Aggregation
+    ) -> QueryPlan:
+        key = ("aggregate", compiled.cls.__name__, compiled.shape, aggregation)
+        return self.__cached(key, lambda: self.__lower_aggregate(compiled, aggregation))
+
+    def bind(self, plan: QueryPlan, compiled: CompiledQuery) -> dict:
+        params = {}
+        for binders, value in zip(plan.binders, compiled.values):
+            for name, transform in binders:
+                params[name] = transform(value)
+        return params
+
+    def plan_count(self) -> int:
+        return len(self._plans)
+
+    def __cached(self, key: tuple, lower: Callable[[], QueryPlan]) -> QueryPlan:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        plan = lower()
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def __conditions(self, compiled: CompiledQuery) -> tuple[list[str], list]:
+        """
+        A condition per filter of the query and the binders of their constraints.
+        """
+        binders = []
+        conditions = []
+        for i, column_filter in enumerate(compiled.filters):
+            inner_parts = []
+            for j, constraint in enumerate(column_filter.constraints):
+                part, constraint_binders = lower_constraint(
+                    column_filter.model,
+                    column_filter.column,
+                    constraint,
+                    f"arg_{i}_{j}",
+                )
+                inner_parts.append(part)
+                binders.append(constraint_binders)
+            conditions.append(f"({f' {column_filter.operator} '.join(inner_parts)})")
+        return conditions, binders
+
+    def __lower(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+        paginate: bool,
+        seek: bool,
+    ) -> QueryPlan:
+        cls = compiled.cls
+        key_column = qualify_column(cls, cls.primary_key)
+        extra_columns = [f"{key_column} AS `{self.page_key}`"] if paginate else []
+        # every fact row has exactly one row in each dimension, so a join is only needed for the dimension
+        # columns selected, filtered or sorted on
+        models = {f.model for f in compiled.filters}
+
+        sort_column = None
+        if sort_field:
+            model, column = resolve_field(cls, sort_field)
+            sort_column = qualify_column(model, column)
+            models.add(model)
+            if paginate and compiled.fields and column not in compiled.fields:
+                extra_columns.append(f"{sort_column} AS `{self.page_sort_key}`")
+
+        for model, column in result_columns(cls):
+            if not compiled.fields or column in compiled.fields:
+                models.add(model)
+
+        sql = self.build_select(
+            cls,
+            *extra_columns,
+            fields=compiled.fields,
+            dimensions=[m for m in (Manufacturer, Model) if m in models],
+        )
+
+        conditions, binders = self.__conditions(compiled)
+
+        if paginate:
+            sort_order = sort_order or "ASC"
+            if seek:
+                comparison = ">" if sort_order == "ASC" else "<"
+                if sort_column:
+                    conditions.append(
+                        f"({sort_column} {comparison} :cursor_value"
+                        f" OR ({sort_column} = :cursor_value AND {key_column} {comparison} :cursor_key))"
+                    )
+                else:
+                    conditions.append(f"({key_column} {comparison} :cursor_key)")
+
+        if conditions:
+            sql += f" WHERE ({' AND '.join(conditions)})"
+
+        if paginate:
+            order_by = f"{key_column} {sort_order}"
+            if sort_column:
+                order_by = f"{sort_column} {sort_order}, {order_by}"
+            sql += f" ORDER BY {order_by} LIMIT :page_limit"
+        elif sort_column and sort_order:
+            sql += f" ORDER BY {sort_column} {sort_order}"
+
+        return QueryPlan(sql, text(sql), tuple(binders))
+
+    def __lower_aggregate(
+        self, compiled: CompiledQuery, aggregation: Aggregation
+    ) -> QueryPlan:
+        cls = compiled.cls
+        models = {f.model for f in compiled.filters}
+        groups = []
+        columns = []
+        for model, column in result_columns(cls):
+            if column in aggregation.group_by:
+                models.add(model)
+                groups.append(qualify_column(model, column))
+                name = output_name(cls, column)
+                alias = f" AS `{name}`" if name != column else ""
+                columns.append(f"{groups[-1]}{alias}")
+        for metric in aggregation.metrics:
+            function = AGGREGATES[metric.function].format(
+                column=qualify_column(cls, metric.column) if metric.column else ""
+            )
+            columns.append(f"{function} AS `{metric.name}`")
+
+        select = ",\n                ".join(columns)
+        dimensions = [m for m in (Manufacturer, Model) if m in models]
+        sql = f"""
+            SELECT
+                {select}
+            FROM {self.build_from(cls, dimensions)}
+        """
+
+        conditions, binders = self.__conditions(compiled)
+        if conditions:
+            sql += f" WHERE ({' AND '.join(conditions)})"
+        if groups:
+            sql += f" GROUP BY {', '.join(groups)} ORDER BY {', '.join(groups)}"
+
+        return QueryPlan(sql, text(sql), tuple(binders))
+
+    def build_select(
+        self,
+        cls: type[Base],
+        *extra_columns: str,
+        fields: tuple[str, ...] = (),
+        dimensions: Sequence[type[Base]] = (Manufacturer, Model),
+    ) -> str:
+        """
+        SELECT of the fields of cls, every field when empty, from the fact table joined to dimensions.
+        """
+        columns = []
+        for model, column in result_columns(cls):
+            if fields and column not in fields:
+                continue
+            name = output_name(cls, column)
+            alias = f" AS `{name}`" if name != column else ""
+            columns.append(f"{qualify_column(model, column)}{alias}")
+
+        select = ",\n                ".join(columns + list(extra_columns))
+        return f"""
+            SELECT
+                {select}
+            FROM {self.build_from(cls, dimensions)}
+        """
+
+    def build_from(
+        self, cls: type[Base], dimensions: Sequence[type[Base]] = (Manufacturer, Model)
+    ) -> str:
+        """
+        The fact table of cls joined to dimensions.
+        """
+        joins = "".join(f"""
+            JOIN `{self.db_name}`.`{model.table_name}` {model.alias}
+                USING (`{model.primary_key}`)""" for model in dimensions)
+        return f"`{self.db_name}`.`{cls.table_name}` {cls.alias}{joins}"
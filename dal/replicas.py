@@ -0,0 +1,177 @@
+import logging
+import time
+
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Iterator, Optional
+from weakref import WeakSet
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from helpers.metrics_helper import metrics
+
+
+def replica_lag(engine: Engine) -> Optional[float]:
+    """
+    Seconds the replica is behind its source, None when it is not replicating.
+    """
+    with engine.connect() as connection:
+        row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+    if row is None or row["Seconds_Behind_Source"] is None:
+        return None
+    return float(row["Seconds_Behind_Source"])
+
+
+class Replica:
+    def __init__(
+        self,
+        engine: Engine,
+        name: Optional[str] = None,
+        probe: Callable[[Engine], Optional[float]] = replica_lag,
+    ) -> None:
+        self.engine = engine
+        self.name = name or f"{engine.url.host}:{engine.url.port or 3306}"
+        self.probe = probe
+        # out of rotation until the first health check passes
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.in_flight = 0
+
+
+class ReplicaRouter:
+    """
+    Picks the healthy replica with the fewest queries in flight, or None when reads must go to the primary.
+
+    Replicas are checked at most every check_seconds by the first read after that interval, a replica that
+    cannot be reached or lags more than max_lag_seconds is left out until a later check passes. For
+    max_lag_seconds after the data changed every read goes to the primary, the replicas may not have the
+    change yet.
+    """
+
+    def __init__(
+        self,
+        replicas: list[Replica],
+        max_lag_seconds: float = 5.0,
+        check_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.clock = clock
+        self._checked_at: Optional[float] = None
+        self._changed_at: Optional[float] = None
+        self._turn = 0
+        self._lock = Lock()
+        self._checking = Lock()
+        _routers.add(self)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Optional[Replica]]:
+        if not self.replicas or self.primary_only():
+            yield None
+            return
+
+        self.check_if_due()
+        with self._lock:
+            healthy = [r for r in self.replicas if r.healthy]
+            replica = None
+            if healthy:
+                # rotate the starting point so idle replicas share the load
+                self._turn = (self._turn + 1) % len(healthy)
+                rotated = healthy[self._turn :] + healthy[: self._turn]
+                replica = min(rotated, key=lambda r: r.in_flight)
+                replica.in_flight += 1
+        try:
+            yield replica
+        finally:
+            if replica is not None:
+                with self._lock:
+                    replica.in_flight -= 1
+
+    def data_changed(self) -> None:
+        with self._lock:
+            self._changed_at = self.clock()
+
+    def primary_only(self) -> bool:
+        """
+        Whether the data changed recently enough that a healthy replica may not have the change yet.
+        """
+        changed_at = self._changed_at
+        return (
+            changed_at is not None and self.clock() - changed_at < self.max_lag_seconds
+        )
+
+    def check_if_due(self) -> None:
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return
+        # other reads keep using the last known state while one of them checks
+        if not self._checking.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            self.check()
+        finally:
+            self._checking.release()
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                lag = replica.probe(replica.engine)
+                error = None if lag is not None else "Replication is not running."
+            except SQLAlchemyError as ex:
+                lag, error = None, str(ex)
+
+            if error is None and lag > self.max_lag_seconds:
+                error = f"Replica is {lag:g}s behind, over {self.max_lag_seconds:g}s."
+            self.__set_health(replica, error)
+            replica.lag_seconds = lag
+
+    def mark_down(self, replica: Replica, error: Exception) -> None:
+        """
+        Takes replica out of rotation until the next health check passes.
+        """
+        self.__set_health(replica, str(error))
+
+    def __set_health(self, replica: Replica, error: Optional[str]) -> None:
+        healthy = error is None
+        if healthy and not replica.healthy:
+            logging.info(f"Replica {replica.name} is in rotation")
+        elif not healthy and replica.healthy:
+            logging.warning(f"Replica {replica.name} is out of rotation: {error}")
+        replica.healthy = healthy
+        replica.error = error
+
+
+_routers: "WeakSet[ReplicaRouter]" = WeakSet()
+
+
+def _replicas() -> Iterator[Replica]:
+    for router in list(_routers):
+        yield from router.replicas
+
+
+metrics.gauge(
+    "vqe_db_replica_lag_seconds",
+    "Seconds the read replicas are behind the primary at their last health check",
+    ["replica"],
+    lambda: [
+        ((r.name,), r.lag_seconds) for r in _replicas() if r.lag_seconds is not None
+    ],
+)
+metrics.gauge(
+    "vqe_db_replica_healthy",
+    "Whether the read replicas are in rotation",
+    ["replica"],
+    lambda: [((r.name,), int(r.healthy)) for r in _replicas()],
+)
+metrics.gauge(
+    "vqe_db_replica_in_flight",
+    "Queries running on the read replicas",
+    ["replica"],
+    lambda: [((r.name,), r.in_flight) for r in _replicas()],
+)
@@ -0,0 +1,153 @@
+import sys
+import time
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from dal.rows import Rows
+from helpers.config_helper import config
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+def estimate_size(results: Any) -> int:
+    """
+    Rough in-memory size of a result set of row dicts or Rows, good enough to bound the cache.
+    """
+    if isinstance(results, tuple):
+        return sum(estimate_size(r) for r in results)
+    if isinstance(results, Rows):
+        size = sys.getsizeof(results.data)
+        for row in results.data:
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        return size
+    if not isinstance(results, list):
+        return sys.getsizeof(results)
+
+    size = sys.getsizeof(results)
+    for row in results:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """
+    LRU cache of query results bounded by entry count and total bytes, entries expire after ttl_seconds.
+
+    Every invalidation starts a new generation, results read in an earlier one are not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 300,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.total_bytes = 0
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry.expires_at <= self.clock():
+                self.__remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        generation is the one the value was read in, when given and the cache was invalidated since the value
+        is dropped.
+        """
+        if not self.enabled:
+            return
+
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self.__remove(key)
+
+            self._entries[key] = CacheEntry(
+                value, size, self.clock() + self.ttl_seconds
+            )
+            self.total_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or self.total_bytes > self.max_bytes
+            ):
+                self.__remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def __remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+
+result_cache = ResultCache(
+    max_entries=config.get_int("VQE_RESULT_CACHE_MAX_ENTRIES", 1024),
+    max_bytes=config.get_int("VQE_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    ttl_seconds=config.get_float("VQE_RESULT_CACHE_TTL_SECONDS", 300),
+    enabled=config.get_bool("VQE_RESULT_CACHE_ENABLED", True),
+)
@@ -0,0 +1,54 @@
+from collections.abc import Sequence
+from operator import itemgetter
+from typing import Any, Iterator, Union
+
+
+class Rows(Sequence):
+    """
+    Read-only result set of tuples sharing one tuple of column names.
+
+    Rows are presented as dicts where they are accessed, the response serializer writes the tuples without
+    building any, see helpers.serialization_helper.
+    """
+
+    __slots__ = ("columns", "data")
+
+    def __init__(self, columns: tuple[str, ...], data: list[tuple]) -> None:
+        self.columns = columns
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, "Rows"]:
+        if isinstance(index, slice):
+            return Rows(self.columns, self.data[index])
+        return dict(zip(self.columns, self.data[index]))
+
+    def __iter__(self) -> Iterator[dict]:
+        columns = self.columns
+        for row in self.data:
+            yield dict(zip(columns, row))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Rows) and other.columns == self.columns:
+            return other.data == self.data
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(other) == len(self) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Rows({self.columns!r}, {len(self.data)} rows)"
+
+    def without(self, column: str) -> "Rows":
+        index = self.columns.index(column)
+        return Rows(
+            self.columns[:index] + self.columns[index + 1 :],
+            [row[:index] + row[index + 1 :] for row in self.data],
+        )
+
+    def column_values(self) -> list[list]:
+        """
+        The values of every column, in the order of columns.
+        """
+        return [list(map(itemgetter(i), self.data)) for i in range(len(self.columns))]
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import random
+
+from collections import deque
+from threading import Lock
+from typing import Callable, Optional
+
+from dal.query_compiler import CompiledQuery
+from dal.workload import shape_of
+from helpers.config_helper import config
+
+# latencies kept per fingerprint for its percentiles
+LATENCY_WINDOW = 1000
+
+
+def fingerprint(
+    compiled: CompiledQuery,
+    sort_field: Optional[str],
+    sort_order: Optional[str],
+    paginate: bool = False,
+) -> str:
+    """
+    Identifies queries that differ only in their values, a short hash of the vehicle, shape and sort.
+    """
+    key = [compiled.cls.__name__, shape_of(compiled), sort_field, sort_order, paginate]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FingerprintStats:
+    def __init__(self, vehicle: str, shape: list, sort: str, sql: str) -> None:
+        self.vehicle = vehicle
+        self.shape = shape
+        self.sort = sort
+        self.sql = sql
+        self.count = 0
+        self.slow = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds: float, rows: int, slow: bool) -> None:
+        self.count += 1
+        self.slow += slow
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.max_rows = max(self.max_rows, rows)
+        self.latencies.append(seconds)
+
+    def as_dict(self, name: str) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "fingerprint": name,
+            "vehicle": self.vehicle,
+            "shape": self.shape,
+            "sort": self.sort,
+            "sql": self.sql,
+            "count": self.count,
+            "slow": self.slow,
+            "total_seconds": round(self.seconds, 6),
+            "p50_seconds": round(percentile(ordered, 0.5), 6),
+            "p95_seconds": round(percentile(ordered, 0.95), 6),
+            "max_seconds": round(self.max_seconds, 6),
+            "rows": self.rows,
+            "mean_rows": round(self.rows / self.count, 2) if self.count else 0,
+            "max_rows": self.max_rows,
+        }
+
+
+class SlowQueryLog:
+    """
+    Aggregates latency and rows per query fingerprint, logs queries slower than threshold_seconds with their
+    SQL and params, and a sample_rate fraction of the others.
+
+    At most max_fingerprints are tracked, queries of further fingerprints are only counted as dropped.
+    """
+
+    def __init__(
+        self,
+        threshold_seconds: float = 1.0,
+        sample_rate: float = 0.0,
+        max_fingerprints: int = 1000,
+        sample: Callable[[], float] = random.random,
+    ) -> None:
+        self.threshold_seconds = threshold_seconds
+        self.sample_rate = sample_rate
+        self.max_fingerprints = max_fingerprints
+        self.sample = sample
+        self.dropped = 0
+        self._fingerprints: dict[str, FingerprintStats] = {}
+        self._lock = Lock()
+
+    def record(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+        sql: str,
+        params: dict,
+        seconds: float,
+        rows: int,
+        paginate: bool = False,
+    ) -> None:
+        name = fingerprint(compiled, sort_field, sort_order, paginate)
+        slow = seconds >= self.threshold_seconds
+        with self._lock:
+            stats = self._fingerprints.get(name)
+            if stats is None and len(self._fingerprints) < self.max_fingerprints:
+                stats = self._fingerprints[name] = FingerprintStats(
+                    compiled.cls.__name__,
+                    shape_of(compiled),
+                    f"{sort_field} {sort_order}" if sort_field else "",
+                    sql,
+                )
+            if stats is None:
+                self.dropped += 1
+            else:
+                stats.add(seconds, rows, slow)
+
+        if slow:
+            logging.warning(
+                f"Slow query {name} took {seconds * 1000:.1f}ms for {rows} rows: {sql} {params}"
+            )
+        elif self.sample_rate > 0 and self.sample() < self.sample_rate:
+            logging.info(
+                f"Sampled query {name} took {seconds * 1000:.1f}ms for {rows} rows: {sql} {params}"
+            )
+
+    def stats(self) -> dict:
+        """
+        Statistics per fingerprint, the fingerprints taking the most time in total first.
+        """
+        with self._lock:
+            fingerprints = [s.as_dict(n) for n, s in self._fingerprints.items()]
+            dropped = self.dropped
+        return {
+            "threshold_seconds": self.threshold_seconds,
+            "sample_rate": self.sample_rate,
+            "max_fingerprints": self.max_fingerprints,
+            "dropped": dropped,
+            "fingerprints": sorted(
+                fingerprints, key=lambda f: (-f["total_seconds"], f["fingerprint"])
+            ),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._fingerprints.clear()
+            self.dropped = 0
+
+
+slow_query_log = SlowQueryLog(
+    threshold_seconds=config.get_float("VQE_SLOW_QUERY_SECONDS", 1.0),
+    sample_rate=config.get_float("VQE_SLOW_QUERY_SAMPLE_RATE", 0.0),
+    max_fingerprints=config.get_int("VQE_SLOW_QUERY_MAX_FINGERPRINTS", 1000),
+)
@@ -0,0 +1,71 @@
+import json
+import logging
+
+from threading import Lock
+from typing import Optional
+
+from dal.query_compiler import CompiledQuery
+from helpers.config_helper import config
+
+
+def shape_of(compiled: CompiledQuery) -> list:
+    """
+    Columns and operators of a query without its values, queries with the same shape share an index.
+    """
+    return [
+        [f.model.table_name, f.column, f.operator, [c.operator for c in f.constraints]]
+        for f in compiled.filters
+    ]
+
+
+class WorkloadRecorder:
+    """
+    Appends every query executed against MySQL, with its shape, values and latency, to a JSON lines file.
+
+    The file is the input of `tools/index_advisor.py`. Nothing is recorded when path is not set.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(
+        self,
+        compiled: CompiledQuery,
+        sort_field: Optional[str],
+        sort_order: Optional[str],
+        seconds: float,
+        rows: int,
+        paginate: bool = False,
+    ) -> None:
+        if not self.enabled:
+            return
+
+        entry = {
+            "vehicle": compiled.cls.__name__,
+            "shape": shape_of(compiled),
+            "query": compiled.as_query(),
+            "sort_field": sort_field,
+            "sort_order": sort_order,
+            "paginate": paginate,
+            "seconds": round(seconds, 6),
+            "rows": rows,
+        }
+        line = f"{json.dumps(entry)}\n"
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            logging.exception(f"Unable to record query to {self.path}")
+
+
+def load_workload(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+workload_recorder = WorkloadRecorder(config.get_str("VQE_WORKLOAD_FILE"))
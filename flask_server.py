@@ -1,13 +1,25 @@
 import logging
+import time
 
 from os import environ
 from datetime import datetime, timezone
 from logging.config import dictConfig
 
-from flask import Flask, Response, redirect
+from flask import Flask, Response, g, redirect, request
 
 from apis.api_v1 import blueprint as ns_v1
-from dal.mysql import MySQLDal
+from apis.namespaces.v1.vehicles import dal, engine as query_engine
+from dal.columnar import ColumnarDal
+from dal.mysql import engines
+from helpers.compression_helper import COMPRESSIBLE_MIMETYPES, compression
+from helpers.metrics_helper import (
+    CONTENT_TYPE,
+    errors_total,
+    metrics,
+    request_duration,
+    requests_total,
+)
+from helpers.timing_helper import timing
 
 dictConfig(
     {
@@ -32,23 +44,97 @@ dictConfig(
 app = Flask(__name__)
 app.register_blueprint(ns_v1)
 
-dal: MySQLDal
-
+# with `gunicorn --preload` this runs once in the master, workers inherit the loaded app
 try:
-    dal = MySQLDal()
     dal.scaffold()
+    if isinstance(query_engine, ColumnarDal):
+        query_engine.load()
+    # connections opened while starting are not handed down to forked workers
+    engines.dispose()
 except Exception:
     logging.exception("Unable to scaffold database!")
     exit(1)
 
 
+@app.before_request
+def start_timing():
+    g.request_started = time.perf_counter()
+    timing.start()
+
+
 @app.after_request
 def add_header(response):
-    response.headers["Cache-Control"] = "public, max-age=3600"
+    response.headers.setdefault("Cache-Control", "public, max-age=3600")
     response.headers["X-Generated-At-UTC"] = datetime.now(timezone.utc)
+    server_timing = timing.header()
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+    record_request(response)
     return response
 
 
+# registered after add_header so it runs before it and the compression is timed
+@app.after_request
+def compress_response(response):
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+
+    encoding = compression.negotiate(request.accept_encodings)
+    if (
+        encoding is None
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    if response.is_streamed:
+        response.response = compression.compress_stream(encoding, response.response)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < compression.min_bytes:
+            return response
+        with timing.phase("compress"):
+            response.set_data(compression.compress(encoding, data))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def record_request(response):
+    started = g.get("request_started")
+    if started is None:
+        return
+
+    # the route rather than the path, so ids in paths do not create new series
+    resource = request.url_rule.rule if request.url_rule else "unmatched"
+    method = request.method
+    operators = g.get("query_operators", "none")
+
+    def observe_duration():
+        request_duration.observe(
+            time.perf_counter() - started,
+            resource=resource,
+            method=method,
+            operators=operators,
+        )
+
+    # a streamed body is produced after the headers are sent, until the server closes the response
+    if response.is_streamed:
+        response.call_on_close(observe_duration)
+    else:
+        observe_duration()
+    requests_total.inc(
+        resource=resource, method=request.method, status=response.status_code
+    )
+    if response.status_code >= 500:
+        errors_total.inc(source="http", type=response.status_code)
+
+
+@app.route("/metrics")
+def get_metrics():
+    return Response(metrics.render(), 200, {"Cache-Control": "no-store"}, CONTENT_TYPE)
+
 
 @app.route("/ping")
 def ping():
@@ -0,0 +1,182 @@
+import zlib
+
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Iterator, Optional, TypeVar, Union
+
+from werkzeug.datastructures import Accept
+
+from helpers.config_helper import config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is only needed for `br`
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is only needed for `zstd`
+    zstandard = None
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # pragma: no cover - only the gunicorn workers run on gevent
+    get_hub = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/msgpack",
+    "application/vnd.apache.arrow.stream",
+    "application/x-ndjson",
+    "text/css",
+    "text/html",
+    "text/plain",
+}
+# smaller inputs are compressed in the calling greenlet, handing them to a thread costs more
+OFF_HUB_BYTES = 64 * 1024
+
+T = TypeVar("T")
+
+
+class Encoder(ABC):
+    """
+    Incremental compressor of one response body for a `Content-Encoding`.
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compressed data, flushed so the client can decode everything sent so far.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int) -> None:
+        # wbits 31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder(Encoder):
+    def __init__(self, level: int) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def off_hub(function: Callable[..., T], *args) -> T:
+    """
+    Runs function in gevent's thread pool when running on gevent, so CPU bound work does not block other
+    greenlets. zlib, brotli and zstandard release the GIL while compressing.
+    """
+    if get_hub is not None and is_module_patched("threading"):
+        return get_hub().threadpool.apply(function, args)
+    return function(*args)
+
+
+class Compression:
+    """
+    Negotiates and applies the `Content-Encoding` of responses.
+    """
+
+    def __init__(
+        self,
+        encodings: list[str],
+        min_bytes: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ) -> None:
+        factories = {
+            "gzip": lambda: GzipEncoder(gzip_level),
+            "br": (lambda: BrotliEncoder(brotli_quality)) if brotli else None,
+            "zstd": (lambda: ZstdEncoder(zstd_level)) if zstandard else None,
+        }
+        # in order of preference when the client accepts several equally
+        self.factories: dict[str, Callable[[], Encoder]] = {
+            e: factories[e] for e in encodings if factories.get(e) is not None
+        }
+        self.min_bytes = min_bytes
+
+    def negotiate(self, accept_encodings: Accept) -> Optional[str]:
+        if not self.factories:
+            return None
+        return accept_encodings.best_match(list(self.factories))
+
+    def encoder(self, encoding: str) -> Encoder:
+        return self.factories[encoding]()
+
+    def compress(self, encoding: str, data: bytes) -> bytes:
+        def run() -> bytes:
+            encoder = self.encoder(encoding)
+            return encoder.compress(data) + encoder.finish()
+
+        return off_hub(run) if len(data) >= OFF_HUB_BYTES else run()
+
+    def compress_stream(
+        self, encoding: str, chunks: Iterable[Union[bytes, str]]
+    ) -> Iterator[bytes]:
+        """
+        Compresses chunks as they arrive, every compressed chunk is flushed to the client.
+        """
+        encoder = self.encoder(encoding)
+        try:
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                if not data:
+                    continue
+                compressed = (
+                    off_hub(encoder.compress, data)
+                    if len(data) >= OFF_HUB_BYTES
+                    else encoder.compress(data)
+                )
+                if compressed:
+                    yield compressed
+            yield encoder.finish()
+        finally:
+            # e.g. the stream_with_context of a streamed response, when the client disconnects
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+
+compression = Compression(
+    [
+        e.strip()
+        for e in config.get_str("VQE_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+        if e.strip()
+    ],
+    config.get_int("VQE_COMPRESSION_MIN_BYTES", 1024),
+    config.get_int("VQE_GZIP_LEVEL", 6),
+    config.get_int("VQE_BROTLI_QUALITY", 4),
+    config.get_int("VQE_ZSTD_LEVEL", 3),
+)
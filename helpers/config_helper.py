@@ -0,0 +1,27 @@
+from os import environ
+from typing import Optional
+
+
+class Config:
+    def get_str(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = environ.get(name)
+        if value is None or value.strip() == "":
+            return default
+        return value.strip()
+
+    def get_int(self, name: str, default: int) -> int:
+        value = self.get_str(name)
+        return default if value is None else int(value)
+
+    def get_float(self, name: str, default: float) -> float:
+        value = self.get_str(name)
+        return default if value is None else float(value)
+
+    def get_bool(self, name: str, default: bool) -> bool:
+        value = self.get_str(name)
+        if value is None:
+            return default
+        return value.lower() in ("1", "true", "yes", "on")
+
+
+config = Config()
@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def query_operators(compiled: Any) -> str:
+    """
+    Label for the constraint operators used by a compiled query, e.g. `equals,gt`.
+    """
+    operators = {c.operator for f in compiled.filters for c in f.constraints}
+    return ",".join(sorted(operators)) or "none"
+
+
+class Metric(ABC):
+    """
+    A metric family, its children are created per distinct set of label values.
+
+    Children are only created under a lock, updating them is not locked: under the gevent worker a
+    greenlet cannot be switched out in the middle of an update, and with OS threads an increment is
+    lost only when two updates of the same child race.
+    """
+
+    kind: str
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._children: dict[tuple[str, ...], list] = {}
+        self._lock = Lock()
+
+    def _child(self, labels: dict) -> list:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self._child(labels)[0] += amount
+
+    def value(self, **labels) -> float:
+        return self._child(labels)[0]
+
+    def _new_child(self) -> list:
+        return [0]
+
+    def samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(child[0])}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        # [count per bucket..., count above the last bucket, sum, count]
+        child = self._child(labels)
+        child[bisect_left(self.buckets, value)] += 1
+        child[-2] += value
+        child[-1] += 1
+
+    def count(self, **labels) -> int:
+        return self._child(labels)[-1]
+
+    def sum(self, **labels) -> float:
+        return self._child(labels)[-2]
+
+    def _new_child(self) -> list:
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child):
+                cumulative += count
+                labels = _format_labels(self.labels, key, le=_format_value(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(child[-2])}"
+            yield f"{self.name}_count{labels} {child[-1]}"
+
+
+class Gauge(Metric):
+    """
+    Read when the metrics are collected, collect returns (label values, value) pairs.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str],
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _new_child(self) -> list:
+        # the values come from collect, a gauge has no children
+        return []
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.__register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.__register(Histogram(name, help, labels, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str],
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+    ) -> Gauge:
+        return self.__register(Gauge(name, help, labels, collect))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        return "\n".join(m.render() for m in list(self._metrics.values())) + "\n"
+
+    def __register(self, metric: Metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+metrics = Registry()
+
+request_duration = metrics.histogram(
+    "vqe_request_duration_seconds",
+    "Time taken to handle requests",
+    ["resource", "method", "operators"],
+)
+requests_total = metrics.counter(
+    "vqe_requests_total", "Requests handled", ["resource", "method", "status"]
+)
+result_rows = metrics.histogram(
+    "vqe_result_rows",
+    "Rows returned by vehicle queries",
+    ["resource", "operators"],
+    ROW_BUCKETS,
+)
+errors_total = metrics.counter(
+    "vqe_errors_total",
+    "Server errors and failed database statements",
+    ["source", "type"],
+)
+pool_checkout_seconds = metrics.histogram(
+    "vqe_db_pool_checkout_seconds",
+    "Time waited for a database connection from the pool",
+)
@@ -4,6 +4,26 @@ import functools
 from typing import Optional
 from json import loads
 
+from dal.ingestion import JsonArrayReader, read_ndjson
+from dal.pagination import decode_cursor
+from helpers.serialization_helper import (
+    ARROW_STREAM_MIMETYPE,
+    MSGPACK_MIMETYPE,
+    ResponseFormat,
+    msgpack,
+    pa,
+)
+from helpers.timing_helper import timing
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+JSON_MIMETYPE = "application/json"
+# in order of preference when the client accepts several equally
+RESPONSE_MIMETYPES = (
+    [JSON_MIMETYPE, NDJSON_MIMETYPE]
+    + ([MSGPACK_MIMETYPE] if msgpack else [])
+    + ([ARROW_STREAM_MIMETYPE] if pa else [])
+)
+
 
 def parse_json_string(content: str) -> Optional[dict]:
     try:
@@ -12,32 +32,152 @@ def parse_json_string(content: str) -> Optional[dict]:
         return None
 
 
+def validation_failed(field: str, message: str):
+    return flask.make_response(
+        {
+            "errors": {field: message},
+            "message": "Input payload validation failed.",
+        },
+        400,
+    )
+
+
 class Parse:
     def query_request(self, parser):
         def decorator(func):
             @functools.wraps(func)
             def inner(*args, **kwargs):
-                parsed = parser.parse_args()
+                with timing.phase("reqparse"):
+                    parsed = parser.parse_args()
                 parsed_query = None
                 if "query" in parsed and parsed.query is not None:
-                    parsed_query = parse_json_string(parsed.query)
+                    with timing.phase("parse"):
+                        parsed_query = parse_json_string(parsed.query)
                     if not parsed_query:
-                        return flask.make_response(
-                            {
-                                "errors": {
-                                    "query": "Invalid query supplied, see Examples for query payload."
-                                },
-                                "message": "Input payload validation failed.",
-                            },
-                            400,
+                        return validation_failed(
+                            "query",
+                            "Invalid query supplied, see Examples for query payload.",
+                        )
+
+                cursor = None
+                if parsed.get("cursor"):
+                    if parsed.get("limit") is None:
+                        return validation_failed(
+                            "cursor", "A cursor can only be used together with limit."
+                        )
+
+                    try:
+                        cursor = decode_cursor(parsed.cursor)
+                    except ValueError:
+                        return validation_failed(
+                            "cursor",
+                            "Invalid cursor supplied, use the cursor from a previous response.",
                         )
 
+                    if cursor.sort_field != parsed.sort_field or (
+                        cursor.sort_order != (parsed.sort_order or "ASC")
+                    ):
+                        return validation_failed(
+                            "cursor",
+                            "Cursor was issued for a different sort_field or sort_order.",
+                        )
+
+                mimetype = (
+                    flask.request.accept_mimetypes.best_match(RESPONSE_MIMETYPES)
+                    or JSON_MIMETYPE
+                )
+                stream = bool(parsed.get("stream")) or mimetype == NDJSON_MIMETYPE
+                if stream and parsed.get("limit") is not None:
+                    return validation_failed(
+                        "stream", "Streaming cannot be combined with limit or cursor."
+                    )
+                if stream and mimetype == MSGPACK_MIMETYPE:
+                    return validation_failed(
+                        "stream",
+                        "Streams are written as NDJSON or Arrow, not MessagePack.",
+                    )
+                if stream and mimetype == JSON_MIMETYPE:
+                    mimetype = NDJSON_MIMETYPE
+
+                columnar = parsed.get("format") == "columnar"
+                if columnar and mimetype == NDJSON_MIMETYPE:
+                    return validation_failed(
+                        "format",
+                        "NDJSON streams are written a record per line, use Arrow for columnar streams.",
+                    )
+
                 return func(
                     *args,
                     **kwargs,
                     sort_field=parsed.sort_field,
                     sort_order=parsed.sort_order,
-                    query=parsed_query
+                    query=parsed_query,
+                    fields=parsed.get("fields"),
+                    limit=parsed.get("limit"),
+                    cursor=cursor,
+                    stream=stream,
+                    response_format=ResponseFormat(
+                        mimetype, columnar or mimetype == ARROW_STREAM_MIMETYPE
+                    ),
+                )
+
+            return inner
+
+        return decorator
+
+    def aggregate_request(self, parser):
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                with timing.phase("reqparse"):
+                    parsed = parser.parse_args()
+                parsed_query = None
+                if parsed.get("query") is not None:
+                    with timing.phase("parse"):
+                        parsed_query = parse_json_string(parsed.query)
+                    if not parsed_query:
+                        return validation_failed(
+                            "query",
+                            "Invalid query supplied, see Examples for query payload.",
+                        )
+
+                return func(
+                    *args,
+                    **kwargs,
+                    query=parsed_query,
+                    group_by=parsed.get("group_by"),
+                    metrics=parsed.get("metrics"),
+                )
+
+            return inner
+
+        return decorator
+
+    def bulk_request(self, parser):
+        """
+        Supplies the records of an NDJSON or JSON array request body, read as they are consumed.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                parsed = parser.parse_args()
+                mimetype = flask.request.mimetype
+                if mimetype == NDJSON_MIMETYPE:
+                    records = read_ndjson(flask.request.stream)
+                elif mimetype == JSON_MIMETYPE:
+                    records = iter(JsonArrayReader(flask.request.stream))
+                else:
+                    return validation_failed(
+                        "Content-Type",
+                        f"Content-Type must be {JSON_MIMETYPE} or {NDJSON_MIMETYPE}.",
+                    )
+
+                return func(
+                    *args,
+                    **kwargs,
+                    records=records,
+                    batch_size=parsed.get("batch_size"),
                 )
 
             return inner
@@ -0,0 +1,357 @@
+import json
+import math
+
+from decimal import Decimal
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+import flask
+
+from flask.json.provider import JSONProvider
+
+from dal.rows import Rows
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is only needed for MessagePack
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute
+except ImportError:  # pragma: no cover - pyarrow is only needed for Arrow responses
+    pa = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+# continuation marker and a zero length, ends an Arrow IPC stream
+ARROW_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+COMPACT_SEPARATORS = (",", ":")
+# json.dumps separators, used for the streamed records
+DEFAULT_SEPARATORS = (", ", ": ")
+
+
+# the JSON provider writes Decimal as its str, which never needs escaping
+_encode_decimal: Callable[[Decimal], str] = '"%s"'.__mod__
+
+
+def _encode_float(value: float) -> str:
+    # json writes the special values as NaN, Infinity and -Infinity
+    return float.__repr__(value) if math.isfinite(value) else json.dumps(value)
+
+
+def _encode_none(value: None) -> str:
+    return "null"
+
+
+def _encode_bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def interleave(
+    prefixes: list, columns: list[list], suffix: Any, separator: Any
+) -> list:
+    """
+    Pieces that join to every row as its prefixes each followed by the row's value of that column, and the
+    suffix, with separator between the rows. The rows are assembled by slice assignment rather than per row.
+    """
+    count = len(columns[0])
+    stride = 2 * len(prefixes)
+    pieces = [None] * (count * stride)
+    for n, values in enumerate(columns):
+        pieces[2 * n :: stride] = [prefixes[n]] * count
+        pieces[2 * n + 1 :: stride] = values
+    pieces[0::stride] = [suffix + separator + prefixes[0]] * count
+    pieces[0] = prefixes[0]
+    pieces.append(suffix)
+    return pieces
+
+
+class RowEncoder:
+    """
+    Writes the tuples of a result set as JSON objects, byte for byte as the JSON provider writes their dicts.
+
+    The keys and separators between the values are encoded once per result set. Values are encoded a column
+    at a time, by one encoder per column when all its values have the same type, and interleaved with the
+    keys in a single list that is joined once. Values of other types than the database returns are encoded
+    through the provider.
+    """
+
+    def __init__(
+        self,
+        columns: tuple[str, ...],
+        provider: JSONProvider,
+        separators: tuple[str, str] = COMPACT_SEPARATORS,
+    ) -> None:
+        ensure_ascii = getattr(provider, "ensure_ascii", True)
+        encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+        self.encoders: dict[type, Callable[[Any], str]] = {
+            str: encode_str,
+            int: int.__repr__,
+            float: _encode_float,
+            Decimal: _encode_decimal,
+            type(None): _encode_none,
+            bool: _encode_bool,
+        }
+        self.encode_str = encode_str
+        self.provider = provider
+
+        order = list(range(len(columns)))
+        if getattr(provider, "sort_keys", True):
+            order.sort(key=lambda i: columns[i])
+        self.order = order
+
+        # what is written before every value of a row, and after its last value
+        item_separator, key_separator = separators
+        self.prefixes = [
+            f"{item_separator if n else '{'}{encode_str(columns[i])}{key_separator}"
+            for n, i in enumerate(order)
+        ]
+        self.suffix = "}"
+
+    def encode(self, row: tuple) -> str:
+        return self.encode_all([row])
+
+    def encode_all(self, rows: list[tuple], separator: str = ",") -> str:
+        """
+        The rows as JSON objects separated by separator.
+        """
+        if not rows:
+            return ""
+        if not self.order:
+            return separator.join(["{}"] * len(rows))
+
+        columns = [
+            self.encode_column(list(map(itemgetter(i), rows))) for i in self.order
+        ]
+        return "".join(interleave(self.prefixes, columns, self.suffix, separator))
+
+    def encode_column(self, values: list) -> list[str]:
+        types = set(map(type, values))
+        encoder = self.encoders.get(types.pop()) if len(types) == 1 else None
+        if encoder is not None:
+            return list(map(encoder, values))
+        return [self.encode_value(v) for v in values]
+
+    def encode_value(self, value: Any) -> str:
+        encoder = self.encoders.get(type(value))
+        return encoder(value) if encoder is not None else self.provider.dumps(value)
+
+
+def dumps_rows(rows: Rows, provider: JSONProvider) -> str:
+    """
+    The rows as a compact JSON array of objects.
+    """
+    return f"[{RowEncoder(rows.columns, provider).encode_all(rows.data)}]"
+
+
+def dumps_columns(rows: Rows, provider: JSONProvider) -> str:
+    """
+    The rows as a compact JSON object with an array of values per column.
+    """
+    encoder = RowEncoder(rows.columns, provider)
+    values = rows.column_values()
+    items = []
+    for i in encoder.order:
+        encoded = ",".join(encoder.encode_column(values[i]))
+        items.append(f"{encoder.encode_str(rows.columns[i])}:[{encoded}]")
+    return "{" + ",".join(items) + "}"
+
+
+def dumps_body(body: dict, provider: JSONProvider, columnar: bool = False) -> str:
+    """
+    Compact JSON of a response body as the provider's response writes it, with the Rows values written by
+    dumps_rows, or dumps_columns when columnar.
+    """
+    keys = list(body)
+    if getattr(provider, "sort_keys", True):
+        keys.sort()
+
+    ensure_ascii = getattr(provider, "ensure_ascii", True)
+    encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+    dumps = dumps_columns if columnar else dumps_rows
+    items = []
+    for key in keys:
+        value = body[key]
+        if isinstance(value, Rows):
+            encoded = dumps(value, provider)
+        else:
+            encoded = provider.dumps(value, separators=COMPACT_SEPARATORS)
+        items.append(f"{encode_str(key)}:{encoded}")
+    return "{" + ",".join(items) + "}\n"
+
+
+def json_response(body: dict, columnar: bool = False) -> flask.Response:
+    """
+    Same response as flask.make_response(body), without building a dict per row of the Rows in body.
+    """
+    app = flask.current_app
+    provider = app.json
+    compact = getattr(provider, "compact", None)
+    if (compact is None and app.debug) or compact is False:
+        # indented for debugging, written by the provider
+        convert = as_columns if columnar else list
+        return flask.make_response(
+            {k: convert(v) if isinstance(v, Rows) else v for k, v in body.items()}
+        )
+
+    return app.response_class(
+        dumps_body(body, provider, columnar), mimetype=provider.mimetype
+    )
+
+
+def as_columns(rows: Rows) -> dict[str, list]:
+    return dict(zip(rows.columns, rows.column_values()))
+
+
+def _msgpack_default(value: Any) -> Any:
+    # same as the JSON responses
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _pack_rows(packer: "msgpack.Packer", rows: Rows) -> bytes:
+    header = packer.pack_array_header(len(rows))
+    if not rows or not rows.columns:
+        return header + packer.pack_map_header(0) * len(rows)
+
+    keys = [packer.pack(c) for c in rows.columns]
+    prefixes = [packer.pack_map_header(len(keys)) + keys[0]] + keys[1:]
+    columns = [list(map(packer.pack, values)) for values in rows.column_values()]
+    return header + b"".join(interleave(prefixes, columns, b"", b""))
+
+
+def _pack_columns(packer: "msgpack.Packer", rows: Rows) -> bytes:
+    pieces = [packer.pack_map_header(len(rows.columns))]
+    for column, values in zip(rows.columns, rows.column_values()):
+        pieces.append(packer.pack(column))
+        pieces.append(packer.pack(values))
+    return b"".join(pieces)
+
+
+def msgpack_body(body: dict, columnar: bool = False) -> bytes:
+    """
+    MessagePack of a response body, the same as its JSON but with the Rows values packed from their tuples.
+    """
+    packer = msgpack.Packer(default=_msgpack_default)
+    pieces = [packer.pack_map_header(len(body))]
+    for key, value in body.items():
+        pieces.append(packer.pack(key))
+        if isinstance(value, Rows):
+            pieces.append(
+                _pack_columns(packer, value) if columnar else _pack_rows(packer, value)
+            )
+        else:
+            pieces.append(packer.pack(value))
+    return b"".join(pieces)
+
+
+def arrow_array(values: list, data_type: Optional["pa.DataType"] = None) -> "pa.Array":
+    """
+    Arrow array of a column, its type is inferred from the values unless data_type is given. Decimals get
+    the widest precision, so the later batches of a stream fit their type.
+    """
+    if set(map(type, values)) == {Decimal}:
+        # converting the str of every Decimal is several times faster than converting the Decimals
+        if data_type is None:
+            exponent = values[0].as_tuple().exponent
+            data_type = pa.decimal128(38, max(-exponent, 0))
+        return pa.array(list(map(str, values))).cast(data_type)
+
+    array = pa.array(values, type=data_type)
+    if data_type is None and pa.types.is_decimal(array.type):
+        array = array.cast(pa.decimal128(38, array.type.scale))
+    return array
+
+
+def _compact_array(array: "pa.Array") -> "pa.Array":
+    if pa.types.is_string(array.type):
+        # mostly repeated values
+        return array.dictionary_encode()
+    if pa.types.is_integer(array.type) and len(array) and array.null_count == 0:
+        low, high = (v.as_py() for v in pa.compute.min_max(array).values())
+        for bits, data_type in [(8, pa.int8()), (16, pa.int16()), (32, pa.int32())]:
+            if -(2 ** (bits - 1)) <= low and high < 2 ** (bits - 1):
+                return array.cast(data_type)
+    return array
+
+
+def arrow_batch(
+    rows: Rows, schema: Optional["pa.Schema"] = None, compact: bool = False
+) -> "pa.RecordBatch":
+    """
+    The rows as an Arrow record batch, of schema or with the types inferred from the values. Compact
+    dictionary encodes text columns and narrows integer columns to the smallest type holding their values,
+    which later batches of a stream might not fit.
+    """
+    values = rows.column_values()
+    if schema is not None:
+        return pa.RecordBatch.from_arrays(
+            [arrow_array(v, field.type) for v, field in zip(values, schema)],
+            schema=schema,
+        )
+
+    arrays = [arrow_array(v) for v in values]
+    if compact:
+        arrays = [_compact_array(a) for a in arrays]
+    return pa.RecordBatch.from_arrays(arrays, names=list(rows.columns))
+
+
+def arrow_body(body: dict, provider: JSONProvider) -> bytes:
+    """
+    Arrow IPC stream of the Rows in a response body, its other values are JSON in the schema metadata.
+    """
+    rows = next((v for v in body.values() if isinstance(v, Rows)), Rows((), []))
+    metadata = {
+        k: provider.dumps(v, separators=COMPACT_SEPARATORS)
+        for k, v in body.items()
+        if not isinstance(v, Rows)
+    }
+    batch = arrow_batch(rows, compact=True).replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_stream(chunks: Iterable[Rows]) -> Iterator[bytes]:
+    """
+    Arrow IPC stream of the chunks, written as they arrive with a record batch per chunk. The schema is the
+    one of the first chunk, not compacted as later chunks might not fit it.
+    """
+    schema = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if schema is None:
+            batch = arrow_batch(chunk)
+            schema = batch.schema
+            yield schema.serialize().to_pybytes() + batch.serialize().to_pybytes()
+        else:
+            yield arrow_batch(chunk, schema).serialize().to_pybytes()
+
+    if schema is None:
+        yield pa.schema([]).serialize().to_pybytes()
+    yield ARROW_END_OF_STREAM
+
+
+class ResponseFormat(NamedTuple):
+    mimetype: str
+    # an array per column instead of an object per row, Arrow is always columnar
+    columnar: bool = False
+
+
+def format_response(body: dict, response_format: ResponseFormat) -> flask.Response:
+    if response_format.mimetype == MSGPACK_MIMETYPE:
+        return flask.current_app.response_class(
+            msgpack_body(body, response_format.columnar), mimetype=MSGPACK_MIMETYPE
+        )
+    if response_format.mimetype == ARROW_STREAM_MIMETYPE:
+        return flask.current_app.response_class(
+            arrow_body(body, flask.current_app.json), mimetype=ARROW_STREAM_MIMETYPE
+        )
+    return json_response(body, response_format.columnar)
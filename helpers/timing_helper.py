@@ -0,0 +1,57 @@
+import time
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from helpers.config_helper import config
+
+_phases: ContextVar[Optional[dict[str, float]]] = ContextVar("phases", default=None)
+_disabled = nullcontext()
+
+
+class Timing:
+    """
+    Times the phases of a request for the `Server-Timing` header.
+
+    Phases are only timed between start and header, anywhere else they cost a context variable lookup.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+
+    def start(self) -> None:
+        if self.enabled:
+            _phases.set({"total": time.perf_counter()})
+
+    def phase(self, name: str):
+        if _phases.get() is None:
+            return _disabled
+        return self.__timed(name)
+
+    def header(self) -> Optional[str]:
+        """
+        Ends timing the request, returns the `Server-Timing` header value of its phases in milliseconds.
+        """
+        phases = _phases.get()
+        if phases is None:
+            return None
+
+        _phases.set(None)
+        phases["total"] = time.perf_counter() - phases["total"]
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items()
+        )
+
+    @contextmanager
+    def __timed(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = _phases.get()
+            if phases is not None:
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+
+
+timing = Timing(config.get_bool("VQE_SERVER_TIMING", False))
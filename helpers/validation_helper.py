@@ -1,9 +1,21 @@
 import flask
 import functools
+import hmac
 
 from typing import Optional
 from json import loads
 
+from dal.models.base import Base
+from dal.pagination import coerce_cursor
+from dal.query_compiler import (
+    QueryValidationError,
+    compile_aggregation,
+    compile_query,
+)
+from helpers.config_helper import config
+from helpers.parsing_helper import validation_failed
+from helpers.timing_helper import timing
+
 
 class Validate:
     def sort_field_exists(self, available_columns: list[str]):
@@ -16,10 +28,12 @@ class Validate:
                         **kwargs,
                     )
 
-                if (
-                    kwargs["sort_field"] is not None
-                    and kwargs["sort_field"] not in available_columns
-                ):
+                with timing.phase("validate"):
+                    valid = (
+                        kwargs["sort_field"] is None
+                        or kwargs["sort_field"] in available_columns
+                    )
+                if not valid:
                     return flask.make_response(
                         {
                             "errors": {
@@ -39,5 +53,93 @@ class Validate:
 
         return decorator
 
+    def query_compiles(self, cls: type[Base]):
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                try:
+                    with timing.phase("compile"):
+                        kwargs["query"] = compile_query(
+                            cls, kwargs.get("query"), kwargs.pop("fields", None)
+                        )
+                        if kwargs.get("cursor") is not None:
+                            kwargs["cursor"] = coerce_cursor(cls, kwargs["cursor"])
+                except QueryValidationError as ex:
+                    return validation_failed(ex.field, ex.message)
+                except ValueError:
+                    return validation_failed(
+                        "cursor",
+                        "Invalid cursor supplied, use the cursor from a previous response.",
+                    )
+
+                return func(
+                    *args,
+                    **kwargs,
+                )
+
+            return inner
+
+        return decorator
+
+    def aggregation_compiles(self, cls: type[Base]):
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                try:
+                    with timing.phase("compile"):
+                        kwargs["aggregation"] = compile_aggregation(
+                            cls,
+                            kwargs.pop("group_by", None),
+                            kwargs.pop("metrics", None),
+                        )
+                except QueryValidationError as ex:
+                    return validation_failed(ex.field, ex.message)
+
+                return func(
+                    *args,
+                    **kwargs,
+                )
+
+            return inner
+
+        return decorator
+
+    def admin_authorized(self):
+        """
+        Requires the `X-Admin-Token` header to match VQE_ADMIN_TOKEN, admin endpoints are disabled when it is unset.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                if not is_admin_request():
+                    return flask.make_response(
+                        {"message": "Admin token missing or invalid."}, 403
+                    )
+
+                return func(
+                    *args,
+                    **kwargs,
+                )
+
+            return inner
+
+        return decorator
+
+
+def is_debug_request() -> bool:
+    """
+    Admin requests with `X-Debug: explain` receive the plan MySQL executed for them.
+    """
+    return flask.request.headers.get("X-Debug") == "explain" and is_admin_request()
+
+
+def is_admin_request() -> bool:
+    token = config.get_str("VQE_ADMIN_TOKEN")
+    supplied = flask.request.headers.get("X-Admin-Token")
+    if not token or not supplied:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), supplied.encode("utf-8"))
+
 
 validate = Validate()
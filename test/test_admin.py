@@ -0,0 +1,47 @@
+import unittest
+
+from unittest import mock
+
+from flask_server import app
+from apis.namespaces.v1.vehicles import dal
+from dal.models.facts import Car
+
+
+class AdminTest(unittest.TestCase):
+    cache_path: str = "/api/v1/admin/cache"
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+
+        return super().setUp()
+
+    def test_disabled_without_token(self) -> None:
+        with mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": ""}):
+            response = self.client.get(
+                self.cache_path, headers={"X-Admin-Token": "anything"}
+            )
+
+        self.assertEqual("403 FORBIDDEN", response.status)
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+
+    def test_invalid_token(self) -> None:
+        with mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": "secret"}):
+            response = self.client.get(self.cache_path, headers={"X-Admin-Token": "x"})
+
+        self.assertEqual("403 FORBIDDEN", response.status)
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+
+    def test_cache_stats(self) -> None:
+        dal.query(Car)
+        dal.query(Car)
+
+        with mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": "secret"}):
+            response = self.client.get(
+                self.cache_path, headers={"X-Admin-Token": "secret"}
+            )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+        for counter in ["hits", "misses", "evictions", "entries", "bytes"]:
+            self.assertIn(counter, response.json)
+        self.assertGreaterEqual(response.json["hits"], 1)
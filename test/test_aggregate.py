@@ -0,0 +1,142 @@
+import unittest
+
+from collections import defaultdict
+from decimal import Decimal
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from flask_server import app
+from sample_data.payloads import car_make_and_year, spaceship_manufacturer_and_year
+
+car_path = "/api/v1/vehicles/cars"
+bike_path = "/api/v1/vehicles/bikes"
+spaceship_path = "/api/v1/vehicles/spaceships"
+no_match = '{"year":{"operator":"and","constraints":[{"operator":"equals","value":1}]}}'
+
+
+def number(value) -> Decimal:
+    # decimals are strings in JSON, the test database may return floats
+    return round(Decimal(str(value)), 4)
+
+
+@ddt
+class AggregateTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    def aggregate(self, path: str, query_string: dict) -> dict:
+        response = self.client.get(f"{path}/aggregate", query_string=query_string)
+        self.assertEqual(200, response.status_code, response.data)
+        return response.get_json()
+
+    @data(
+        (car_path, {}),
+        (car_path, {"query": car_make_and_year}),
+        (spaceship_path, {"query": spaceship_manufacturer_and_year}),
+        (bike_path, {"query": no_match}),
+    )
+    @unpack
+    def test_count(self, path: str, query_string: dict) -> None:
+        expected = self.client.get(path, query_string=query_string).get_json()
+
+        body = self.aggregate(path, query_string)
+
+        self.assertEqual({"results": [{"count": expected["count"]}], "count": 1}, body)
+
+    @data(
+        (car_path, "make,year", ["horsepower", "top_speed"]),
+        (bike_path, "type", ["gears", "wheel_size"]),
+        (spaceship_path, "manufacturer", ["max_crew"]),
+    )
+    @unpack
+    def test_group_by(self, path: str, group_by: str, columns: list[str]) -> None:
+        records = self.client.get(path).get_json()["results"]
+        fields = group_by.split(",")
+        groups = defaultdict(list)
+        for record in records:
+            groups[tuple(record[f] for f in fields)].append(record)
+
+        metrics = ["count"] + [
+            f"{function}({c})"
+            for c in columns
+            for function in ["min", "max", "avg", "sum"]
+        ]
+        body = self.aggregate(
+            path, {"group_by": group_by, "metrics": ",".join(metrics)}
+        )
+
+        self.assertEqual(len(groups), body["count"])
+        # ordered by the collation of the database
+        self.assertCountEqual(
+            groups, [tuple(r[f] for f in fields) for r in body["results"]]
+        )
+        for result in body["results"]:
+            group = groups[tuple(result[f] for f in fields)]
+            self.assertEqual(len(group), result["count"])
+            for column in columns:
+                values = [number(r[column]) for r in group]
+                self.assertEqual(min(values), number(result[f"min_{column}"]))
+                self.assertEqual(max(values), number(result[f"max_{column}"]))
+                self.assertEqual(sum(values), number(result[f"sum_{column}"]))
+                self.assertAlmostEqual(
+                    float(sum(values) / len(values)),
+                    float(result[f"avg_{column}"]),
+                    places=3,
+                )
+
+    def test_no_matching_groups(self) -> None:
+        body = self.aggregate(
+            car_path, {"query": no_match, "group_by": "year", "metrics": "max(seats)"}
+        )
+
+        self.assertEqual({"results": [], "count": 0}, body)
+
+    def test_no_matches_without_groups(self) -> None:
+        body = self.aggregate(
+            car_path, {"query": no_match, "metrics": "count,avg(seats)"}
+        )
+
+        self.assertEqual([{"count": 0, "avg_seats": None}], body["results"])
+
+    @data(
+        ({"group_by": "generation"}, "group_by"),
+        ({"group_by": "year,"}, "group_by"),
+        ({"metrics": "median(seats)"}, "metrics"),
+        ({"metrics": "avg(colour)"}, "metrics"),
+        ({"metrics": "sum(max_crew)"}, "metrics"),
+        ({"metrics": "count(seats)"}, "metrics"),
+        ({"metrics": "avg seats"}, "metrics"),
+        ({"query": "{"}, "query"),
+        (
+            {
+                "query": '{"seats":{"operator":"and","constraints":[{"operator":"lt","value":"x"}]}}'
+            },
+            "query",
+        ),
+    )
+    @unpack
+    def test_invalid(self, query_string: dict, field: str) -> None:
+        response = self.client.get(f"{car_path}/aggregate", query_string=query_string)
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn(field, response.get_json()["errors"])
+
+    def test_not_modified(self) -> None:
+        path = f"{car_path}/aggregate"
+        response = self.client.get(path, query_string={"group_by": "year"})
+
+        revalidated = self.client.get(
+            path,
+            query_string={"group_by": "year"},
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+
+        self.assertEqual(304, revalidated.status_code)
+        self.assertNotEqual(
+            response.headers["ETag"],
+            self.client.get(path, query_string={"group_by": "seats"}).headers["ETag"],
+        )
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import time
+import unittest
+
+from unittest import mock
+from urllib.parse import urlencode
+
+from flask_server import app as wsgi_app
+from apis.namespaces.v1.vehicles import dal
+from asgi import AsgiApp
+from dal.models.metadata import DataVersion
+from dal.pagination import Cursor, encode_cursor
+from sample_data.payloads import (
+    bike_gears_and_type_and_year,
+    car_make_and_year,
+    spaceship_two_models,
+)
+
+wsgi_cases = [
+    ("/api/v1/vehicles/spaceships", {"query": spaceship_two_models}),
+    (
+        "/api/v1/vehicles/bikes",
+        {
+            "query": bike_gears_and_type_and_year,
+            "sort_field": "gears",
+            "sort_order": "DESC",
+        },
+    ),
+    ("/api/v1/vehicles/cars", {"query": car_make_and_year}),
+    ("/api/v1/vehicles/cars", {"sort_field": "year", "limit": 5}),
+    (
+        "/api/v1/vehicles/cars",
+        {"fields": "make,year", "sort_field": "seats", "limit": 5},
+    ),
+    ("/api/v1/vehicles/cars", {"fields": "generation"}),
+    ("/api/v1/vehicles/cars", {"sort_field": "nope"}),
+    ("/api/v1/vehicles/cars", {"query": "{"}),
+    ("/api/v1/vehicles/cars", {"sort_order": "UP"}),
+    ("/api/v1/vehicles/cars", {"limit": 0}),
+    ("/api/v1/vehicles/cars", {"limit": 1001}),
+    ("/api/v1/vehicles/cars", {"limit": "ten"}),
+    ("/api/v1/vehicles/cars", {"stream": "maybe"}),
+    ("/api/v1/vehicles/cars", {"stream": "false"}),
+    ("/api/v1/vehicles/cars", {"cursor": "abc"}),
+    ("/api/v1/vehicles/cars", {"cursor": "abc", "limit": 5}),
+    (
+        "/api/v1/vehicles/cars",
+        {
+            "cursor": encode_cursor(Cursor("seats", "ASC", {}, 1)),
+            "sort_field": "seats",
+            "limit": 5,
+        },
+    ),
+    (
+        "/api/v1/vehicles/cars",
+        {
+            "cursor": encode_cursor(Cursor("seats", "ASC", "fast", 1)),
+            "sort_field": "seats",
+            "limit": 5,
+        },
+    ),
+    (
+        "/api/v1/vehicles/cars",
+        {"query": '{"year":{"operator":"and","constraints":[{"operator":"gt"}]}}'},
+    ),
+]
+
+
+async def request(
+    asgi_app: AsgiApp,
+    path: str,
+    params: dict = None,
+    method: str = "GET",
+    query_string: bytes = None,
+) -> tuple:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": (
+            urlencode(params or {}).encode() if query_string is None else query_string
+        ),
+        "headers": [],
+    }
+    await asgi_app(scope, receive, send)
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return messages[0]["status"], body, dict(messages[0]["headers"])
+
+
+class AsgiTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.client = wsgi_app.test_client()
+        self.app = AsgiApp(lambda: dal)
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    async def asyncTearDown(self) -> None:
+        if self.app.dal is not None:
+            await self.app.dal.dispose()
+
+    async def get(self, path: str, params: dict = None) -> tuple[int, dict]:
+        status, body, _ = await request(self.app, path, params)
+        return status, json.loads(body)
+
+    async def test_matches_wsgi_app(self) -> None:
+        # ddt cannot feed data to coroutine tests
+        for path, params in wsgi_cases:
+            with self.subTest(path=path, params=params):
+                expected = self.client.get(path, query_string=params)
+                dal.result_cache.invalidate()
+
+                status, body = await self.get(path, params)
+
+                self.assertEqual(expected.status_code, status)
+                self.assertEqual(expected.json, body)
+
+    async def test_pages_with_cursor(self) -> None:
+        params = {"sort_field": "year", "sort_order": "DESC", "limit": 3}
+        seen = []
+        cursor = None
+        while True:
+            status, body = await self.get(
+                "/api/v1/vehicles/bikes",
+                {**params, **({"cursor": cursor} if cursor else {})},
+            )
+            self.assertEqual(200, status)
+            seen += body["results"]
+            cursor = body["cursor"]
+            if not cursor:
+                break
+
+        status, body = await self.get(
+            "/api/v1/vehicles/bikes", {"sort_field": "year", "sort_order": "DESC"}
+        )
+        self.assertEqual(body["count"], len(seen))
+        self.assertEqual(
+            [r["year"] for r in body["results"]], [r["year"] for r in seen]
+        )
+
+    async def test_concurrent_queries(self) -> None:
+        responses = await asyncio.gather(
+            *[
+                request(
+                    self.app,
+                    "/api/v1/vehicles/cars",
+                    {
+                        "query": json.dumps(
+                            {
+                                "year": {
+                                    "operator": "and",
+                                    "constraints": [{"operator": "gt", "value": year}],
+                                }
+                            }
+                        )
+                    },
+                )
+                for year in range(1950, 2050)
+            ]
+        )
+
+        self.assertEqual({200}, {status for status, _, _ in responses})
+        counts = [json.loads(body)["count"] for _, body, _ in responses]
+        self.assertEqual(sorted(counts, reverse=True), counts)
+
+    async def test_routes(self) -> None:
+        for path, method, expected in [
+            ("/ping", "GET", 200),
+            ("/api/v1/vehicles/trucks", "GET", 404),
+            ("/api/v1/vehicles/cars", "POST", 405),
+            ("/api/v1/vehicles/cars", "GET", 200),
+        ]:
+            with self.subTest(path=path, method=method):
+                status, _, _ = await request(self.app, path, method=method)
+
+                self.assertEqual(expected, status)
+
+    async def test_rejects_invalid_utf8(self) -> None:
+        status, body, _ = await request(
+            self.app, "/api/v1/vehicles/cars", query_string=b"sort_field=\xff"
+        )
+
+        self.assertEqual(400, status)
+        self.assertIn("message", json.loads(body))
+
+    async def test_sees_writes_of_other_processes(self) -> None:
+        await self.get("/api/v1/vehicles/cars")
+        local_version = dal.data_version
+
+        # another process writing
+        dal.execute(
+            f"UPDATE `{dal.db_name}`.`{DataVersion.table_name}` SET `version` = `version` + 1"
+        )
+        later = time.monotonic() + dal.versions.ttl_seconds
+        with mock.patch.object(dal.versions, "clock", lambda: later):
+            status, _ = await self.get("/api/v1/vehicles/cars")
+
+        self.assertEqual(200, status)
+        self.assertEqual(local_version + 1, dal.data_version)
+
+    async def test_rejects_streaming(self) -> None:
+        status, body = await self.get("/api/v1/vehicles/cars", {"stream": "true"})
+
+        self.assertEqual(400, status)
+        self.assertIn("stream", body["errors"])
+
+    async def test_responses_are_not_stored(self) -> None:
+        # no validators, see the differences in the asgi module docstring
+        _, _, headers = await request(self.app, "/api/v1/vehicles/cars")
+
+        self.assertEqual(b"no-store", headers[b"cache-control"])
+        self.assertNotIn(b"etag", headers)
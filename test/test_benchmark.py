@@ -0,0 +1,85 @@
+import argparse
+import unittest
+
+from ddt import ddt, data
+
+from apis.namespaces.v1.vehicles import dal
+from dal.ingestion import validate_records
+from dal.models.facts import Bike, Car, Spaceship
+from dal.query_compiler import compile_query
+from tools.benchmark import (
+    QueryResult,
+    benchmark_case,
+    cases,
+    compare,
+    parse_tiers,
+)
+from tools.synthetic_data import generate, load_distribution
+
+
+def result(median_seconds: float, operator: str = "equals") -> dict:
+    return QueryResult(
+        "10k", "Car", "year", operator, None, "query", 5, 1, 0.1, median_seconds, 0.3
+    )._asdict()
+
+
+@ddt
+class BenchmarkTest(unittest.TestCase):
+    @data(Car, Bike, Spaceship)
+    def test_generates_valid_vehicles(self, cls) -> None:
+        distribution = load_distribution(cls)
+        records = list(generate(distribution, 500, seed=1))
+
+        self.assertEqual(records, list(generate(distribution, 500, seed=1)))
+        self.assertNotEqual(records, list(generate(distribution, 500, seed=2)))
+        valid, errors = validate_records(cls, records)
+        self.assertEqual([], errors)
+        self.assertEqual(500, len(valid))
+
+    def test_keeps_models_with_their_manufacturer(self) -> None:
+        distribution = load_distribution(Car)
+        pairs = set(distribution.dimensions.values)
+
+        for record in generate(distribution, 200):
+            self.assertIn((record["make"], record["model"]), pairs)
+
+    @data(Car, Bike, Spaceship)
+    def test_cases_compile(self, cls) -> None:
+        found = cases(load_distribution(cls))
+
+        operators = {c.operator for c in found if c.field == "model"}
+        self.assertIn("contains", operators)
+        self.assertNotIn("contains", {c.operator for c in found if c.field == "year"})
+        self.assertEqual({None, "ASC", "DESC"}, {c.sort_order for c in found})
+        for case in found:
+            compile_query(cls, case.query)
+
+    def test_parse_tiers(self) -> None:
+        self.assertEqual(["10k", "1m"], parse_tiers("10K, 1m"))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_tiers("5k")
+
+    def test_benchmark_case(self) -> None:
+        case = next(
+            c
+            for c in cases(load_distribution(Car))
+            if c.field == "year" and c.operator == "gt" and c.sort_order == "DESC"
+        )
+
+        build, query = benchmark_case(dal, dal, "10k", case, runs=3)
+
+        self.assertEqual(["build", "query"], [build.phase, query.phase])
+        self.assertEqual(3, query.runs)
+        self.assertEqual(len(dal.query(Car, case.query, "year", "DESC")), query.rows)
+        self.assertLessEqual(query.min_seconds, query.median_seconds)
+
+    def test_compare(self) -> None:
+        regressions = compare(
+            [result(0.5), result(0.1, "gt"), result(0.1, "lt")],
+            [result(0.2), result(0.1, "gt")],
+            threshold=1.2,
+        )
+
+        self.assertEqual(1, len(regressions))
+        self.assertEqual("equals", regressions[0]["operator"])
+        self.assertEqual(2.5, regressions[0]["ratio"])
@@ -0,0 +1,207 @@
+import json
+import unittest
+
+from decimal import Decimal
+from unittest import mock
+
+from ddt import ddt, data, unpack
+
+from flask_server import app
+from apis.namespaces.v1.vehicles import dal
+from dal.ingestion import validate_records
+from dal.models.facts import Bike, Car, Spaceship
+
+
+@ddt
+class BulkTest(unittest.TestCase):
+    car_path: str = "/api/v1/vehicles/cars/bulk"
+    headers: dict = {"X-Admin-Token": "secret"}
+    new_car: dict = {
+        "make": "Bulk Test Motors",
+        "model": "Loader",
+        "colour": "Teal",
+        "engine_size": 1.6,
+        "horsepower": 120,
+        "seats": 5,
+        "top_speed": "180.5",
+        "year": 2024,
+    }
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        self.existing_car = dal.query(Car)[0]
+        patcher = mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": "secret"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        rows = dal.execute(
+            f"DELETE FROM `vqe`.`{Car.table_name}` WHERE `manufacturer_id` IN"
+            " (SELECT `manufacturer_id` FROM `vqe`.`dim_manufacturers` WHERE `manufacturer` = :name)",
+            {"name": self.new_car["make"]},
+        )
+        dal.data_changed(rows)
+
+        return super().tearDown()
+
+    def test_requires_admin_token(self) -> None:
+        response = self.client.post(self.car_path, json=[self.new_car])
+
+        self.assertEqual("403 FORBIDDEN", response.status)
+
+    def test_json_array(self) -> None:
+        response = self.client.post(
+            self.car_path,
+            json=[self.new_car, self.existing_car, {**self.new_car, "seats": -1}],
+            headers=self.headers,
+        )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(3, response.json["received"])
+        self.assertEqual(1, response.json["inserted"])
+        self.assertEqual(1, response.json["duplicates"])
+        self.assertEqual(1, response.json["rejected"])
+        self.assertEqual(
+            [
+                {
+                    "record": 2,
+                    "field": "seats",
+                    "message": "`seats` must be between 0 and 255.",
+                }
+            ],
+            response.json["batches"][0]["errors"],
+        )
+
+        results = dal.query(
+            Car,
+            {
+                "make": {
+                    "operator": "and",
+                    "constraints": [
+                        {"operator": "equals", "value": "Bulk Test Motors"}
+                    ],
+                }
+            },
+        )
+        self.assertEqual(1, len(results))
+        self.assertEqual("Loader", results[0]["model"])
+
+    @data("0", "-1")
+    def test_writes_without_retries(self, attempts: str) -> None:
+        with mock.patch.dict("os.environ", {"VQE_WRITE_ATTEMPTS": attempts}):
+            response = self.client.post(
+                self.car_path, json=[self.new_car], headers=self.headers
+            )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(1, response.json["inserted"])
+
+    def test_ndjson_batches(self) -> None:
+        records = [{**self.new_car, "year": 2000 + i} for i in range(5)]
+        response = self.client.post(
+            self.car_path,
+            query_string="batch_size=2",
+            data="".join(f"{json.dumps(r)}\n" for r in records),
+            content_type="application/x-ndjson",
+            headers=self.headers,
+        )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(5, response.json["inserted"])
+        self.assertEqual(
+            [(0, 2), (1, 2), (2, 1)],
+            [(b["batch"], b["received"]) for b in response.json["batches"]],
+        )
+
+    def test_malformed_body_reports_committed_batches(self) -> None:
+        response = self.client.post(
+            self.car_path,
+            query_string="batch_size=1",
+            data=f"{json.dumps(self.new_car)}\n{{not json\n",
+            content_type="application/x-ndjson",
+            headers=self.headers,
+        )
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertEqual("Invalid JSON on line 2", response.json["errors"]["body"])
+        self.assertEqual(1, response.json["inserted"])
+
+    def test_unsupported_content_type(self) -> None:
+        response = self.client.post(
+            self.car_path,
+            data="make=x",
+            content_type="text/plain",
+            headers=self.headers,
+        )
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertIn("Content-Type", response.json["errors"])
+
+    @data(
+        (Car, {"colour": None}, "colour", "`colour` is required."),
+        (Car, {"seats": "many"}, "seats", "Value for `seats` must be a whole number."),
+        (
+            Car,
+            {"engine_size": 12},
+            "engine_size",
+            "`engine_size` must be between 0 and 9.9.",
+        ),
+        (
+            Car,
+            {"colour": "x" * 65},
+            "colour",
+            "`colour` must be at most 64 characters.",
+        ),
+        (
+            Bike,
+            {"type": "Tandem"},
+            "type",
+            "`type` must be one of Road, BMX, City, Mountain, Hybrid.",
+        ),
+        (
+            Spaceship,
+            {"manufacturer": " "},
+            "manufacturer",
+            "`manufacturer` must not be empty.",
+        ),
+    )
+    @unpack
+    def test_rejects_invalid_records(
+        self, cls, changes: dict, field: str, message: str
+    ) -> None:
+        record = {**dal.query(cls)[0], **changes}
+
+        valid, errors = validate_records(cls, [record], 10)
+
+        self.assertEqual([], valid)
+        self.assertEqual([(10, field, message)], [tuple(e) for e in errors])
+
+    def test_converts_record_values(self) -> None:
+        valid, errors = validate_records(
+            Bike,
+            [
+                {
+                    "brand": "EraCraft",
+                    "model": "Urbanite",
+                    "gears": "3",
+                    "type": "road",
+                    "wheel_size": 29,
+                    "year": 2014.0,
+                }
+            ],
+        )
+
+        self.assertEqual([], errors)
+        self.assertEqual(
+            {
+                "brand": "EraCraft",
+                "model": "Urbanite",
+                "gears": 3,
+                "type": "Road",
+                "wheel_size": Decimal(29),
+                "year": 2014,
+            },
+            valid[0],
+        )
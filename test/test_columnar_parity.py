@@ -0,0 +1,138 @@
+import json
+import operator
+import unittest
+
+from decimal import Decimal
+
+from ddt import ddt, data, unpack
+
+from flask_server import app  # noqa: F401 - scaffolds the database
+from dal.columnar import ColumnarDal, np
+from dal.models.facts import Bike, Car, Spaceship
+from dal.mysql import MySQLDal
+from dal.pagination import decode_cursor
+from sample_data.payloads import (
+    bike_gears_and_type_and_year,
+    car_colours,
+    car_make_and_year,
+    car_less_than_or_equal_seats,
+    spaceship_singular_model,
+    spaceship_two_models,
+    spaceship_manufacturer_and_year,
+)
+
+
+def constraint(field: str, operator: str, value, column_operator: str = "and") -> dict:
+    return {
+        field: {
+            "operator": column_operator,
+            "constraints": [{"operator": operator, "value": value}],
+        }
+    }
+
+
+@ddt
+@unittest.skipIf(np is None, "numpy is not installed")
+class ColumnarParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.dal = MySQLDal()
+        cls.columnar = ColumnarDal(cls.dal)
+        cls.columnar.load()
+
+        return super().setUpClass()
+
+    @data(
+        (Spaceship, json.loads(spaceship_singular_model)),
+        (Spaceship, json.loads(spaceship_two_models)),
+        (Spaceship, json.loads(spaceship_manufacturer_and_year)),
+        (Car, json.loads(car_less_than_or_equal_seats)),
+        (Car, json.loads(car_colours)),
+        (Car, json.loads(car_make_and_year)),
+        (Bike, json.loads(bike_gears_and_type_and_year)),
+        (Car, constraint("colour", "equals", "azure")),
+        (Car, constraint("colour", "notEquals", "Azure")),
+        (Car, constraint("colour", "equals", "Azúre")),
+        (Car, constraint("colour", "startsWith", "BLÜ")),
+        (Car, constraint("colour", "endsWith", "blue")),
+        (Car, constraint("colour", "endsWith", "_")),
+        (Car, constraint("colour", "notContains", "%")),
+        (Car, constraint("make", "endsWith", "\\")),
+        (Spaceship, constraint("model", "contains", "_")),
+        (Car, constraint("model", "notContains", "o")),
+        (Car, constraint("make", "in", ["PureVolt", "hydraworks"])),
+        (Car, constraint("make", "notIn", ["PureVolt"])),
+        (Car, constraint("make", "in", ["PüreVolt"])),
+        (Car, constraint("engine_size", "gte", 3.7)),
+        (Car, constraint("top_speed", "lt", "253.6")),
+        (Car, constraint("engine_size", "gt", "3.65")),
+        (Car, constraint("engine_size", "lte", "3.70")),
+        (Car, constraint("engine_size", "equals", "3.75")),
+        (Car, constraint("engine_size", "notEquals", "3.75")),
+        (Car, constraint("year", "startsWith", "19")),
+        (Bike, constraint("wheel_size", "in", [26, 29])),
+        (Bike, constraint("wheel_size", "notIn", ["26.0", "27.55"])),
+        (Bike, constraint("type", "gt", "city")),
+        (Spaceship, constraint("top_speed", "lte", 0.5)),
+        (Spaceship, constraint("manufacturer", "contains", "forge")),
+        (Spaceship, constraint("manufacturer", "contains", "FÖRGE")),
+        (Spaceship, constraint("top_speed", "gte", "0.500001")),
+        (Spaceship, constraint("max_crew", "notEquals", 50)),
+    )
+    @unpack
+    def test_query_parity(self, cls, query: dict) -> None:
+        expected = self.dal.query(cls, query)
+        actual = self.columnar.query(cls, query)
+
+        self.assertEqual(self.__canonical(expected), self.__canonical(actual))
+
+    @data(
+        ("lt", operator.lt),
+        ("lte", operator.le),
+        ("gt", operator.gt),
+        ("gte", operator.ge),
+        ("equals", operator.eq),
+        ("notEquals", operator.ne),
+    )
+    @unpack
+    def test_decimals_compare_exactly(self, name: str, compare) -> None:
+        # closer to a stored value than a float can tell apart
+        value = Decimal(str(self.dal.query(Car)[0]["top_speed"])) + Decimal("1e-20")
+        expected = [
+            r
+            for r in self.dal.query(Car)
+            if compare(Decimal(str(r["top_speed"])), value)
+        ]
+
+        actual = self.columnar.query(Car, constraint("top_speed", name, str(value)))
+
+        self.assertEqual(self.__canonical(expected), self.__canonical(actual))
+
+    @data(
+        (Car, "year", "ASC"),
+        (Car, "top_speed", "DESC"),
+        (Car, "manufacturer", "ASC"),
+        (Bike, "model", "DESC"),
+        (Spaceship, "top_speed", "ASC"),
+        (Spaceship, None, "DESC"),
+    )
+    @unpack
+    def test_query_page_parity(self, cls, sort_field: str, sort_order: str) -> None:
+        expected_cursor = actual_cursor = None
+        while True:
+            expected, expected_cursor = self.dal.query_page(
+                cls, None, sort_field, sort_order, 9, expected_cursor
+            )
+            actual, actual_cursor = self.columnar.query_page(
+                cls, None, sort_field, sort_order, 9, actual_cursor
+            )
+
+            self.assertEqual(expected, actual)
+            self.assertEqual(expected_cursor, actual_cursor)
+            if expected_cursor is None:
+                break
+
+            expected_cursor = actual_cursor = decode_cursor(expected_cursor)
+
+    def __canonical(self, results: list[dict]) -> list[str]:
+        return sorted(json.dumps(r, sort_keys=True, default=str) for r in results)
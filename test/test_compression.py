@@ -0,0 +1,155 @@
+import gzip
+import json
+import unittest
+import zlib
+
+from ddt import ddt, data, unpack
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from apis.namespaces.v1.vehicles import dal
+from flask_server import app
+from helpers.compression_helper import (
+    Compression,
+    Encoder,
+    brotli,
+    compression,
+    zstandard,
+)
+
+car_path = "/api/v1/vehicles/cars"
+
+
+def accept(value: str) -> Accept:
+    return parse_accept_header(value)
+
+
+def decompress(encoding: str, body: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return brotli.decompress(body)
+    return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+def decompress_partial(encoding: str, body: bytes) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompressobj(31).decompress(body)
+    if encoding == "br":
+        return brotli.Decompressor().process(body)
+    return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+available = ["gzip"] + (["br"] if brotli else []) + (["zstd"] if zstandard else [])
+
+
+@ddt
+class CompressionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        ("gzip", "gzip"),
+        ("gzip, deflate", "gzip"),
+        ("deflate", None),
+        ("", None),
+        ("gzip;q=0", None),
+        ("*", "gzip"),
+        ("identity", None),
+    )
+    @unpack
+    def test_negotiate(self, header: str, expected) -> None:
+        self.assertEqual(expected, Compression(["gzip"]).negotiate(accept(header)))
+
+    @data(
+        (["zstd", "br", "gzip"], "gzip, br, zstd", "zstd"),
+        (["gzip", "br"], "gzip, br", "gzip"),
+        (["zstd", "br", "gzip"], "br;q=0.5, gzip", "gzip"),
+    )
+    @unpack
+    def test_negotiate_preference(self, encodings, header: str, expected) -> None:
+        if expected == "zstd" and not zstandard:
+            self.skipTest("requires zstandard")
+
+        self.assertEqual(expected, Compression(encodings).negotiate(accept(header)))
+
+    def test_stream_decodes_after_every_chunk(self) -> None:
+        chunks = [f"{json.dumps({'row': n})}\n" * 200 for n in range(5)]
+        for encoding in available:
+            with self.subTest(encoding=encoding):
+                compressed = list(compression.compress_stream(encoding, iter(chunks)))
+
+                self.assertEqual(
+                    "".join(chunks).encode(),
+                    decompress(encoding, b"".join(compressed)),
+                )
+                # flushed chunks can be decoded before the stream ends
+                self.assertEqual(
+                    chunks[0].encode(), decompress_partial(encoding, compressed[0])
+                )
+
+    def test_incomplete_encoder(self) -> None:
+        class Incomplete(Encoder):
+            def compress(self, data: bytes) -> bytes:
+                return data
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_compresses_vehicle_responses(self) -> None:
+        plain = self.client.get(car_path)
+
+        for encoding in available:
+            with self.subTest(encoding=encoding):
+                response = self.client.get(
+                    car_path, headers={"Accept-Encoding": encoding}
+                )
+
+                self.assertEqual(encoding, response.headers["Content-Encoding"])
+                self.assertIn("Accept-Encoding", response.headers["Vary"])
+                self.assertLess(len(response.data), len(plain.data))
+                self.assertEqual(plain.data, decompress(encoding, response.data))
+                self.assertNotEqual(plain.headers["ETag"], response.headers["ETag"])
+
+    def test_compresses_streams(self) -> None:
+        plain = self.client.get(car_path, query_string={"stream": "true"}).data
+
+        response = self.client.get(
+            car_path,
+            query_string={"stream": "true"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertNotIn("Content-Length", response.headers)
+        self.assertEqual(plain, gzip.decompress(response.data))
+
+    @data(
+        ("/ping", {}),
+        (
+            car_path,
+            {
+                "query": '{"year":{"operator":"and","constraints":[{"operator":"equals","value":1}]}}'
+            },
+        ),
+    )
+    @unpack
+    def test_skips_small_responses(self, path: str, query_string: dict) -> None:
+        response = self.client.get(
+            path, query_string=query_string, headers={"Accept-Encoding": "gzip"}
+        )
+
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_not_modified(self) -> None:
+        headers = {"Accept-Encoding": "gzip"}
+        etag = self.client.get(car_path, headers=headers).headers["ETag"]
+
+        response = self.client.get(car_path, headers={**headers, "If-None-Match": etag})
+
+        self.assertEqual(304, response.status_code)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(b"", response.data)
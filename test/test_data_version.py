@@ -0,0 +1,179 @@
+import json
+import unittest
+
+from unittest import mock
+
+from ddt import ddt, data
+
+from apis.namespaces.v1.vehicles import dal, engine
+from dal.data_version import DataVersionTracker
+from dal.models.metadata import DataVersion
+from flask_server import app
+from sample_data.payloads import car_make_and_year
+
+car_path = "/api/v1/vehicles/cars"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DataVersionTrackerTest(unittest.TestCase):
+    def test_bump(self) -> None:
+        before = dal.versions.current()
+
+        after = dal.versions.bump()
+
+        self.assertEqual(before.number + 1, after.number)
+        self.assertGreaterEqual(after.modified_at, before.modified_at)
+        self.assertEqual(after, dal.versions.current())
+
+    def test_sees_writes_of_other_processes(self) -> None:
+        clock = Clock()
+        tracker = DataVersionTracker(dal, ttl_seconds=1, clock=clock)
+        before = tracker.current()
+        local_version = dal.data_version
+
+        # another process writing
+        dal.execute(
+            f"UPDATE `{dal.db_name}`.`{DataVersion.table_name}` SET `version` = `version` + 1"
+        )
+        clock.now = 0.5
+        self.assertEqual(before, tracker.current())
+        self.assertEqual(local_version, dal.data_version)
+
+        clock.now = 1.0
+        self.assertEqual(before.number + 1, tracker.current().number)
+        self.assertEqual(local_version + 1, dal.data_version)
+
+    def test_data_changed_bumps(self) -> None:
+        before = dal.versions.current()
+
+        dal.data_changed(0)
+        self.assertEqual(before, dal.versions.current())
+
+        dal.data_changed(3)
+        self.assertEqual(before.number + 1, dal.versions.current().number)
+
+
+@ddt
+class ConditionalRequestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        {"query": car_make_and_year},
+        {"sort_field": "year", "limit": 5},
+        {"stream": "true"},
+    )
+    def test_if_none_match(self, query_string: dict) -> None:
+        response = self.client.get(car_path, query_string=query_string)
+        etag = response.headers["ETag"]
+
+        with mock.patch.object(engine, "query") as query, mock.patch.object(
+            engine, "query_page"
+        ) as query_page, mock.patch.object(engine, "stream") as stream:
+            cached = self.client.get(
+                car_path, query_string=query_string, headers={"If-None-Match": etag}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(304, cached.status_code)
+        self.assertEqual(b"", cached.data)
+        self.assertEqual(etag, cached.headers["ETag"])
+        query.assert_not_called()
+        query_page.assert_not_called()
+        stream.assert_not_called()
+
+    def test_if_modified_since(self) -> None:
+        response = self.client.get(car_path)
+
+        cached = self.client.get(
+            car_path, headers={"If-Modified-Since": response.headers["Last-Modified"]}
+        )
+
+        self.assertEqual(304, cached.status_code)
+        self.assertEqual("public, no-cache", cached.headers["Cache-Control"])
+
+    def test_write_changes_etag(self) -> None:
+        etag = self.client.get(car_path).headers["ETag"]
+
+        dal.data_changed()
+        response = self.client.get(car_path, headers={"If-None-Match": etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+    def test_etag_depends_on_request(self) -> None:
+        etags = {
+            self.client.get(car_path, query_string=query_string).headers["ETag"]
+            for query_string in [
+                {},
+                {"query": car_make_and_year},
+                {"sort_field": "year"},
+                {"sort_field": "year", "sort_order": "DESC"},
+                {"limit": 5},
+                {"stream": "true"},
+            ]
+        }
+
+        self.assertEqual(6, len(etags))
+
+    def test_etag_uses_normalized_query(self) -> None:
+        compact = json.dumps(json.loads(car_make_and_year), separators=(",", ":"))
+
+        self.assertEqual(
+            self.client.get(
+                car_path, query_string={"query": car_make_and_year}
+            ).headers["ETag"],
+            self.client.get(car_path, query_string={"query": compact}).headers["ETag"],
+        )
+
+    def test_write_while_reading_weakens_validators(self) -> None:
+        query = engine.query
+
+        def write_while_reading(*args):
+            results = query(*args)
+            dal.data_changed()
+            return results
+
+        with mock.patch.object(engine, "query", side_effect=write_while_reading):
+            response = self.client.get(car_path)
+        etag = response.headers["ETag"]
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(etag.startswith("W/"))
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+        self.assertNotIn("Last-Modified", response.headers)
+        self.assertEqual(
+            200,
+            self.client.get(car_path, headers={"If-None-Match": etag}).status_code,
+        )
+        self.assertFalse(self.client.get(car_path).headers["ETag"].startswith("W/"))
+
+    def test_streams_have_weak_validators(self) -> None:
+        response = self.client.get(car_path, query_string={"stream": "true"})
+        response.get_data()
+        etag = response.headers["ETag"]
+
+        with mock.patch.object(engine, "stream") as stream:
+            cached = self.client.get(
+                car_path,
+                query_string={"stream": "true"},
+                headers={"If-None-Match": etag},
+            )
+
+        self.assertTrue(etag.startswith("W/"))
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+        self.assertNotIn("Last-Modified", response.headers)
+        self.assertEqual(304, cached.status_code)
+        self.assertEqual(etag, cached.headers["ETag"])
+        self.assertEqual("no-store", cached.headers["Cache-Control"])
+        stream.assert_not_called()
@@ -0,0 +1,112 @@
+import unittest
+
+from unittest import mock
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from dal.dimension_cache import fold
+from dal.models.dimensions import Manufacturer, Model
+from dal.models.facts import Bike, Car, Spaceship
+from dal.query_compiler import compile_query
+
+
+def constraint(field: str, operator: str, value, logical: str = "and") -> dict:
+    return {
+        field: {
+            "operator": logical,
+            "constraints": [{"operator": operator, "value": value}],
+        }
+    }
+
+
+@ddt
+class DimensionCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        (Car, "make", "startsWith", "a"),
+        (Car, "model", "contains", "o"),
+        (Bike, "brand", "in", ["EraCraft", "Velocita"]),
+        (Spaceship, "manufacturer", "notEquals", "AetherForge"),
+        (Spaceship, "model", "endsWith", "RIDER"),
+    )
+    @unpack
+    def test_rewrites_to_ids(self, cls, field: str, operator: str, value) -> None:
+        compiled = compile_query(cls, constraint(field, operator, value))
+
+        rewritten = dal.dimensions.rewrite(compiled)
+
+        for column_filter in rewritten.filters:
+            self.assertIs(cls, column_filter.model)
+            self.assertIn(
+                column_filter.column, [Manufacturer.primary_key, Model.primary_key]
+            )
+            self.assertEqual("in", column_filter.constraints[0].operator)
+
+        expected = self.__query_without_cache(cls, compiled)
+        dal.result_cache.invalidate()
+        self.assertEqual(expected, sorted(dal.query(cls, compiled), key=repr))
+
+    def test_no_match_skips_database(self) -> None:
+        compiled = compile_query(Car, constraint("make", "equals", "No Such Make"))
+        dal.dimensions.rewrite(compile_query(Car, None))
+
+        with mock.patch.object(dal, "read_sql_query") as read_sql_query:
+            self.assertEqual([], dal.query(Car, compiled))
+            self.assertEqual(([], None), dal.query_page(Car, compiled, limit=10))
+            self.assertEqual([], list(dal.stream(Car, compiled)))
+
+        read_sql_query.assert_not_called()
+
+    @data(
+        (Spaceship, "model", "endsWith", "_"),
+        (Car, "make", "contains", "%"),
+        (Bike, "brand", "startsWith", "\\"),
+    )
+    @unpack
+    def test_wildcards_match_literally(
+        self, cls, field: str, operator: str, value: str
+    ) -> None:
+        compiled = compile_query(cls, constraint(field, operator, value))
+
+        self.assertIsNone(dal.dimensions.rewrite(compiled))
+        self.assertEqual([], self.__query_without_cache(cls, compiled))
+
+    def test_range_comparisons_are_left_to_mysql(self) -> None:
+        compiled = compile_query(Car, constraint("make", "gt", "M"))
+
+        self.assertEqual(compiled, dal.dimensions.rewrite(compiled))
+
+    def test_match_everything_drops_filter(self) -> None:
+        compiled = compile_query(Car, constraint("make", "notEquals", "No Such Make"))
+
+        self.assertEqual((), dal.dimensions.rewrite(compiled).filters)
+
+    def test_too_many_ids_are_left_to_mysql(self) -> None:
+        compiled = compile_query(Car, constraint("model", "notEquals", "No Such Model"))
+
+        with mock.patch.object(dal.dimensions, "max_ids", 1):
+            self.assertEqual(compiled, dal.dimensions.rewrite(compiled))
+
+    def test_reloads_after_data_changed(self) -> None:
+        dal.dimensions.rewrite(compile_query(Car, constraint("make", "equals", "x")))
+        version = dal.dimensions.loaded_version
+
+        dal.data_changed()
+        dal.dimensions.rewrite(compile_query(Car, constraint("make", "equals", "x")))
+
+        self.assertNotEqual(version, dal.dimensions.loaded_version)
+        self.assertEqual(dal.data_version, dal.dimensions.loaded_version)
+
+    @data(("Modèl", "model"), ("ÆTHER", "æther"), ("Straße", "strasse"))
+    @unpack
+    def test_fold(self, value: str, expected: str) -> None:
+        self.assertEqual(expected, fold(value))
+
+    def __query_without_cache(self, cls, compiled) -> list[dict]:
+        with mock.patch.object(dal.dimensions, "max_ids", 0):
+            return sorted(dal.query(cls, compiled), key=repr)
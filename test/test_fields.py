@@ -0,0 +1,105 @@
+import json
+import unittest
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from flask_server import app
+from sample_data.payloads import car_make_and_year
+
+car_path = "/api/v1/vehicles/cars"
+bike_path = "/api/v1/vehicles/bikes"
+spaceship_path = "/api/v1/vehicles/spaceships"
+
+
+def project(results: list[dict], fields: list[str]) -> list[dict]:
+    return [{f: r[f] for f in fields} for r in results]
+
+
+@ddt
+class FieldsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        (car_path, {}, ["model", "year"]),
+        (car_path, {"query": car_make_and_year}, ["year"]),
+        (car_path, {"sort_field": "manufacturer", "sort_order": "DESC"}, ["colour"]),
+        (bike_path, {"sort_field": "model"}, ["brand", "gears"]),
+        (spaceship_path, {}, ["manufacturer", "model", "top_speed"]),
+    )
+    @unpack
+    def test_only_requested_fields(
+        self, path: str, query_string: dict, fields: list[str]
+    ) -> None:
+        expected = self.client.get(path, query_string=query_string).get_json()
+
+        response = self.client.get(
+            path, query_string={**query_string, "fields": ",".join(fields)}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertGreater(response.get_json()["count"], 0)
+        self.assertEqual(
+            project(expected["results"], fields), response.get_json()["results"]
+        )
+
+    @data(None, "seats", "manufacturer")
+    def test_pagination(self, sort_field: str) -> None:
+        params = {"limit": 1000, "sort_field": sort_field}
+        expected = self.client.get(car_path, query_string=params).get_json()
+
+        paged_results = []
+        cursor = None
+        while True:
+            params = {"limit": 7, "sort_field": sort_field, "fields": "year"}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(car_path, query_string=params).get_json()
+            paged_results.extend(response["results"])
+            cursor = response["cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(project(expected["results"], ["year"]), paged_results)
+
+    def test_stream(self) -> None:
+        expected = self.client.get(car_path, query_string={"fields": "make"})
+
+        response = self.client.get(
+            car_path, query_string={"fields": "make", "stream": "true"}
+        )
+        streamed = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        self.assertEqual(expected.get_json()["results"], streamed)
+
+    @data("", "year,,model", "brand", "car_id")
+    def test_invalid_fields(self, fields: str) -> None:
+        response = self.client.get(car_path, query_string={"fields": fields})
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("fields", response.get_json()["errors"])
+
+    def test_etag_depends_on_fields(self) -> None:
+        self.assertNotEqual(
+            self.client.get(car_path).headers["ETag"],
+            self.client.get(car_path, query_string={"fields": "year"}).headers["ETag"],
+        )
+        self.assertEqual(
+            self.client.get(car_path, query_string={"fields": "year,make"}).headers[
+                "ETag"
+            ],
+            self.client.get(car_path, query_string={"fields": "make,year"}).headers[
+                "ETag"
+            ],
+        )
+
+    @data("Car", "Bike", "Spaceship")
+    def test_swagger_fields_are_optional(self, name: str) -> None:
+        definitions = self.client.get("/api/v1/swagger.json").get_json()["definitions"]
+
+        self.assertTrue(definitions[name]["properties"])
+        self.assertNotIn("required", definitions[name])
@@ -0,0 +1,253 @@
+import json
+import unittest
+
+from decimal import Decimal
+
+from ddt import ddt, data
+
+from apis.namespaces.v1.vehicles import dal
+from dal.rows import Rows
+from flask_server import app
+from helpers.serialization_helper import (
+    ARROW_STREAM_MIMETYPE,
+    MSGPACK_MIMETYPE,
+    arrow_array,
+    arrow_batch,
+    arrow_stream,
+    msgpack,
+    pa,
+)
+from sample_data.payloads import car_make_and_year
+
+car_path = "/api/v1/vehicles/cars"
+bike_path = "/api/v1/vehicles/bikes"
+spaceship_path = "/api/v1/vehicles/spaceships"
+
+
+def as_json(value):
+    # Decimal fields are strings in the JSON responses
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def to_columns(results: list[dict]) -> dict[str, list]:
+    return {key: [r[key] for r in results] for key in results[0]}
+
+
+@ddt
+class ColumnarTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        (car_path, {}),
+        (car_path, {"query": car_make_and_year, "sort_field": "year"}),
+        (bike_path, {"limit": 5}),
+        (spaceship_path, {"limit": 3, "sort_field": "top_speed"}),
+    )
+    def test_same_values_as_rows(self, case: tuple) -> None:
+        path, query_string = case
+        rows = self.client.get(path, query_string=query_string).get_json()
+
+        response = self.client.get(
+            path, query_string={**query_string, "format": "columnar"}
+        )
+        columnar = response.get_json()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(to_columns(rows["results"]), columnar["results"])
+        self.assertEqual(rows["count"], columnar["count"])
+        self.assertEqual(rows.get("cursor"), columnar.get("cursor"))
+        self.assertLess(len(response.data), len(json.dumps(rows)))
+
+    def test_etag_depends_on_format(self) -> None:
+        rows = self.client.get(car_path)
+        columnar = self.client.get(car_path, query_string={"format": "columnar"})
+
+        self.assertNotEqual(rows.headers["ETag"], columnar.headers["ETag"])
+        self.assertIn("Accept", columnar.headers["Vary"])
+
+    def test_invalid_format(self) -> None:
+        response = self.client.get(car_path, query_string={"format": "tables"})
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("format", response.get_json()["errors"])
+
+    def test_not_as_ndjson(self) -> None:
+        response = self.client.get(
+            car_path, query_string={"format": "columnar", "stream": "true"}
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("format", response.get_json()["errors"])
+
+
+@unittest.skipUnless(msgpack, "requires msgpack")
+@ddt
+class MessagePackTest(unittest.TestCase):
+    headers = {"Accept": MSGPACK_MIMETYPE}
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        {},
+        {"format": "columnar"},
+        {"limit": 5, "sort_field": "top_speed"},
+        {"limit": 5, "format": "columnar"},
+    )
+    def test_same_body_as_json(self, query_string: dict) -> None:
+        expected = self.client.get(car_path, query_string=query_string).get_json()
+
+        response = self.client.get(
+            car_path, query_string=query_string, headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(MSGPACK_MIMETYPE, response.mimetype)
+        self.assertEqual(expected, msgpack.unpackb(response.data))
+
+    def test_prefers_json(self) -> None:
+        response = self.client.get(
+            car_path, headers={"Accept": f"application/json, {MSGPACK_MIMETYPE}"}
+        )
+
+        self.assertEqual("application/json", response.mimetype)
+
+    def test_not_streamed(self) -> None:
+        response = self.client.get(
+            car_path, query_string={"stream": "true"}, headers=self.headers
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("stream", response.get_json()["errors"])
+
+    def test_compressed(self) -> None:
+        response = self.client.get(
+            car_path, headers={**self.headers, "Accept-Encoding": "gzip"}
+        )
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+
+
+@unittest.skipUnless(pa, "requires pyarrow")
+@ddt
+class ArrowTest(unittest.TestCase):
+    headers = {"Accept": ARROW_STREAM_MIMETYPE}
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    def read(self, response) -> "pa.Table":
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(ARROW_STREAM_MIMETYPE, response.mimetype)
+        return pa.ipc.open_stream(response.data).read_all()
+
+    @data(
+        (car_path, {}),
+        (
+            bike_path,
+            {
+                "query": '{"year":{"operator":"and","constraints":[{"operator":"gt","value":2000}]}}'
+            },
+        ),
+        (spaceship_path, {"limit": 5, "sort_field": "top_speed"}),
+    )
+    def test_same_records_as_json(self, case: tuple) -> None:
+        path, query_string = case
+        expected = self.client.get(path, query_string=query_string).get_json()
+
+        table = self.read(
+            self.client.get(path, query_string=query_string, headers=self.headers)
+        )
+
+        self.assertEqual(
+            expected["results"],
+            [{k: as_json(v) for k, v in r.items()} for r in table.to_pylist()],
+        )
+        metadata = table.schema.metadata
+        self.assertEqual(expected["count"], json.loads(metadata[b"count"]))
+        self.assertEqual(
+            expected.get("cursor"), json.loads(metadata.get(b"cursor", b"null"))
+        )
+
+    def test_stream(self) -> None:
+        expected = self.client.get(car_path).get_json()
+
+        response = self.client.get(
+            car_path, query_string={"stream": "true"}, headers=self.headers
+        )
+        table = self.read(response)
+
+        self.assertEqual(
+            expected["results"],
+            [{k: as_json(v) for k, v in r.items()} for r in table.to_pylist()],
+        )
+
+    def test_no_records(self) -> None:
+        query = '{"year":{"operator":"and","constraints":[{"operator":"equals","value":1}]}}'
+        for query_string in [{"query": query}, {"query": query, "stream": "true"}]:
+            with self.subTest(query_string=query_string):
+                table = self.read(
+                    self.client.get(
+                        car_path, query_string=query_string, headers=self.headers
+                    )
+                )
+
+                self.assertEqual(0, table.num_rows)
+
+    def test_etag_depends_on_accept(self) -> None:
+        self.assertNotEqual(
+            self.client.get(car_path).headers["ETag"],
+            self.client.get(car_path, headers=self.headers).headers["ETag"],
+        )
+
+
+@unittest.skipUnless(pa, "requires pyarrow")
+class ArrowBatchTest(unittest.TestCase):
+    rows = Rows(
+        ("id", "make", "top_speed", "mass"),
+        [
+            (1, "Ford", Decimal("193.5"), 70000),
+            (2, "Ford", Decimal("0.0"), 2**40),
+            (3, "Škoda", Decimal("250.0"), 3),
+        ],
+    )
+
+    def test_decimals(self) -> None:
+        array = arrow_array([Decimal("1.5"), Decimal("22.0")])
+
+        self.assertEqual(pa.decimal128(38, 1), array.type)
+        self.assertEqual([Decimal("1.5"), Decimal("22.0")], array.to_pylist())
+        self.assertEqual(
+            [Decimal("1.5"), None], arrow_array([Decimal("1.5"), None]).to_pylist()
+        )
+
+    def test_compact(self) -> None:
+        batch = arrow_batch(self.rows, compact=True)
+
+        self.assertEqual(pa.int8(), batch.schema.field("id").type)
+        self.assertEqual(pa.int64(), batch.schema.field("mass").type)
+        self.assertTrue(pa.types.is_dictionary(batch.schema.field("make").type))
+        self.assertEqual(list(self.rows), batch.to_pylist())
+
+    def test_stream_keeps_schema(self) -> None:
+        chunks = [self.rows[:1], Rows(self.rows.columns, []), self.rows[1:]]
+
+        table = pa.ipc.open_stream(b"".join(arrow_stream(iter(chunks)))).read_all()
+
+        self.assertEqual(list(self.rows), table.to_pylist())
+        self.assertEqual(pa.int64(), table.schema.field("id").type)
+
+    def test_empty_stream(self) -> None:
+        table = pa.ipc.open_stream(b"".join(arrow_stream(iter([])))).read_all()
+
+        self.assertEqual(0, table.num_rows)
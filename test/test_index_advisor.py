@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from dal.models.facts import Bike, Car
+from dal.query_compiler import compile_query
+from dal.workload import WorkloadRecorder, load_workload, shape_of
+from tools.index_advisor import (
+    IndexAdvisor,
+    TableStatistics,
+    aggregate,
+    estimate_rows,
+    index_columns,
+)
+
+year_and_seats = {
+    "year": {"operator": "and", "constraints": [{"operator": "equals", "value": 2020}]},
+    "seats": {"operator": "or", "constraints": [{"operator": "in", "value": [2, 4]}]},
+    "top_speed": {
+        "operator": "and",
+        "constraints": [{"operator": "gte", "value": "200.5"}],
+    },
+}
+year_only = {
+    "year": {"operator": "and", "constraints": [{"operator": "equals", "value": 2021}]}
+}
+statistics = TableStatistics(
+    1000, {"year": 50, "seats": 5, "top_speed": 500, "horsepower": 200}
+)
+
+
+def entry(cls, query: dict, seconds: float, sort_field=None) -> dict:
+    compiled = compile_query(cls, query)
+    return {
+        "vehicle": cls.__name__,
+        "shape": shape_of(compiled),
+        "query": compiled.as_query(),
+        "sort_field": sort_field,
+        "sort_order": "ASC" if sort_field else None,
+        "paginate": False,
+        "seconds": seconds,
+        "rows": 1,
+    }
+
+
+@ddt
+class IndexAdvisorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+        return super().tearDown()
+
+    def test_records_queries(self) -> None:
+        path = os.path.join(self.directory.name, "workload.jsonl")
+        compiled = compile_query(Car, year_and_seats)
+
+        with mock.patch.object(dal, "workload", WorkloadRecorder(path)):
+            dal.query(Car, compiled, "horsepower", "DESC")
+            dal.query(Car, compiled, "horsepower", "DESC")
+            dal.query_page(Car, compiled, limit=5)
+
+        entries = load_workload(path)
+        self.assertEqual([False, True], [e["paginate"] for e in entries])
+        self.assertEqual("horsepower", entries[0]["sort_field"])
+        self.assertEqual(compiled, compile_query(Car, entries[0]["query"]))
+        self.assertEqual(
+            json.loads(json.dumps(shape_of(compiled))), entries[0]["shape"]
+        )
+
+    def test_aggregates_by_shape(self) -> None:
+        stats = aggregate(
+            [
+                entry(Car, year_only, 0.1),
+                entry(Car, year_and_seats, 0.5),
+                entry(Car, {**year_only, "year": year_only["year"]}, 0.3),
+                entry(Car, year_only, 0.1, "seats"),
+            ]
+        )
+
+        self.assertEqual([0.5, 0.4, 0.1], [s.seconds for s in stats])
+        self.assertEqual([1, 2, 1], [s.queries for s in stats])
+        self.assertEqual(0.3, stats[1].sample["seconds"])
+
+    @data(
+        (year_and_seats, None, ["seats", "year", "top_speed"]),
+        (year_only, "horsepower", ["year", "horsepower"]),
+        (year_only, "make", ["year"]),
+        (
+            {
+                "colour": {
+                    "operator": "and",
+                    "constraints": [{"operator": "endsWith", "value": "blue"}],
+                }
+            },
+            None,
+            ["colour_reversed"],
+        ),
+        (
+            {
+                "colour": {
+                    "operator": "and",
+                    "constraints": [{"operator": "contains", "value": "blue"}],
+                }
+            },
+            None,
+            [],
+        ),
+    )
+    @unpack
+    def test_index_columns(self, query: dict, sort_field, expected: list) -> None:
+        self.assertEqual(expected, index_columns(compile_query(Car, query), sort_field))
+
+    def test_covering_index_columns(self) -> None:
+        columns = index_columns(compile_query(Bike, year_only), "gears", covering=True)
+
+        self.assertEqual(
+            ["year", "gears", "manufacturer_id", "model_id", "type", "wheel_size"],
+            columns,
+        )
+
+    def test_estimate_rows(self) -> None:
+        compiled = compile_query(Car, year_and_seats)
+
+        # 1000 rows * 2/5 seats * 1/50 years * 1/3 for the range
+        self.assertEqual(
+            3, estimate_rows(compiled, ["seats", "year", "top_speed"], statistics)
+        )
+        self.assertEqual(8, estimate_rows(compiled, ["seats", "year"], statistics))
+        self.assertEqual(
+            1000, estimate_rows(compiled, ["horsepower", "year"], statistics)
+        )
+
+    def test_recommend(self) -> None:
+        advisor = IndexAdvisor(dal)
+        entries = [
+            entry(Car, year_and_seats, 0.6),
+            entry(Car, {"seats": year_and_seats["seats"]}, 0.2),
+            entry(Car, year_only, 0.2, "horsepower"),
+        ]
+
+        with mock.patch.object(
+            advisor, "examined_rows", return_value=1000
+        ), mock.patch.object(
+            advisor, "table_statistics", return_value=statistics
+        ), mock.patch.object(
+            advisor, "existing_indexes", return_value=[["year"], ["seats"]]
+        ):
+            recommendations = advisor.recommend(entries)
+            self.assertEqual(
+                recommendations, advisor.recommend(list(reversed(entries)))
+            )
+
+        self.assertEqual(
+            [["seats", "year", "top_speed"], ["year", "horsepower"]],
+            [r.columns for r in recommendations],
+        )
+        self.assertEqual(
+            "ALTER TABLE `vqe`.`fact_vehicle_cars` ADD INDEX `idx_seats_year_top_speed`"
+            " (`seats`, `year`, `top_speed`), ALGORITHM=INPLACE, LOCK=NONE",
+            recommendations[0].ddl,
+        )
+        self.assertEqual(1, recommendations[0].queries)
+        self.assertAlmostEqual(
+            0.6 * (1 - 3 / 1000), recommendations[0].estimated_benefit_seconds
+        )
+
+        with mock.patch.object(dal, "execute") as execute:
+            applied = advisor.apply(recommendations, min_benefit=0.5)
+
+        self.assertEqual(["idx_seats_year_top_speed"], applied)
+        execute.assert_called_once_with(recommendations[0].ddl)
+
+    def test_prefix_shapes_share_an_index(self) -> None:
+        advisor = IndexAdvisor(dal)
+        year_and_seats_only = {k: year_and_seats[k] for k in ["year", "seats"]}
+
+        with mock.patch.object(
+            advisor, "examined_rows", return_value=1000
+        ), mock.patch.object(
+            advisor, "table_statistics", return_value=statistics
+        ), mock.patch.object(
+            advisor, "existing_indexes", return_value=[]
+        ):
+            recommendations = advisor.recommend(
+                [
+                    entry(Car, year_and_seats, 0.6),
+                    entry(Car, year_and_seats_only, 0.2),
+                ]
+            )
+
+        self.assertEqual(1, len(recommendations))
+        self.assertEqual(2, recommendations[0].queries)
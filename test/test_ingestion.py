@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from ddt import ddt, data
+
+from dal.ingestion import CheckpointStore, JsonArrayReader, JsonReadError, open_source
+
+
+@ddt
+class IngestionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.items = [
+            {"description": "schema"},
+            *[
+                {"model": f"Modèl {i}", "year": 2000 + i, "top_speed": 0.5}
+                for i in range(25)
+            ],
+        ]
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+        return super().tearDown()
+
+    def test_reads_items_across_blocks(self) -> None:
+        path = self.__write("vehicles.json", json.dumps(self.items, indent=4).encode())
+
+        with open_source(path) as stream:
+            self.assertEqual(self.items, list(JsonArrayReader(stream, block_size=7)))
+
+    def test_reads_gzip_files(self) -> None:
+        path = self.__write(
+            "vehicles.json.gz", gzip.compress(json.dumps(self.items).encode())
+        )
+
+        with open_source(path) as stream:
+            self.assertEqual(self.items, list(JsonArrayReader(stream, block_size=16)))
+
+    @data([], [1, 2.5, "three", None, [4]], [{"nested": {"a": [1, 2]}}])
+    def test_reads_any_array(self, items: list) -> None:
+        path = self.__write("items.json", json.dumps(items).encode())
+
+        with open_source(path) as stream:
+            self.assertEqual(items, list(JsonArrayReader(stream, block_size=3)))
+
+    def test_chunks(self) -> None:
+        path = self.__write("vehicles.json", json.dumps(self.items).encode())
+
+        with open_source(path) as stream:
+            chunks = list(JsonArrayReader(stream).chunks(10))
+
+        self.assertEqual([10, 10, 6], [len(c) for c in chunks])
+
+    def test_resumes_from_offset(self) -> None:
+        path = self.__write(
+            "vehicles.json.gz", gzip.compress(json.dumps(self.items, indent=2).encode())
+        )
+
+        with open_source(path) as stream:
+            reader = JsonArrayReader(stream, block_size=11)
+            first = [reader.read() for _ in range(9)]
+            offset = reader.offset
+
+        with open_source(path) as stream:
+            rest = list(JsonArrayReader(stream, start_offset=offset, block_size=11))
+
+        self.assertEqual(self.items, first + rest)
+
+    @data(
+        b'{"model": "x"}',
+        b'[{"model": "x"}, {"model": ',
+        b'[{"model": "x"} {"model": "y"}]',
+    )
+    def test_invalid_documents(self, content: bytes) -> None:
+        path = self.__write("invalid.json", content)
+
+        with open_source(path) as stream:
+            with self.assertRaises(JsonReadError):
+                list(JsonArrayReader(stream, block_size=4))
+
+    def test_checkpoints(self) -> None:
+        path = self.__write("vehicles.json", json.dumps(self.items).encode())
+        store = CheckpointStore()
+
+        self.assertIsNone(store.load(path))
+        store.save(path, 120, 3)
+        self.assertEqual((120, 3), store.load(path)[3:])
+
+        with open(path, "ab") as f:
+            f.write(b" ")
+        self.assertIsNone(store.load(path))
+
+        store.clear(path)
+        self.assertFalse(os.path.exists(store.path_for(path)))
+
+    def __write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
@@ -0,0 +1,100 @@
+import argparse
+import threading
+import unittest
+
+from werkzeug.serving import make_server
+
+from flask_server import app
+from tools.load_test import (
+    HttpTarget,
+    InProcessTarget,
+    LevelResult,
+    parse_levels,
+    payload_paths,
+    run_level,
+    saturation,
+    workload_paths,
+)
+
+
+def level(concurrency: int, requests_per_second: float) -> LevelResult:
+    return LevelResult(
+        concurrency, 1, 0, 0.0, 1.0, requests_per_second, 0.1, 0.2, 0.3, {"200": 1}
+    )
+
+
+class LoadTestTest(unittest.TestCase):
+    def test_payload_paths(self) -> None:
+        paths = payload_paths()
+
+        self.assertEqual(7, len(paths))
+        self.assertEqual(
+            {"bikes", "cars", "spaceships"},
+            {p.split("?")[0].rsplit("/", 1)[1] for p in paths},
+        )
+
+    def test_workload_paths(self) -> None:
+        query = {"year": {"operator": "and", "constraints": []}}
+        paths = workload_paths(
+            [
+                {"vehicle": "Car", "query": query, "sort_field": None},
+                {
+                    "vehicle": "Bike",
+                    "query": query,
+                    "sort_field": "year",
+                    "sort_order": "DESC",
+                    "paginate": True,
+                },
+            ]
+        )
+
+        self.assertTrue(paths[0].startswith("/api/v1/vehicles/cars?query="))
+        self.assertNotIn("sort_field", paths[0])
+        self.assertIn("sort_field=year&sort_order=DESC&limit=100", paths[1])
+
+    def test_run_level_in_process(self) -> None:
+        result = run_level(InProcessTarget(app).get, payload_paths(), 2, 0.2)
+
+        self.assertEqual(2, result.concurrency)
+        self.assertGreater(result.requests, 0)
+        self.assertEqual(0, result.errors)
+        self.assertEqual({"200": result.requests}, result.statuses)
+        self.assertLessEqual(result.p50_seconds, result.p99_seconds)
+
+    def test_run_level_over_http(self) -> None:
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            target = HttpTarget(f"http://127.0.0.1:{server.server_port}")
+            result = run_level(target.get, ["/ping", "/missing"], 2, 0.2)
+        finally:
+            server.shutdown()
+
+        self.assertEqual({"200", "404"}, set(result.statuses))
+        self.assertEqual(0, result.errors)
+
+    def test_counts_failures(self) -> None:
+        def send(path: str) -> int:
+            if path == "/fail":
+                raise ConnectionError()
+            return 500 if path == "/error" else 200
+
+        result = run_level(send, ["/ok", "/fail", "/error", "/ok"], 1, 0.05)
+
+        self.assertEqual(
+            result.statuses["ConnectionError"] + result.statuses["500"], result.errors
+        )
+        self.assertGreater(result.error_rate, 0)
+
+    def test_saturation(self) -> None:
+        self.assertEqual(
+            4, saturation([level(1, 100), level(4, 300), level(8, 310), level(16, 250)])
+        )
+        self.assertIsNone(saturation([]))
+
+    def test_parse_levels(self) -> None:
+        self.assertEqual([1, 4, 16], parse_levels("16,1, 4,4"))
+        for value in ["", "0,2", "a"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_levels(value)
@@ -0,0 +1,140 @@
+import unittest
+
+from ddt import ddt, data, unpack
+
+from flask_server import app
+from apis.namespaces.v1.vehicles import dal, engine
+from helpers.metrics_helper import (
+    Metric,
+    Registry,
+    errors_total,
+    metrics,
+    pool_checkout_seconds,
+    request_duration,
+    result_rows,
+)
+
+
+@ddt
+class MetricsTest(unittest.TestCase):
+    car_path: str = "/api/v1/vehicles/cars"
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    def test_histogram_buckets(self) -> None:
+        registry = Registry()
+        histogram = registry.histogram("test_seconds", "Test", ["name"], [0.1, 1.0])
+        for value in [0.05, 0.1, 0.5, 5.0]:
+            histogram.observe(value, name='a "b"')
+
+        self.assertEqual(
+            [
+                "# HELP test_seconds Test",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{name="a \\"b\\"",le="0.1"} 2',
+                'test_seconds_bucket{name="a \\"b\\"",le="1.0"} 3',
+                'test_seconds_bucket{name="a \\"b\\"",le="+Inf"} 4',
+                'test_seconds_sum{name="a \\"b\\""} 5.65',
+                'test_seconds_count{name="a \\"b\\""} 4',
+            ],
+            registry.render().splitlines(),
+        )
+
+    def test_registers_once(self) -> None:
+        registry = Registry()
+        counter = registry.counter("test_total", "Test")
+        counter.inc()
+
+        self.assertIs(counter, registry.counter("test_total", "Test"))
+        self.assertEqual(1, registry.counter("test_total", "Test").value())
+
+    def test_incomplete_metric(self) -> None:
+        class Incomplete(Metric):
+            kind = "untyped"
+
+            def samples(self):
+                return []
+
+        with self.assertRaises(TypeError):
+            Incomplete("test", "Test")
+
+    @data(
+        (
+            '{"year":{"operator":"and","constraints":[{"operator":"gt","value":2000}]}}',
+            "gt",
+        ),
+        (
+            '{"year":{"operator":"and","constraints":[{"operator":"lt","value":2020}]},'
+            '"seats":{"operator":"or","constraints":[{"operator":"equals","value":2},'
+            '{"operator":"lt","value":2}]}}',
+            "equals,lt",
+        ),
+    )
+    @unpack
+    def test_query_metrics(self, query: str, operators: str) -> None:
+        labels = {"resource": "/api/v1/vehicles/cars", "operators": operators}
+        requests = request_duration.count(method="GET", **labels)
+        queries = result_rows.count(**labels)
+        checkouts = pool_checkout_seconds.count()
+
+        response = self.client.get(self.car_path, query_string={"query": query})
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(requests + 1, request_duration.count(method="GET", **labels))
+        self.assertEqual(queries + 1, result_rows.count(**labels))
+        if engine is dal:
+            self.assertLess(checkouts, pool_checkout_seconds.count())
+
+    def test_stream_rows(self) -> None:
+        labels = {"resource": "/api/v1/vehicles/cars", "operators": "none"}
+        queries = result_rows.count(**labels)
+        rows = result_rows.sum(**labels)
+
+        response = self.client.get(
+            self.car_path, headers={"Accept": "application/x-ndjson"}
+        )
+        lines = response.get_data(as_text=True).splitlines()
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(queries + 1, result_rows.count(**labels))
+        self.assertEqual(rows + len(lines), result_rows.sum(**labels))
+
+    def test_stream_duration_includes_body(self) -> None:
+        labels = {"resource": "/api/v1/vehicles/cars", "operators": "none"}
+        requests = request_duration.count(method="GET", **labels)
+
+        response = self.client.get(self.car_path, query_string={"stream": "true"})
+        response.get_data()
+
+        self.assertEqual(requests, request_duration.count(method="GET", **labels))
+        response.close()
+        self.assertEqual(requests + 1, request_duration.count(method="GET", **labels))
+
+    def test_metrics_endpoint(self) -> None:
+        self.client.get("/ping")
+        response = self.client.get("/metrics")
+        body = response.get_data(as_text=True)
+
+        self.assertEqual("200 OK", response.status)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+        self.assertIn(
+            'vqe_requests_total{resource="/ping",method="GET",status="200"}', body
+        )
+        self.assertIn("# TYPE vqe_request_duration_seconds histogram", body)
+        self.assertIn('vqe_db_pool_connections{state="in_use"}', body)
+
+    def test_counts_database_errors(self) -> None:
+        errors = errors_total.value(source="db", type="OperationalError")
+
+        with self.assertRaises(Exception):
+            dal.read_sql_query("SELECT * FROM `no_such_table`")
+
+        self.assertEqual(
+            errors + 1, errors_total.value(source="db", type="OperationalError")
+        )
+        self.assertIn("vqe_errors_total", metrics.render())
@@ -0,0 +1,314 @@
+import unittest
+
+from decimal import Decimal
+from ddt import ddt, data, unpack
+
+from dal.models.dimensions import Manufacturer, Model
+from dal.models.facts import Bike, Car, Spaceship
+from dal.query_compiler import (
+    QueryCompiler,
+    QueryValidationError,
+    compile_aggregation,
+    compile_query,
+)
+
+
+@ddt
+class QueryCompilerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.compiler = QueryCompiler("vqe", max_plans=2)
+
+        return super().setUp()
+
+    def test_compile_resolves_mapped_columns(self) -> None:
+        compiled = compile_query(
+            Car,
+            {
+                "make": {
+                    "operator": "or",
+                    "constraints": [{"operator": "endsWith", "value": "s"}],
+                }
+            },
+        )
+
+        self.assertEqual(1, len(compiled.filters))
+        self.assertEqual(Manufacturer, compiled.filters[0].model)
+        self.assertEqual("manufacturer", compiled.filters[0].column)
+        self.assertEqual("OR", compiled.filters[0].operator)
+
+    @data(
+        (Car, "seats", "7", 7),
+        (Car, "engine_size", 2, Decimal("2")),
+        (Bike, "wheel_size", "27.5", Decimal("27.5")),
+        (Spaceship, "model", 42, "42"),
+    )
+    @unpack
+    def test_compile_coerces_values(self, cls, field: str, value, expected) -> None:
+        compiled = compile_query(
+            cls,
+            {
+                field: {
+                    "operator": "and",
+                    "constraints": [{"operator": "equals", "value": value}],
+                }
+            },
+        )
+
+        self.assertEqual((expected,), compiled.values)
+        self.assertIs(type(expected), type(compiled.values[0]))
+
+    @data(
+        ["colour"],
+        {"colour": "red"},
+        {"colour": {"operator": "and", "constraints": [{"operator": "equals"}]}},
+        {
+            "colour": {
+                "operator": "and",
+                "constraints": [{"operator": "equals", "value": ["a"]}],
+            }
+        },
+        {
+            "year": {
+                "operator": "and",
+                "constraints": [{"operator": "gt", "value": True}],
+            }
+        },
+        {
+            "top_speed": {
+                "operator": "and",
+                "constraints": [{"operator": "gt", "value": "NaN"}],
+            }
+        },
+        {
+            "colour); DROP TABLE x; --": {
+                "operator": "and",
+                "constraints": [{"operator": "equals", "value": 1}],
+            }
+        },
+    )
+    def test_compile_rejects_invalid_queries(self, query) -> None:
+        with self.assertRaises(QueryValidationError):
+            compile_query(Car, query)
+
+    def test_plans_are_cached_by_shape(self) -> None:
+        first = compile_query(
+            Car,
+            {
+                "year": {
+                    "operator": "and",
+                    "constraints": [{"operator": "gt", "value": 2000}],
+                }
+            },
+        )
+        second = compile_query(
+            Car,
+            {
+                "year": {
+                    "operator": "and",
+                    "constraints": [{"operator": "gt", "value": "1990"}],
+                }
+            },
+        )
+
+        plan = self.compiler.plan(first, "year", "DESC")
+        self.assertIs(plan, self.compiler.plan(second, "year", "DESC"))
+        self.assertEqual({"arg_0_0": 1990}, self.compiler.bind(plan, second))
+        self.assertIn("vhlc.`year` > :arg_0_0", plan.sql)
+        self.assertIn("ORDER BY vhlc.`year` DESC", plan.sql)
+
+    def test_plan_cache_is_bounded(self) -> None:
+        compiled = compile_query(Car, None)
+        for sort_field in ["year", "seats", "colour"]:
+            self.compiler.plan(compiled, sort_field, "ASC")
+
+        self.assertEqual(2, self.compiler.plan_count())
+
+    def test_bind_transforms_like_values(self) -> None:
+        compiled = compile_query(
+            Car,
+            {
+                "colour": {
+                    "operator": "and",
+                    "constraints": [
+                        {"operator": "startsWith", "value": "Light"},
+                        {"operator": "contains", "value": "Y"},
+                    ],
+                }
+            },
+        )
+
+        plan = self.compiler.plan(compiled)
+        self.assertEqual(
+            {"arg_0_0": "Light%", "arg_0_1": "%Y%"}, self.compiler.bind(plan, compiled)
+        )
+
+    @data(
+        (
+            "colour",
+            "endsWith",
+            "Blue",
+            "vhlc.`colour_reversed` LIKE :arg_0_0",
+            {"arg_0_0": "eulB%"},
+        ),
+        (
+            "make",
+            "endsWith",
+            "s",
+            "manu.`manufacturer_reversed` LIKE :arg_0_0",
+            {"arg_0_0": "s%"},
+        ),
+        (
+            "model",
+            "contains",
+            "Nova",
+            "(MATCH (mdl.`model`) AGAINST (:arg_0_0_ft IN BOOLEAN MODE) AND mdl.`model` LIKE :arg_0_0)",
+            {"arg_0_0_ft": '"Nova"', "arg_0_0": "%Nova%"},
+        ),
+        (
+            "colour",
+            "endsWith",
+            "a_b%c\\",
+            "vhlc.`colour_reversed` LIKE :arg_0_0",
+            {"arg_0_0": "\\\\c\\%b\\_a%"},
+        ),
+        ("colour", "contains", "Y", "vhlc.`colour` LIKE :arg_0_0", {"arg_0_0": "%Y%"}),
+        (
+            "colour",
+            "startsWith",
+            "100%_",
+            "vhlc.`colour` LIKE :arg_0_0",
+            {"arg_0_0": "100\\%\\_%"},
+        ),
+        (
+            "colour",
+            "contains",
+            "Sky Blue",
+            "vhlc.`colour` LIKE :arg_0_0",
+            {"arg_0_0": "%Sky Blue%"},
+        ),
+        (
+            "colour",
+            "notContains",
+            "Blue",
+            "vhlc.`colour` NOT LIKE :arg_0_0",
+            {"arg_0_0": "%Blue%"},
+        ),
+    )
+    @unpack
+    def test_text_operators_use_indexes(
+        self, field: str, operator: str, value: str, sql: str, params: dict
+    ) -> None:
+        compiled = compile_query(
+            Car,
+            {
+                field: {
+                    "operator": "and",
+                    "constraints": [{"operator": operator, "value": value}],
+                }
+            },
+        )
+
+        plan = self.compiler.plan(compiled)
+        self.assertIn(sql, plan.sql)
+        self.assertEqual(params, self.compiler.bind(plan, compiled))
+
+    @data(
+        ("year,model", ("year", "model")),
+        (" model , year,year ", ("year", "model")),
+        ("make", ("manufacturer",)),
+        ("manufacturer,colour", ("colour", "manufacturer")),
+    )
+    @unpack
+    def test_compile_fields(self, fields: str, expected: tuple) -> None:
+        self.assertEqual(expected, compile_query(Car, None, fields).fields)
+
+    @data("", "year,", "generation", "brand")
+    def test_compile_rejects_invalid_fields(self, fields: str) -> None:
+        with self.assertRaises(QueryValidationError) as raised:
+            compile_query(Car, None, fields)
+
+        self.assertEqual("fields", raised.exception.field)
+
+    @data(
+        (None, None, [Manufacturer, Model]),
+        ("year", None, []),
+        ("year,model", None, [Model]),
+        ("year", "make", [Manufacturer]),
+        ("year", "model", [Model]),
+    )
+    @unpack
+    def test_plan_joins_only_needed_dimensions(
+        self, fields: str, sort_field: str, joined: list
+    ) -> None:
+        plan = self.compiler.plan(compile_query(Car, None, fields), sort_field, "ASC")
+
+        self.assertEqual(
+            joined,
+            [m for m in (Manufacturer, Model) if f"`{m.table_name}`" in plan.sql],
+        )
+
+    def test_plan_joins_filtered_dimensions(self) -> None:
+        compiled = compile_query(
+            Car,
+            {
+                "make": {
+                    "operator": "and",
+                    "constraints": [{"operator": "startsWith", "value": "A"}],
+                }
+            },
+            "year",
+        )
+
+        plan = self.compiler.plan(compiled)
+        self.assertIn("JOIN `vqe`.`dim_manufacturers` manu", plan.sql)
+        self.assertNotIn("dim_models", plan.sql)
+        self.assertNotIn("manu.`manufacturer` AS", plan.sql)
+
+    def test_plan_selects_fields(self) -> None:
+        plan = self.compiler.plan(compile_query(Car, None, "year,make"))
+
+        self.assertRegex(
+            plan.sql,
+            r"SELECT\s+vhlc\.`year`,\s+manu\.`manufacturer` AS `make`\s+FROM",
+        )
+
+    def test_page_plan_selects_sort_value(self) -> None:
+        compiled = compile_query(Car, None, "year")
+
+        plan = self.compiler.plan(compiled, "seats", "ASC", paginate=True)
+        self.assertIn(f"vhlc.`seats` AS `{self.compiler.page_sort_key}`", plan.sql)
+        self.assertIsNot(plan, self.compiler.plan(compile_query(Car, None), "seats"))
+
+    def test_count_plan_joins_nothing(self) -> None:
+        plan = self.compiler.plan_aggregate(
+            compile_query(Car, None), compile_aggregation(Car, None, None)
+        )
+
+        self.assertRegex(plan.sql, r"SELECT\s+COUNT\(\*\) AS `count`\s+FROM")
+        self.assertNotIn("JOIN", plan.sql)
+
+    def test_aggregate_plan(self) -> None:
+        aggregation = compile_aggregation(
+            Car, "make, year", "count,avg(horsepower),count"
+        )
+        compiled = compile_query(
+            Car,
+            {
+                "seats": {
+                    "operator": "and",
+                    "constraints": [{"operator": "lte", "value": 7}],
+                }
+            },
+        )
+
+        plan = self.compiler.plan_aggregate(compiled, aggregation)
+        self.assertEqual(("year", "manufacturer"), aggregation.group_by)
+        self.assertEqual(
+            ("year", "make", "count", "avg_horsepower"),
+            aggregation.output_names(Car),
+        )
+        self.assertIn("AVG(vhlc.`horsepower`) AS `avg_horsepower`", plan.sql)
+        self.assertIn("JOIN `vqe`.`dim_manufacturers` manu", plan.sql)
+        self.assertNotIn("dim_models", plan.sql)
+        self.assertIn("GROUP BY vhlc.`year`, manu.`manufacturer`", plan.sql)
+        self.assertIs(plan, self.compiler.plan_aggregate(compiled, aggregation))
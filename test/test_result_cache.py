@@ -0,0 +1,69 @@
+import unittest
+
+from dal.result_cache import ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.cache = ResultCache(
+            max_entries=2, max_bytes=10_000, ttl_seconds=10, clock=lambda: self.now
+        )
+
+        return super().setUp()
+
+    def test_hit_and_miss(self) -> None:
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", [{"year": 2020}])
+
+        self.assertEqual([{"year": 2020}], self.cache.get("a"))
+        self.assertEqual(1, self.cache.stats()["hits"])
+        self.assertEqual(1, self.cache.stats()["misses"])
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        self.cache.set("a", [])
+        self.cache.set("b", [])
+        self.cache.get("a")
+        self.cache.set("c", [])
+
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(1, self.cache.stats()["evictions"])
+
+    def test_entries_expire(self) -> None:
+        self.cache.set("a", [])
+        self.now = 10.0
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(1, self.cache.stats()["expirations"])
+        self.assertEqual(0, self.cache.stats()["entries"])
+
+    def test_bounded_by_bytes(self) -> None:
+        self.cache.max_entries = 100
+        rows = [{"colour": "x" * 1000} for _ in range(3)]
+        for key in range(5):
+            self.cache.set(key, rows)
+
+        self.assertLessEqual(self.cache.stats()["bytes"], 10_000)
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+        self.cache.set("huge", [{"colour": "x" * 20_000}])
+        self.assertIsNone(self.cache.get("huge"))
+
+    def test_invalidate(self) -> None:
+        self.cache.set("a", [])
+        self.cache.invalidate()
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(0, self.cache.stats()["bytes"])
+        self.assertEqual(1, self.cache.stats()["invalidations"])
+
+    def test_results_of_earlier_generation_are_dropped(self) -> None:
+        generation = self.cache.generation
+        self.cache.invalidate()
+        self.cache.set("a", [{"year": 2020}], generation)
+
+        self.assertIsNone(self.cache.get("a"))
+
+        self.cache.set("a", [{"year": 2021}], self.cache.generation)
+        self.assertEqual([{"year": 2021}], self.cache.get("a"))
@@ -0,0 +1,103 @@
+import unittest
+
+from unittest import mock
+
+from apis.namespaces.v1.vehicles import dal
+from dal.models.dimensions import Model
+from dal.models.facts import Car
+from dal.models.metadata import ScaffoldStep
+
+
+class ScaffoldTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.drop_steps()
+        self.addCleanup(self.drop_steps)
+        self.loads = {}
+        for name in ["load_spaceships", "load_bikes", "load_cars"]:
+            patcher = mock.patch.object(dal, name)
+            self.loads[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+        return super().setUp()
+
+    def drop_steps(self) -> None:
+        dal.execute(f"DROP TABLE IF EXISTS `{dal.db_name}`.`{ScaffoldStep.table_name}`")
+
+    def create_schema(self) -> None:
+        # only the table recording the steps, the vehicle tables already exist
+        dal.execute(ScaffoldStep.get_create_table())
+
+    def test_resumes_interrupted_scaffold(self) -> None:
+        self.loads["load_bikes"].side_effect = [RuntimeError("interrupted"), None]
+
+        with mock.patch.object(
+            dal, "database_exists", side_effect=[False, True, True]
+        ), mock.patch.object(
+            dal, "create_schema", side_effect=self.create_schema
+        ), mock.patch.object(
+            dal, "table_exists", return_value=True
+        ):
+            with self.assertRaises(RuntimeError):
+                dal.scaffold()
+            self.loads["load_cars"].assert_not_called()
+
+            dal.scaffold()
+            dal.scaffold()
+
+        self.assertEqual(1, self.loads["load_spaceships"].call_count)
+        self.assertEqual(2, self.loads["load_bikes"].call_count)
+        self.assertEqual(1, self.loads["load_cars"].call_count)
+
+    def test_skips_databases_scaffolded_before_steps_were_recorded(self) -> None:
+        with mock.patch.object(
+            dal, "database_exists", return_value=True
+        ), mock.patch.object(dal, "table_exists", return_value=False):
+            dal.scaffold()
+
+        for load in self.loads.values():
+            load.assert_not_called()
+
+    def test_migrates_databases_scaffolded_before_reversed_columns(self) -> None:
+        with mock.patch.object(
+            dal, "column_names", return_value={"colour"}
+        ), mock.patch.object(
+            dal, "fulltext_columns", return_value={"manufacturer"}
+        ), mock.patch.object(
+            dal, "execute"
+        ) as execute:
+            dal.migrate_schema()
+            statements = [call.args[0] for call in execute.call_args_list]
+
+        self.assertIn(
+            f"ALTER TABLE `{dal.db_name}`.`{Car.table_name}`"
+            " ADD COLUMN `colour_reversed` VARCHAR(64) AS (REVERSE(`colour`)) VIRTUAL NOT NULL,"
+            " ADD INDEX (`colour_reversed`)",
+            statements,
+        )
+        self.assertIn(
+            f"ALTER TABLE `{dal.db_name}`.`{Car.table_name}`"
+            " ADD FULLTEXT INDEX (`colour`) WITH PARSER ngram",
+            statements,
+        )
+        self.assertIn(
+            f"ALTER TABLE `{dal.db_name}`.`{Model.table_name}`"
+            " ADD FULLTEXT INDEX (`model`) WITH PARSER ngram",
+            statements,
+        )
+        self.assertFalse(
+            [s for s in statements if "FULLTEXT INDEX (`manufacturer`)" in s]
+        )
+
+    def test_leaves_migrated_tables_alone(self) -> None:
+        with mock.patch.object(
+            dal,
+            "column_names",
+            return_value={"manufacturer_reversed", "model_reversed", "colour_reversed"},
+        ), mock.patch.object(
+            dal, "fulltext_columns", return_value={"manufacturer", "model", "colour"}
+        ), mock.patch.object(
+            dal, "execute"
+        ) as execute:
+            dal.migrate_schema()
+
+        execute.assert_not_called()
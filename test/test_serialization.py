@@ -0,0 +1,211 @@
+import argparse
+import json
+import unittest
+
+from datetime import date
+from decimal import Decimal
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from dal.result_cache import estimate_size
+from dal.rows import Rows
+from flask_server import app
+from helpers.serialization_helper import (
+    DEFAULT_SEPARATORS,
+    RowEncoder,
+    dumps_body,
+    json_response,
+)
+from sample_data.payloads import car_make_and_year
+from tools.serialization_benchmark import measure, parse_rows, synthetic_rows
+
+car_path = "/api/v1/vehicles/cars"
+
+
+def rows_of(*values: tuple) -> Rows:
+    return Rows(("make", "model", "top_speed"), list(values))
+
+
+@ddt
+class RowEncoderTest(unittest.TestCase):
+    @data(
+        ("Ford", "Focus", Decimal("193.5")),
+        ("Škoda", "Octavia “RS”", Decimal("250")),
+        ('Quote "and" back\\slash', "Tab\tnew\nline", Decimal("-0.05")),
+        ("Control \x00\x1f", " 🚗", Decimal("1E+2")),
+        (None, "", Decimal("0.0")),
+        (True, False, 12345678901234567890),
+        ("Float", 0.1, float("nan")),
+        ("Infinity", float("inf"), float("-inf")),
+        ("Date", "falls back to the provider", date(2024, 2, 29)),
+    )
+    def test_matches_provider(self, row: tuple) -> None:
+        rows = rows_of(row)
+        with app.app_context():
+            provider = app.json
+            for separators in [(",", ":"), DEFAULT_SEPARATORS]:
+                with self.subTest(separators=separators):
+                    self.assertEqual(
+                        provider.dumps(rows[0], separators=separators),
+                        RowEncoder(rows.columns, provider, separators).encode(row),
+                    )
+
+    def test_mixed_column_types(self) -> None:
+        rows = rows_of(
+            ("Ford", "Focus", Decimal("193.5")),
+            ("Ford", None, 190),
+            (None, "Fiesta", None),
+        )
+        with app.app_context():
+            self.assertEqual(
+                app.json.dumps(list(rows), separators=(",", ":"))[1:-1],
+                RowEncoder(rows.columns, app.json).encode_all(rows.data),
+            )
+
+    @data(
+        ("%s", "100%", "ü"),
+        ("b", "a", "c"),
+        ("a", "a_b", "a b"),
+    )
+    def test_keys(self, columns: tuple) -> None:
+        rows = Rows(columns, [(1, "%d", Decimal("2.5")), (2, "%%", None)])
+        with app.app_context():
+            self.assertEqual(
+                app.json.dumps(list(rows), separators=(",", ":"))[1:-1],
+                RowEncoder(rows.columns, app.json).encode_all(rows.data),
+            )
+
+    @data(0, 1, 3)
+    def test_stream_lines(self, count: int) -> None:
+        rows = synthetic_rows("Bike", count)
+        with app.app_context():
+            encoder = RowEncoder(rows.columns, app.json, DEFAULT_SEPARATORS)
+            self.assertEqual(
+                "\n".join(app.json.dumps(row) for row in rows),
+                encoder.encode_all(rows.data, "\n"),
+            )
+
+    @data("Car", "Bike", "Spaceship")
+    def test_synthetic_rows(self, vehicle: str) -> None:
+        rows = synthetic_rows(vehicle, 50)
+        with app.app_context():
+            self.assertEqual(
+                app.json.response(results=list(rows), count=len(rows)).data,
+                json_response({"results": rows, "count": len(rows)}).data,
+            )
+
+    def test_body_without_rows(self) -> None:
+        body = {"results": [], "count": 0, "cursor": None}
+        with app.app_context():
+            self.assertEqual(
+                app.json.response(body).get_data(as_text=True),
+                dumps_body(body, app.json),
+            )
+
+    def test_indents_in_debug(self) -> None:
+        rows = rows_of(("Ford", "Focus", Decimal("193.5")))
+        app.debug = True
+        try:
+            with app.app_context():
+                self.assertEqual(
+                    app.json.response(results=list(rows)).data,
+                    json_response({"results": rows}).data,
+                )
+        finally:
+            app.debug = False
+
+
+@ddt
+class RowsTest(unittest.TestCase):
+    rows = Rows(("a", "b"), [(1, "x"), (2, "y"), (3, "z")])
+
+    def test_sequence(self) -> None:
+        self.assertEqual(3, len(self.rows))
+        self.assertEqual({"a": 2, "b": "y"}, self.rows[1])
+        self.assertEqual({"a": 3, "b": "z"}, self.rows[-1])
+        self.assertEqual(
+            [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 3, "b": "z"}],
+            list(self.rows),
+        )
+        self.assertFalse(Rows(("a",), []))
+
+    def test_slice(self) -> None:
+        page = self.rows[:2]
+
+        self.assertIsInstance(page, Rows)
+        self.assertEqual(self.rows.columns, page.columns)
+        self.assertEqual([(1, "x"), (2, "y")], page.data)
+
+    def test_equality(self) -> None:
+        self.assertEqual(self.rows, Rows(("a", "b"), [(1, "x"), (2, "y"), (3, "z")]))
+        self.assertEqual(self.rows, list(self.rows))
+        self.assertNotEqual(self.rows, self.rows[:2])
+        self.assertEqual(Rows(("a",), []), [])
+
+    def test_without(self) -> None:
+        self.assertEqual([{"b": "x"}, {"b": "y"}, {"b": "z"}], self.rows.without("a"))
+
+    def test_estimate_size(self) -> None:
+        self.assertGreater(estimate_size(self.rows), estimate_size(self.rows[:1]))
+        self.assertGreater(
+            estimate_size((self.rows, "cursor")), estimate_size(self.rows)
+        )
+
+
+@ddt
+class ResponseCompatibilityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        {},
+        {"query": car_make_and_year},
+        {"sort_field": "top_speed", "sort_order": "DESC"},
+        {"limit": 5},
+        {"limit": 5, "sort_field": "engine_size"},
+    )
+    def test_same_bytes_as_dicts(self, query_string: dict) -> None:
+        response = self.client.get(car_path, query_string=query_string)
+        body = json.loads(response.data)
+
+        with app.app_context():
+            expected = app.json.response(body).data
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(expected, response.data)
+        self.assertGreater(body["count"], 0)
+
+    def test_stream_same_bytes_as_dicts(self) -> None:
+        data = self.client.get(car_path, query_string={"stream": "true"}).data
+
+        lines = data.decode().splitlines()
+        with app.app_context():
+            expected = "".join(
+                f"{app.json.dumps(json.loads(line))}\n" for line in lines
+            )
+        self.assertGreater(len(lines), 0)
+        self.assertEqual(expected.encode(), data)
+
+
+@ddt
+class SerializationBenchmarkTest(unittest.TestCase):
+    @data(("1000,10", [10, 1000]), ("5", [5]))
+    @unpack
+    def test_parse_rows(self, value: str, expected: list[int]) -> None:
+        self.assertEqual(expected, parse_rows(value))
+
+    @data("", "0", "many")
+    def test_parse_rows_invalid(self, value: str) -> None:
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_rows(value)
+
+    @data("response", "stream")
+    def test_measure(self, path: str) -> None:
+        with app.app_context():
+            result = measure(path, synthetic_rows("Car", 20), 1)
+
+        self.assertEqual((path, 20), result[:2])
+        self.assertGreater(result.bytes, 0)
@@ -0,0 +1,127 @@
+import logging
+import unittest
+
+from unittest import mock
+
+from ddt import ddt, data, unpack
+
+from flask_server import app
+from apis.namespaces.v1.vehicles import dal
+from dal.models.facts import Bike, Car
+from dal.query_compiler import compile_query
+from dal.slow_query_log import SlowQueryLog, fingerprint, slow_query_log
+
+
+def year(operator: str, value) -> dict:
+    return {
+        "year": {
+            "operator": "and",
+            "constraints": [{"operator": operator, "value": value}],
+        }
+    }
+
+
+@ddt
+class SlowQueryLogTest(unittest.TestCase):
+    queries_path: str = "/api/v1/admin/queries"
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(
+        (Car, year("equals", 2020), None, True),
+        (Car, year("equals", 1999), None, True),
+        (Car, year("gt", 2020), None, False),
+        (Bike, year("equals", 2020), None, False),
+        (Car, year("equals", 2020), "seats", False),
+    )
+    @unpack
+    def test_fingerprint(self, cls, query: dict, sort_field, same: bool) -> None:
+        expected = fingerprint(compile_query(Car, year("equals", 2021)), None, None)
+        actual = fingerprint(compile_query(cls, query), sort_field, None)
+
+        self.assertEqual(same, expected == actual)
+
+    def test_aggregates_per_fingerprint(self) -> None:
+        log = SlowQueryLog(threshold_seconds=10)
+        for value, seconds in enumerate([0.1, 0.2, 0.3, 0.4, 1.0]):
+            compiled = compile_query(Car, year("equals", 2000 + value))
+            log.record(compiled, None, None, "SELECT", {}, seconds, value)
+
+        stats = log.stats()["fingerprints"]
+        self.assertEqual(1, len(stats))
+        self.assertEqual(5, stats[0]["count"])
+        self.assertEqual(0, stats[0]["slow"])
+        self.assertEqual(0.3, stats[0]["p50_seconds"])
+        self.assertEqual(1.0, stats[0]["p95_seconds"])
+        self.assertEqual(1.0, stats[0]["max_seconds"])
+        self.assertEqual(10, stats[0]["rows"])
+        self.assertEqual(2.0, stats[0]["mean_rows"])
+
+    def test_logs_slow_and_sampled_queries(self) -> None:
+        compiled = compile_query(Car, year("equals", 2020))
+        log = SlowQueryLog(threshold_seconds=1, sample_rate=0.5, sample=lambda: 0.7)
+
+        with self.assertLogs(level=logging.INFO) as logs:
+            log.record(compiled, None, None, "SELECT 1", {"p": 2020}, 0.5, 1)
+            log.record(compiled, None, None, "SELECT 2", {"p": 2020}, 1.5, 1)
+            log.sample = lambda: 0.2
+            log.record(compiled, None, None, "SELECT 3", {"p": 2020}, 0.5, 1)
+
+        self.assertEqual(["WARNING", "INFO"], [r.levelname for r in logs.records])
+        self.assertIn("SELECT 2 {'p': 2020}", logs.records[0].getMessage())
+        self.assertIn("Sampled query", logs.records[1].getMessage())
+        self.assertEqual(1, log.stats()["fingerprints"][0]["slow"])
+
+    def test_bounds_fingerprints(self) -> None:
+        log = SlowQueryLog(max_fingerprints=1)
+        log.record(compile_query(Car, year("equals", 2020)), None, None, "", {}, 0, 0)
+        log.record(compile_query(Car, year("gt", 2020)), None, None, "", {}, 0, 0)
+
+        self.assertEqual(1, len(log.stats()["fingerprints"]))
+        self.assertEqual(1, log.stats()["dropped"])
+
+        log.reset()
+        self.assertEqual([], log.stats()["fingerprints"])
+
+    def test_records_streams_once_read(self) -> None:
+        slow_query_log.reset()
+        chunks = dal.stream(Car, year("gt", 1900), chunk_size=2)
+        rows = len(next(chunks))
+
+        self.assertEqual([], slow_query_log.stats()["fingerprints"])
+        rows += sum(len(chunk) for chunk in chunks)
+
+        stats = slow_query_log.stats()["fingerprints"]
+        self.assertEqual(1, len(stats))
+        self.assertEqual(1, stats[0]["count"])
+        self.assertEqual(rows, stats[0]["rows"])
+
+    def test_query_stats_endpoint(self) -> None:
+        slow_query_log.reset()
+        dal.query(Car, year("equals", 2020), "seats", "DESC")
+        dal.query(Car, year("equals", 2021), "seats", "DESC")
+
+        with mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": "secret"}):
+            response = self.client.get(
+                self.queries_path, headers={"X-Admin-Token": "secret"}
+            )
+            deleted = self.client.delete(
+                self.queries_path, headers={"X-Admin-Token": "secret"}
+            )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(1, len(response.json["fingerprints"]))
+        stats = response.json["fingerprints"][0]
+        self.assertEqual(2, stats["count"])
+        self.assertEqual("Car", stats["vehicle"])
+        self.assertEqual("seats DESC", stats["sort"])
+        self.assertNotIn("2020", stats["sql"])
+        self.assertEqual("204 NO CONTENT", deleted.status)
+        # the fingerprints are admin-only
+        self.assertEqual("no-store", response.headers["Cache-Control"])
+        self.assertEqual("no-store", deleted.headers["Cache-Control"])
+        self.assertEqual([], slow_query_log.stats()["fingerprints"])
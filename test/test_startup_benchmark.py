@@ -0,0 +1,61 @@
+import argparse
+import os
+import unittest
+
+from ddt import ddt, data, unpack
+
+from apis.namespaces.v1.vehicles import dal
+from dal.mysql import EngineRegistry, _pools
+from flask_server import app
+from tools.startup_benchmark import boot_forked, parse_workers, summarize
+
+
+@ddt
+class StartupBenchmarkTest(unittest.TestCase):
+    def setUp(self) -> None:
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    @data(("4,1,2", [1, 2, 4]), ("8", [8]), ("2,2", [2]))
+    @unpack
+    def test_parse_workers(self, value: str, expected: list[int]) -> None:
+        self.assertEqual(expected, parse_workers(value))
+
+    @data("", "0,2", "two")
+    def test_parse_workers_invalid(self, value: str) -> None:
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_workers(value)
+
+    def test_summarize(self) -> None:
+        result = summarize("forked", 2, [[0.2, 0.1], [None, 0.4]])
+
+        self.assertEqual(("forked", 2, 2, 1, 0.2, 0.4), tuple(result))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_boot_forked(self) -> None:
+        seconds = boot_forked(app, 3)
+
+        self.assertEqual(3, len(seconds))
+        self.assertNotIn(None, seconds)
+
+
+class EngineRegistryTest(unittest.TestCase):
+    def test_shares_engines(self) -> None:
+        registry = EngineRegistry()
+
+        first = registry.get("sqlite://")
+
+        self.assertIs(first, registry.get("sqlite://"))
+        self.assertIsNot(first, registry.get("sqlite:///:memory:"))
+        self.assertIn(first.pool, _pools)
+
+    def test_after_fork_replaces_pools(self) -> None:
+        registry = EngineRegistry()
+        engine = registry.get("sqlite://")
+        pool = engine.pool
+
+        registry.after_fork()
+
+        self.assertIsNot(pool, engine.pool)
+        self.assertIn(engine.pool, _pools)
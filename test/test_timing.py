@@ -0,0 +1,95 @@
+import unittest
+
+from unittest import mock
+
+from flask_server import app
+from apis.namespaces.v1.vehicles import dal, engine
+from helpers.timing_helper import timing
+
+plan = """-> Nested loop inner join  (cost=36.5 rows=10) (actual time=0.1..0.2 rows=10 loops=1)
+    -> Table scan on vhlc  (cost=8.25 rows=80) (actual time=0.05..0.1 rows=80 loops=1)
+    -> Single-row index lookup on manu using PRIMARY (manufacturer_id=vhlc.manufacturer_id)  (cost=0.25 rows=1) (actual time=0.001..0.001 rows=1 loops=10)"""
+
+
+class TimingTest(unittest.TestCase):
+    car_path: str = "/api/v1/vehicles/cars"
+    query: str = (
+        'query={"year":{"operator":"and","constraints":[{"operator":"gt","value":2000}]}}'
+    )
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        dal.result_cache.invalidate()
+
+        return super().setUp()
+
+    def test_server_timing_disabled(self) -> None:
+        with mock.patch.object(timing, "enabled", False):
+            response = self.client.get(self.car_path, query_string=self.query)
+
+        self.assertEqual("200 OK", response.status)
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_server_timing_phases(self) -> None:
+        with mock.patch.object(timing, "enabled", True):
+            response = self.client.get(self.car_path, query_string=self.query)
+
+        self.assertEqual("200 OK", response.status)
+        phases = [
+            p.split(";")[0] for p in response.headers["Server-Timing"].split(", ")
+        ]
+        engine_phases = (
+            ["cache", "plan", "db", "materialize"]
+            if engine is dal
+            else ["filter", "materialize"]
+        )
+        for phase in [
+            "total",
+            "reqparse",
+            "parse",
+            "validate",
+            "compile",
+            *engine_phases,
+            "serialize",
+        ]:
+            self.assertIn(phase, phases)
+        self.assertRegex(response.headers["Server-Timing"], r"^total;dur=\d+\.\d{3}")
+
+    def test_phases_outside_requests_are_not_timed(self) -> None:
+        with mock.patch.object(timing, "enabled", True):
+            with timing.phase("db"):
+                pass
+
+            self.assertIsNone(timing.header())
+
+    def test_debug_explain(self) -> None:
+        with mock.patch.dict(
+            "os.environ", {"VQE_ADMIN_TOKEN": "secret"}
+        ), mock.patch.object(
+            dal, "explain", return_value=[{"EXPLAIN": plan}]
+        ) as explain:
+            response = self.client.get(
+                self.car_path,
+                query_string=self.query,
+                headers={"X-Admin-Token": "secret", "X-Debug": "explain"},
+            )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual(plan, response.json["debug"]["plan"])
+        self.assertEqual(90, response.json["debug"]["rows_examined"])
+        self.assertTrue(explain.call_args.kwargs["analyze"])
+        self.assertEqual("private, no-store", response.headers["Cache-Control"])
+        self.assertIn("X-Admin-Token", response.vary)
+        self.assertIn("X-Debug", response.vary)
+
+    def test_debug_requires_admin_token(self) -> None:
+        with mock.patch.dict("os.environ", {"VQE_ADMIN_TOKEN": "secret"}):
+            response = self.client.get(
+                self.car_path,
+                query_string=self.query,
+                headers={"X-Admin-Token": "wrong", "X-Debug": "explain"},
+            )
+
+        self.assertEqual("200 OK", response.status)
+        self.assertNotIn("debug", response.json)
+        self.assertIn("X-Debug", response.vary)
@@ -1,7 +1,9 @@
+import json
 import unittest
 
 from ddt import ddt, data, unpack
 from flask_server import app
+from dal.pagination import Cursor, encode_cursor
 
 from sample_data.payloads import (
     bike_gears_and_type_and_year,
@@ -149,6 +151,148 @@ class VehiclesTest(unittest.TestCase):
             self.assertNotIn(result["type"], ["BMX", "Road"])
             self.assertIn(result["year"], [2023, 2014])
 
+    @data(
+        (spaceship_path, None, None),
+        (spaceship_path, "top_speed", "DESC"),
+        (car_path, "seats", "ASC"),
+        (car_path, "manufacturer", None),
+        (car_path, "model", "DESC"),
+        (bike_path, "gears", "DESC"),
+    )
+    @unpack
+    def test_pagination(self, path: str, sort_field: str, sort_order: str) -> None:
+        sort_params = {}
+        if sort_field:
+            sort_params["sort_field"] = sort_field
+        if sort_order:
+            sort_params["sort_order"] = sort_order
+
+        all_response = self.client.get(path, query_string={**sort_params, "limit": 1000})
+        self.__assert_response_schema(all_response)
+        self.assertIsNone(all_response.json["cursor"])
+
+        paged_results = []
+        cursor = None
+        while True:
+            params = {**sort_params, "limit": 7}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(path, query_string=params)
+            self.__assert_response_schema(response)
+            self.assertLessEqual(response.json["count"], 7)
+            paged_results.extend(response.json["results"])
+            cursor = response.json["cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(all_response.json["results"], paged_results)
+
+    def test_pagination_with_query(self) -> None:
+        response = self.client.get(
+            self.car_path,
+            query_string={"query": car_less_than_or_equal_seats.strip(), "limit": 2},
+        )
+        self.__assert_response_schema(response)
+        self.assertEqual(2, response.json["count"])
+
+        next_response = self.client.get(
+            self.car_path,
+            query_string={
+                "query": car_less_than_or_equal_seats.strip(),
+                "limit": 2,
+                "cursor": response.json["cursor"],
+            },
+        )
+        self.__assert_response_schema(next_response)
+        for result in next_response.json["results"]:
+            self.assertLessEqual(result["seats"], 7)
+            self.assertNotIn(result, response.json["results"])
+
+    @data(
+        ("cursor=abc&limit=5", b"Invalid cursor supplied, use the cursor from a previous response."),
+        ("cursor=abc", b"A cursor can only be used together with limit."),
+    )
+    @unpack
+    def test_invalid_cursor(self, query_string: str, message: bytes) -> None:
+        response = self.client.get(self.car_path, query_string=query_string)
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertIn(message, response.data)
+
+    @data({}, [1], True, "fast", None)
+    def test_tampered_cursor(self, value) -> None:
+        cursor = encode_cursor(Cursor("seats", "ASC", value, 1))
+
+        response = self.client.get(
+            self.car_path,
+            query_string={"sort_field": "seats", "limit": 2, "cursor": cursor},
+        )
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertIn(b"Invalid cursor supplied", response.data)
+
+    def test_mismatched_cursor(self) -> None:
+        response = self.client.get(self.car_path, query_string="sort_field=seats&limit=2")
+        self.__assert_response_schema(response)
+
+        mismatched_response = self.client.get(
+            self.car_path,
+            query_string={"sort_field": "year", "limit": 2, "cursor": response.json["cursor"]},
+        )
+        self.assertEqual("400 BAD REQUEST", mismatched_response.status)
+
+    @data(
+        (spaceship_path, {"stream": "true"}, {}),
+        (car_path, {"stream": "true", "sort_field": "year", "sort_order": "DESC"}, {}),
+        (bike_path, {}, {"Accept": "application/x-ndjson"}),
+    )
+    @unpack
+    def test_stream(self, path: str, query_string: dict, headers: dict) -> None:
+        response = self.client.get(path, query_string=query_string, headers=headers)
+
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual("application/x-ndjson", response.mimetype)
+        streamed = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        expected = self.client.get(
+            path, query_string={k: v for k, v in query_string.items() if k != "stream"}
+        )
+        self.__assert_response_schema(expected)
+        self.assertEqual(expected.json["results"], streamed)
+
+    def test_stream_with_limit(self) -> None:
+        response = self.client.get(self.car_path, query_string="stream=true&limit=5")
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertIn(b"Streaming cannot be combined with limit or cursor.", response.data)
+
+    @data(
+        (car_path, '{"generation":{"operator":"and","constraints":[{"operator":"equals","value":1}]}}', b"Query field `generation` was not in available list of columns."),
+        (car_path, '{"seats":{"operator":"and","constraints":[{"operator":"lte","value":"many"}]}}', b"Value for `seats` must be a whole number."),
+        (bike_path, '{"gears":{"operator":"xor","constraints":[{"operator":"gt","value":3}]}}', b"Operator for `gears` must be one of AND, OR."),
+        (spaceship_path, '{"year":{"operator":"and","constraints":[{"operator":"between","value":3}]}}', b"Constraint operator `between` for `year` is not supported."),
+        (spaceship_path, '{"model":{"operator":"or","constraints":[{"operator":"in","value":[]}]}}', b"Value for `model` must contain at least one item."),
+    )
+    @unpack
+    def test_invalid_query_constraints(self, path: str, query: str, message: bytes) -> None:
+        response = self.client.get(path, query_string={"query": query})
+
+        self.assertEqual("400 BAD REQUEST", response.status)
+        self.assertIn(message, response.data)
+        self.assertEqual("application/json", response.mimetype)
+
+    def test_numeric_strings_are_coerced(self) -> None:
+        response = self.client.get(
+            self.car_path,
+            query_string={"query": '{"seats":{"operator":"and","constraints":[{"operator":"lte","value":"7"}]}}'},
+        )
+        expected = self.client.get(
+            self.car_path, query_string={"query": car_less_than_or_equal_seats.strip()}
+        )
+
+        self.__assert_response_schema(response)
+        self.assertEqual(expected.json, response.json)
+
     def __assert_response_schema(self, response) -> None:
         self.assertEqual("200 OK", response.status, response.data)
         self.assertEqual("application/json", response.mimetype)
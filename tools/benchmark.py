@@ -0,0 +1,323 @@
+"""
+Benchmarks loading and querying the vehicle fact tables at growing data sizes.
+
+For every tier the `vqe` database is recreated and filled with synthetic vehicles through the bulk loader,
+then every field is queried with every operator it supports, unsorted and sorted by year in both orders.
+Building the statement (compile, dimension rewrite, plan and bind) and running the query are timed apart.
+
+    python -m tools.benchmark --reset --tiers 10k,1m --output benchmark.json
+    python -m tools.benchmark --reset --engine columnar --compare benchmark.json
+
+It drops the `vqe` database, so only run it against a scratch MySQL such as the docker compose `db` service.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple, Optional
+
+from dal.ingestion import record_fields
+from dal.models.base import Base
+from dal.mysql import MySQLDal
+from dal.query_compiler import OPERATORS, compile_query
+from dal.result_cache import result_cache
+from tools.synthetic_data import VEHICLES, Distribution, generate, load_distribution
+
+TIERS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SORT_FIELD = "year"
+SORT_ORDERS = [None, "ASC", "DESC"]
+# characters of a common value matched by the text operators
+TEXT_FRAGMENT = 3
+
+
+class Case(NamedTuple):
+    vehicle: str
+    field: str
+    operator: str
+    sort_order: Optional[str]
+    query: dict
+
+    @property
+    def sort_field(self) -> Optional[str]:
+        return SORT_FIELD if self.sort_order else None
+
+
+class LoadResult(NamedTuple):
+    tier: str
+    vehicle: str
+    records: int
+    inserted: int
+    duplicates: int
+    rejected: int
+    seconds: float
+    rows_per_second: float
+
+
+class QueryResult(NamedTuple):
+    tier: str
+    vehicle: str
+    field: str
+    operator: str
+    sort_order: Optional[str]
+    phase: str
+    runs: int
+    rows: int
+    min_seconds: float
+    median_seconds: float
+    p95_seconds: float
+
+    @property
+    def key(self) -> tuple:
+        return (
+            self.tier,
+            self.vehicle,
+            self.field,
+            self.operator,
+            self.sort_order,
+            self.phase,
+        )
+
+
+def parse_tiers(value: str) -> list[str]:
+    tiers = [t.strip().lower() for t in value.split(",") if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown or not tiers:
+        raise argparse.ArgumentTypeError(
+            f"Tiers must be a comma separated list of {', '.join(TIERS)}."
+        )
+    return tiers
+
+
+def operator_value(distribution: Distribution, field: str, operator: str) -> Any:
+    kind = OPERATORS[operator][2]
+    if kind == "list":
+        return distribution.common_values(field, 2)
+
+    value = distribution.common_values(field)[0]
+    if kind != "text":
+        return value
+    if operator == "startsWith":
+        return value[:TEXT_FRAGMENT]
+    if operator == "endsWith":
+        return value[-TEXT_FRAGMENT:]
+    middle = max(0, (len(value) - TEXT_FRAGMENT) // 2)
+    return value[middle : middle + TEXT_FRAGMENT]
+
+
+def cases(distribution: Distribution) -> list[Case]:
+    """
+    A query for every field and operator it supports, text operators only apply to text fields.
+    """
+    cls = distribution.cls
+    found = []
+    for field, model, column in record_fields(cls):
+        for operator, (_, _, kind) in OPERATORS.items():
+            if kind == "text" and model.column_types[column] is not str:
+                continue
+            query = {
+                field: {
+                    "operator": "and",
+                    "constraints": [
+                        {
+                            "operator": operator,
+                            "value": operator_value(distribution, field, operator),
+                        }
+                    ],
+                }
+            }
+            for sort_order in SORT_ORDERS:
+                found.append(Case(cls.__name__, field, operator, sort_order, query))
+    return found
+
+
+def measure(function: Callable[[], Any], runs: int) -> tuple[list[float], Any]:
+    seconds = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - started)
+    return seconds, result
+
+
+def summarize(
+    tier: str, case: Case, phase: str, seconds: list[float], rows: int
+) -> QueryResult:
+    ordered = sorted(seconds)
+    return QueryResult(
+        tier,
+        case.vehicle,
+        case.field,
+        case.operator,
+        case.sort_order,
+        phase,
+        len(ordered),
+        rows,
+        round(ordered[0], 6),
+        round(statistics.median(ordered), 6),
+        round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 6),
+    )
+
+
+def benchmark_case(dal: MySQLDal, engine: Any, tier: str, case: Case, runs: int):
+    cls = VEHICLES[case.vehicle]
+
+    def build():
+        compiled = dal.dimensions.rewrite(compile_query(cls, case.query))
+        if compiled is not None:
+            plan = dal.compiler.plan(compiled, case.sort_field, case.sort_order)
+            dal.compiler.bind(plan, compiled)
+
+    build_seconds, _ = measure(build, runs)
+    query_seconds, results = measure(
+        lambda: engine.query(cls, case.query, case.sort_field, case.sort_order), runs
+    )
+    return [
+        summarize(tier, case, "build", build_seconds, len(results)),
+        summarize(tier, case, "query", query_seconds, len(results)),
+    ]
+
+
+def load_tier(
+    dal: MySQLDal, tier: str, vehicles: list[type[Base]], seed: int, batch_size: int
+) -> list[LoadResult]:
+    dal.execute(f"DROP DATABASE IF EXISTS `{dal.db_name}`")
+    dal.create_schema()
+
+    loads = []
+    for cls in vehicles:
+        started = time.perf_counter()
+        records = generate(load_distribution(cls), TIERS[tier], seed)
+        batches = list(dal.ingest(cls, records, batch_size))
+        seconds = time.perf_counter() - started
+        inserted = sum(b.inserted for b in batches)
+        loads.append(
+            LoadResult(
+                tier,
+                cls.__name__,
+                sum(b.received for b in batches),
+                inserted,
+                sum(b.duplicates for b in batches),
+                sum(b.rejected for b in batches),
+                round(seconds, 3),
+                round(inserted / seconds, 1) if seconds else 0.0,
+            )
+        )
+        logging.info(
+            f"Loaded {inserted} {cls.__name__} rows for {tier} in {seconds:.1f}s"
+        )
+    return loads
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[dict]:
+    """
+    Results whose median is more than threshold times the median of the same benchmark in baseline.
+    """
+    previous = {QueryResult(**r).key: r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(QueryResult(**result).key)
+        if not before or not before["median_seconds"]:
+            continue
+        ratio = result["median_seconds"] / before["median_seconds"]
+        if ratio > threshold:
+            regressions.append(
+                {
+                    **result,
+                    "baseline_median_seconds": before["median_seconds"],
+                    "ratio": round(ratio, 2),
+                }
+            )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--tiers",
+        type=parse_tiers,
+        default=["10k"],
+        help=f"Comma separated data sizes to run, of {', '.join(TIERS)}",
+    )
+    parser.add_argument(
+        "--vehicles",
+        type=lambda v: [VEHICLES[name] for name in v.split(",")],
+        default=list(VEHICLES.values()),
+        help=f"Comma separated vehicles to benchmark, of {', '.join(VEHICLES)}",
+    )
+    parser.add_argument("--engine", choices=["mysql", "columnar"], default="mysql")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Confirms the existing vqe database may be dropped",
+    )
+    parser.add_argument("--label", help="Stored with the results, e.g. a commit id")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to report regressions against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown of the median reported as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    dal = MySQLDal()
+    if dal.database_exists(dal.db_name) and not args.reset:
+        parser.error(f"`{dal.db_name}` exists, pass --reset to drop it")
+
+    # every run must reach the engine
+    result_cache.enabled = False
+    report = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "engine": args.engine,
+        "seed": args.seed,
+        "runs": args.runs,
+        "loads": [],
+        "results": [],
+    }
+    for tier in args.tiers:
+        # a new DAL per tier, its dimension ids refer to the dropped database
+        dal = MySQLDal()
+        loads = load_tier(dal, tier, args.vehicles, args.seed, args.batch_size)
+        report["loads"] += [r._asdict() for r in loads]
+
+        engine = dal
+        if args.engine == "columnar":
+            from dal.columnar import ColumnarDal
+
+            engine = ColumnarDal(dal)
+            engine.load()
+
+        for cls in args.vehicles:
+            for case in cases(load_distribution(cls)):
+                results = benchmark_case(dal, engine, tier, case, args.runs)
+                report["results"] += [r._asdict() for r in results]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Wrote {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        print(json.dumps({"regressions": regressions}, indent=2))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+Recommends composite indexes for the vehicle fact tables from a workload recorded with VQE_WORKLOAD_FILE.
+
+Every recorded query shape is run through EXPLAIN, the index that would serve its equality filters, then its
+range filter or sort field is derived, and the benefit is estimated from the rows MySQL examines today versus
+the rows the index would leave, weighted by the time the shape took in the workload.
+
+    python -m tools.index_advisor workload.jsonl
+    python -m tools.index_advisor workload.jsonl --covering --output recommendations.json
+    python -m tools.index_advisor workload.jsonl --apply --min-benefit 1.0
+
+The same workload file and table statistics always give the same recommendations.
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+from typing import Optional, NamedTuple
+
+from dal.models.base import Base
+from dal.models.dimensions import Manufacturer, Model
+from dal.models.facts import Bike, Car, Spaceship
+from dal.mysql import MySQLDal
+from dal.query_compiler import (
+    ColumnFilter,
+    CompiledQuery,
+    compile_query,
+    resolve_field,
+    reversed_column,
+)
+from dal.workload import load_workload
+
+VEHICLES: dict[str, type[Base]] = {cls.__name__: cls for cls in [Car, Bike, Spaceship]}
+
+EQUALITY_OPERATORS = {"equals", "in"}
+RANGE_OPERATORS = {"lt", "lte", "gt", "gte", "startsWith"}
+
+# MySQL assumes a range predicate keeps a third of the rows when it has no better estimate
+RANGE_SELECTIVITY = 1 / 3
+MAX_INDEX_COLUMNS = 4
+MAX_INDEX_NAME_LENGTH = 64
+
+
+class ShapeStats(NamedTuple):
+    vehicle: str
+    shape: str
+    sort_field: Optional[str]
+    queries: int
+    seconds: float
+    sample: dict
+
+
+class TableStatistics(NamedTuple):
+    rows: int
+    # number of distinct values per column
+    cardinality: dict[str, int]
+
+
+class Recommendation(NamedTuple):
+    table: str
+    name: str
+    columns: list[str]
+    ddl: str
+    queries: int
+    seconds: float
+    examined_rows: int
+    estimated_rows: int
+    estimated_benefit_seconds: float
+    shapes: list[str]
+
+
+def aggregate(entries: list[dict]) -> list[ShapeStats]:
+    """
+    Groups recorded queries by vehicle, shape and sort field, the most expensive shapes first.
+    """
+    groups: dict[tuple, list[dict]] = {}
+    for entry in entries:
+        key = (
+            entry["vehicle"],
+            json.dumps(entry["shape"], sort_keys=True),
+            entry.get("sort_field"),
+        )
+        groups.setdefault(key, []).append(entry)
+
+    stats = [
+        ShapeStats(
+            vehicle,
+            shape,
+            sort_field,
+            len(group),
+            round(sum(e["seconds"] for e in group), 6),
+            # the slowest query of a shape is the most useful to EXPLAIN
+            max(group, key=lambda e: (e["seconds"], json.dumps(e, sort_keys=True))),
+        )
+        for (vehicle, shape, sort_field), group in groups.items()
+    ]
+    return sorted(
+        stats, key=lambda s: (-s.seconds, s.vehicle, s.shape, str(s.sort_field))
+    )
+
+
+def classify(cls: type[Base], column_filter: ColumnFilter) -> Optional[tuple[str, str]]:
+    """
+    The fact table column an index could seek for the filter and whether it is an equality or a range,
+    None for filters an index on the fact table cannot serve.
+    """
+    if column_filter.model is not cls:
+        return None
+
+    operators = {c.operator for c in column_filter.constraints}
+    if operators <= EQUALITY_OPERATORS and (
+        column_filter.operator == "OR" or len(column_filter.constraints) == 1
+    ):
+        return column_filter.column, "equality"
+
+    if operators == {"endsWith"} and column_filter.column in cls.reversed_columns:
+        return reversed_column(column_filter.column), "range"
+
+    if operators <= EQUALITY_OPERATORS | RANGE_OPERATORS:
+        return column_filter.column, "range"
+
+    return None
+
+
+def index_columns(
+    compiled: CompiledQuery, sort_field: Optional[str], covering: bool = False
+) -> list[str]:
+    """
+    Columns of the index serving a query: equality columns, then a single range column or the sort column.
+
+    Covering indexes append the remaining selected columns so the rows are read from the index alone.
+    """
+    cls = compiled.cls
+    classified = [c for c in (classify(cls, f) for f in compiled.filters) if c]
+    equality = sorted({column for column, kind in classified if kind == "equality"})
+    ranges = sorted(
+        {column for column, kind in classified if kind == "range"} - set(equality)
+    )
+
+    columns = list(equality)
+    if ranges:
+        columns.append(ranges[0])
+    elif sort_field:
+        model, column = resolve_field(cls, sort_field)
+        if model is cls and column not in columns:
+            columns.append(column)
+    columns = columns[:MAX_INDEX_COLUMNS]
+
+    if columns and covering:
+        columns += [
+            c
+            for c in [Manufacturer.primary_key, Model.primary_key] + cls.query_columns
+            if c not in columns
+        ]
+    return columns
+
+
+def estimate_rows(
+    compiled: CompiledQuery, columns: list[str], statistics: TableStatistics
+) -> int:
+    """
+    Rows left after seeking the index, from the cardinality of its equality columns and a guess for its range column.
+    """
+    selectivity = 1.0
+    classified = {}
+    for column_filter in compiled.filters:
+        classification = classify(compiled.cls, column_filter)
+        if classification:
+            classified[classification[0]] = (classification[1], column_filter)
+
+    for column in columns:
+        if column not in classified:
+            break
+        kind, column_filter = classified[column]
+        if kind == "range":
+            selectivity *= RANGE_SELECTIVITY
+            break
+
+        values = sum(
+            len(c.value) if isinstance(c.value, list) else 1
+            for c in column_filter.constraints
+        )
+        selectivity *= min(1.0, values / max(1, statistics.cardinality.get(column, 1)))
+
+    return max(1, round(statistics.rows * selectivity))
+
+
+def index_name(columns: list[str]) -> str:
+    return f"idx_{'_'.join(columns)}"[:MAX_INDEX_NAME_LENGTH]
+
+
+class IndexAdvisor:
+    def __init__(self, dal: MySQLDal, covering: bool = False) -> None:
+        self.dal = dal
+        self.covering = covering
+        self._statistics: dict[str, TableStatistics] = {}
+        self._indexes: dict[str, list[list[str]]] = {}
+
+    def recommend(self, entries: list[dict]) -> list[Recommendation]:
+        candidates: dict[tuple[str, tuple[str, ...]], list[tuple]] = {}
+        for stats in aggregate(entries):
+            cls = VEHICLES[stats.vehicle]
+            compiled = self.dal.dimensions.rewrite(
+                compile_query(cls, stats.sample["query"])
+            )
+            if compiled is None:
+                continue
+
+            columns = index_columns(compiled, stats.sort_field, self.covering)
+            if not columns or self.__already_indexed(cls, columns):
+                continue
+
+            examined = self.examined_rows(cls, stats.sample)
+            estimated = estimate_rows(compiled, columns, self.table_statistics(cls))
+            benefit = stats.seconds * max(0.0, 1 - estimated / max(1, examined))
+            candidates.setdefault((cls.table_name, tuple(columns)), []).append(
+                (stats, examined, estimated, benefit)
+            )
+
+        # an index also serves the shapes whose columns are a prefix of its own
+        merged: dict[tuple[str, tuple[str, ...]], list[tuple]] = {}
+        for key in sorted(candidates, key=lambda k: (k[0], -len(k[1]), k[1])):
+            table, columns = key
+            target = next(
+                (
+                    k
+                    for k in merged
+                    if k[0] == table and k[1][: len(columns)] == columns
+                ),
+                key,
+            )
+            merged.setdefault(target, []).extend(candidates[key])
+
+        recommendations = [
+            self.__recommendation(table, list(columns), shapes)
+            for (table, columns), shapes in merged.items()
+        ]
+        return sorted(
+            recommendations,
+            key=lambda r: (-r.estimated_benefit_seconds, r.table, r.columns),
+        )
+
+    def apply(
+        self, recommendations: list[Recommendation], min_benefit: float
+    ) -> list[str]:
+        """
+        Creates the recommended indexes with online DDL, so reads and writes continue while they build.
+        """
+        applied = []
+        for recommendation in recommendations:
+            if recommendation.estimated_benefit_seconds < min_benefit:
+                continue
+            logging.info(f"Applying {recommendation.ddl}")
+            self.dal.execute(recommendation.ddl)
+            applied.append(recommendation.name)
+        return applied
+
+    def examined_rows(self, cls: type[Base], sample: dict) -> int:
+        plan = self.dal.explain(
+            cls, sample["query"], sample.get("sort_field"), sample.get("sort_order")
+        )
+        rows = [r for r in plan if r.get("table") == cls.alias]
+        return int(rows[0]["rows"] or 0) if rows else 0
+
+    def table_statistics(self, cls: type[Base]) -> TableStatistics:
+        if cls.table_name not in self._statistics:
+            columns = [Manufacturer.primary_key, Model.primary_key] + cls.query_columns
+            columns += [reversed_column(c) for c in cls.reversed_columns]
+            counts = ", ".join(f"COUNT(DISTINCT `{c}`) AS `{c}`" for c in columns)
+            row = self.dal.read_sql_query(
+                f"SELECT COUNT(*) AS `__rows`, {counts}"
+                f" FROM `{self.dal.db_name}`.`{cls.table_name}`"
+            )[0]
+            self._statistics[cls.table_name] = TableStatistics(row.pop("__rows"), row)
+        return self._statistics[cls.table_name]
+
+    def existing_indexes(self, cls: type[Base]) -> list[list[str]]:
+        if cls.table_name in self._indexes:
+            return self._indexes[cls.table_name]
+
+        rows = self.dal.read_sql_query(
+            "SELECT `INDEX_NAME`, `COLUMN_NAME` FROM `INFORMATION_SCHEMA`.`STATISTICS`"
+            " WHERE `TABLE_SCHEMA` = :db_name AND `TABLE_NAME` = :table_name"
+            " ORDER BY `INDEX_NAME`, `SEQ_IN_INDEX`",
+            {"db_name": self.dal.db_name, "table_name": cls.table_name},
+        )
+        indexes: dict[str, list[str]] = {}
+        for row in rows:
+            indexes.setdefault(row["INDEX_NAME"], []).append(row["COLUMN_NAME"])
+        self._indexes[cls.table_name] = list(indexes.values())
+        return self._indexes[cls.table_name]
+
+    def __already_indexed(self, cls: type[Base], columns: list[str]) -> bool:
+        return any(
+            index[: len(columns)] == columns for index in self.existing_indexes(cls)
+        )
+
+    def __recommendation(
+        self, table: str, columns: list[str], shapes: list[tuple]
+    ) -> Recommendation:
+        name = index_name(columns)
+        column_list = ", ".join(f"`{c}`" for c in columns)
+        return Recommendation(
+            table,
+            name,
+            columns,
+            f"ALTER TABLE `{self.dal.db_name}`.`{table}` ADD INDEX `{name}` ({column_list}),"
+            " ALGORITHM=INPLACE, LOCK=NONE",
+            sum(s.queries for s, *_ in shapes),
+            round(sum(s.seconds for s, *_ in shapes), 6),
+            max(examined for _, examined, _, _ in shapes),
+            max(estimated for _, _, estimated, _ in shapes),
+            round(sum(benefit for *_, benefit in shapes), 6),
+            [f"{s.shape} sort={s.sort_field}" for s, *_ in shapes],
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "workload", help="JSON lines file written through VQE_WORKLOAD_FILE"
+    )
+    parser.add_argument(
+        "--output", help="Write the recommendations to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--covering",
+        action="store_true",
+        help="Recommend covering indexes that include every selected column",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Create the recommended indexes online, without blocking reads or writes",
+    )
+    parser.add_argument(
+        "--min-benefit",
+        type=float,
+        default=0.0,
+        help="Only apply indexes estimated to save at least this many seconds of the workload",
+    )
+    args = parser.parse_args(argv)
+
+    advisor = IndexAdvisor(MySQLDal(), args.covering)
+    recommendations = advisor.recommend(load_workload(args.workload))
+    report = {"recommendations": [r._asdict() for r in recommendations]}
+    if args.apply:
+        report["applied"] = advisor.apply(recommendations, args.min_benefit)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(f"{output}\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
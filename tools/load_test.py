@@ -0,0 +1,307 @@
+"""
+Replays the documented example queries and recorded queries against the API at increasing concurrency.
+
+Every concurrency level runs for a fixed duration and reports throughput, p50/p99 latency and the error rate,
+the level with the highest throughput is the saturation point of the configuration under test.
+
+    python -m tools.load_test --concurrency 1,4,16,64 --duration 10
+    python -m tools.load_test --url http://localhost:8080 --workload workload.jsonl --label "gevent threads=8"
+
+Without --url requests are sent in-process to the WSGI app through Flask's test client, which measures the
+application without a server in front of it.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlencode, urlsplit
+
+from sample_data import payloads
+
+VEHICLE_PATHS = {"Car": "cars", "Bike": "bikes", "Spaceship": "spaceships"}
+PAYLOAD_PREFIXES = {"car_": "cars", "bike_": "bikes", "spaceship_": "spaceships"}
+API_PATH = "/api/v1/vehicles"
+# throughput within this fraction of the best counts as saturated
+SATURATION_TOLERANCE = 0.05
+
+
+class LevelResult(NamedTuple):
+    concurrency: int
+    requests: int
+    errors: int
+    error_rate: float
+    seconds: float
+    requests_per_second: float
+    p50_seconds: float
+    p99_seconds: float
+    max_seconds: float
+    statuses: dict[str, int]
+
+
+def vehicle_path(resource: str, params: dict) -> str:
+    params = {k: v for k, v in params.items() if v is not None}
+    path = f"{API_PATH}/{resource}"
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def payload_paths() -> list[str]:
+    """
+    Requests for the example payloads documented on the vehicle endpoints.
+    """
+    paths = []
+    for name in sorted(vars(payloads)):
+        for prefix, resource in PAYLOAD_PREFIXES.items():
+            if name.startswith(prefix):
+                query = json.dumps(json.loads(getattr(payloads, name)))
+                paths.append(vehicle_path(resource, {"query": query}))
+    return paths
+
+
+def workload_paths(entries: list[dict]) -> list[str]:
+    """
+    Requests for queries recorded through VQE_WORKLOAD_FILE, repeated as often as they were recorded.
+    """
+    paths = []
+    for entry in entries:
+        params = {
+            "query": json.dumps(entry["query"]),
+            "sort_field": entry.get("sort_field"),
+            "sort_order": entry.get("sort_order"),
+        }
+        if entry.get("paginate"):
+            params["limit"] = 100
+        paths.append(vehicle_path(VEHICLE_PATHS[entry["vehicle"]], params))
+    return paths
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class InProcessTarget:
+    """
+    Sends requests to a WSGI app through a Flask test client per thread.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._local = threading.local()
+
+    def get(self, path: str) -> int:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.get(path)
+        response.close()
+        return response.status_code
+
+
+class HttpTarget:
+    """
+    Sends requests to a server over a keep-alive connection per thread.
+    """
+
+    def __init__(self, url: str, timeout: float = 30) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, path: str) -> int:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection
+                if self.https
+                else http.client.HTTPConnection
+            )
+            connection = self._local.connection = connection_class(
+                self.host, self.port, timeout=self.timeout
+            )
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def run_level(
+    send: Callable[[str], int],
+    paths: list[str],
+    concurrency: int,
+    duration: float,
+    clock: Callable[[], float] = time.perf_counter,
+) -> LevelResult:
+    """
+    Sends requests from concurrency threads for duration seconds, each thread cycles through the paths
+    starting at its own offset.
+    """
+    latencies: list[list[float]] = [[] for _ in range(concurrency)]
+    statuses: list[dict[str, int]] = [{} for _ in range(concurrency)]
+    started = clock()
+    deadline = started + duration
+
+    def worker(number: int) -> None:
+        index = number
+        while clock() < deadline:
+            path = paths[index % len(paths)]
+            index += concurrency
+            sent = clock()
+            try:
+                status = str(send(path))
+            except Exception as ex:
+                status = type(ex).__name__
+            latencies[number].append(clock() - sent)
+            statuses[number][status] = statuses[number].get(status, 0) + 1
+
+    threads = [
+        threading.Thread(target=worker, args=(n,), daemon=True)
+        for n in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = clock() - started
+
+    ordered = sorted(latency for worker in latencies for latency in worker)
+    merged: dict[str, int] = {}
+    for worker in statuses:
+        for status, count in worker.items():
+            merged[status] = merged.get(status, 0) + count
+    # client errors are expected for recorded queries against other data, only count failures
+    errors = sum(c for s, c in merged.items() if not s.isdigit() or int(s) >= 500)
+    return LevelResult(
+        concurrency,
+        len(ordered),
+        errors,
+        round(errors / len(ordered), 4) if ordered else 0.0,
+        round(seconds, 3),
+        round(len(ordered) / seconds, 1) if seconds else 0.0,
+        round(statistics.median(ordered), 6) if ordered else 0.0,
+        round(percentile(ordered, 0.99), 6),
+        round(ordered[-1], 6) if ordered else 0.0,
+        dict(sorted(merged.items())),
+    )
+
+
+def saturation(levels: list[LevelResult]) -> Optional[int]:
+    """
+    The lowest concurrency reaching close to the highest throughput, more concurrency only adds latency.
+    """
+    if not levels:
+        return None
+    best = max(level.requests_per_second for level in levels)
+    return min(
+        level.concurrency
+        for level in levels
+        if level.requests_per_second >= best * (1 - SATURATION_TOLERANCE)
+    )
+
+
+def parse_levels(value: str) -> list[int]:
+    try:
+        levels = sorted({int(level) for level in value.split(",") if level.strip()})
+    except ValueError:
+        levels = []
+    if not levels or levels[0] < 1:
+        raise argparse.ArgumentTypeError(
+            "Concurrency must be a comma separated list of positive integers."
+        )
+    return levels
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--url",
+        help="Server to load, e.g. http://localhost:8080, the app in-process if unset",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=parse_levels,
+        default=[1, 2, 4, 8, 16, 32],
+        help="Comma separated numbers of concurrent clients",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Seconds per concurrency level"
+    )
+    parser.add_argument(
+        "--workload",
+        help="JSON lines file recorded through VQE_WORKLOAD_FILE to replay",
+    )
+    parser.add_argument(
+        "--no-payloads",
+        action="store_true",
+        help="Only replay the workload, not the documented example payloads",
+    )
+    parser.add_argument(
+        "--label", help="Stored with the results, e.g. the worker and pool settings"
+    )
+    parser.add_argument(
+        "--output", help="Write the results to this file instead of stdout"
+    )
+    args = parser.parse_args(argv)
+
+    paths = [] if args.no_payloads else payload_paths()
+    if args.workload:
+        from dal.workload import load_workload
+
+        paths += workload_paths(load_workload(args.workload))
+    if not paths:
+        parser.error("No requests to send, pass --workload or drop --no-payloads")
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        from flask_server import app
+
+        target = InProcessTarget(app)
+
+    levels = []
+    for concurrency in args.concurrency:
+        level = run_level(target.get, paths, concurrency, args.duration)
+        logging.info(
+            f"{concurrency} clients: {level.requests_per_second} req/s,"
+            f" p50 {level.p50_seconds * 1000:.1f}ms, p99 {level.p99_seconds * 1000:.1f}ms,"
+            f" {level.error_rate:.2%} errors"
+        )
+        levels.append(level)
+
+    report = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        "duration": args.duration,
+        "requests": len(paths),
+        "saturation_concurrency": saturation(levels),
+        "levels": [level._asdict() for level in levels],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(f"{output}\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
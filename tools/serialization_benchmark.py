@@ -0,0 +1,229 @@
+"""
+Compares serializing query results as row dicts through the Flask JSON provider with writing their tuples directly.
+
+Rows are synthetic vehicles with the types the database returns, Decimal for the decimal columns. Both ways must
+write the same bytes, the benchmark fails otherwise. The response formats are compared by their size and the time
+to write and to decode them. No database is needed.
+
+    python -m tools.serialization_benchmark --rows 100,10000,100000 --runs 5
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, NamedTuple, Optional
+
+import flask
+
+from dal.rows import Rows
+from helpers.serialization_helper import (
+    DEFAULT_SEPARATORS,
+    RowEncoder,
+    arrow_body,
+    json_response,
+    msgpack,
+    msgpack_body,
+    pa,
+)
+from tools.synthetic_data import VEHICLES, Numeric, generate, load_distribution
+
+PATHS = ["response", "stream"]
+
+
+class SerializationResult(NamedTuple):
+    path: str
+    rows: int
+    bytes: int
+    dicts_seconds: float
+    tuples_seconds: float
+
+    @property
+    def speedup(self) -> float:
+        return self.dicts_seconds / self.tuples_seconds if self.tuples_seconds else 0.0
+
+
+class FormatResult(NamedTuple):
+    format: str
+    rows: int
+    bytes: int
+    encode_seconds: float
+    decode_seconds: float
+
+
+def formats() -> dict[str, tuple[Callable[[dict], bytes], Callable[[bytes], Any]]]:
+    """
+    Writer of a response body and the client's decoder by format, of the formats that are installed.
+    """
+    provider = flask.current_app.json
+    writers = {
+        "json": (
+            lambda body: json_response(body).data,
+            json.loads,
+        ),
+        "json-columnar": (
+            lambda body: json_response(body, columnar=True).data,
+            json.loads,
+        ),
+    }
+    if msgpack:
+        writers["msgpack"] = (msgpack_body, msgpack.unpackb)
+        writers["msgpack-columnar"] = (
+            lambda body: msgpack_body(body, columnar=True),
+            msgpack.unpackb,
+        )
+    if pa:
+        writers["arrow"] = (
+            lambda body: arrow_body(body, provider),
+            lambda data: pa.ipc.open_stream(data).read_all(),
+        )
+    return writers
+
+
+def parse_rows(value: str) -> list[int]:
+    try:
+        rows = sorted({int(r) for r in value.split(",") if r.strip()})
+    except ValueError:
+        rows = []
+    if not rows or rows[0] < 1:
+        raise argparse.ArgumentTypeError(
+            "Rows must be a comma separated list of positive integers."
+        )
+    return rows
+
+
+def synthetic_rows(vehicle: str, count: int, seed: int = 0) -> Rows:
+    """
+    count synthetic vehicles as the database returns them, with their primary key.
+    """
+    distribution = load_distribution(VEHICLES[vehicle])
+    decimals = {
+        name
+        for name, spec in distribution.fields.items()
+        if isinstance(spec, Numeric) and spec.places > 0
+    }
+    records = list(generate(distribution, count, seed))
+    columns = tuple(records[0]) if records else ()
+    data = [
+        (i + 1,) + tuple(Decimal(str(r[c])) if c in decimals else r[c] for c in columns)
+        for i, r in enumerate(records)
+    ]
+    return Rows((f"{vehicle.lower()}_id",) + columns, data)
+
+
+def serialize_dicts(path: str, rows: Rows) -> bytes:
+    if path == "stream":
+        dumps = flask.current_app.json.dumps
+        return "".join(f"{dumps(row)}\n" for row in rows).encode()
+    return flask.make_response({"results": list(rows), "count": len(rows)}).data
+
+
+def serialize_tuples(path: str, rows: Rows) -> bytes:
+    if path == "stream":
+        encoder = RowEncoder(rows.columns, flask.current_app.json, DEFAULT_SEPARATORS)
+        return (encoder.encode_all(rows.data, "\n") + "\n").encode()
+    return json_response({"results": rows, "count": len(rows)}).data
+
+
+def best_seconds(serialize: Callable[[], bytes], runs: int) -> float:
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        serialize()
+        seconds.append(time.perf_counter() - started)
+    return min(seconds)
+
+
+def measure(path: str, rows: Rows, runs: int) -> SerializationResult:
+    expected = serialize_dicts(path, rows)
+    if serialize_tuples(path, rows) != expected:
+        raise AssertionError(f"The {path} bodies of {len(rows)} rows differ")
+
+    return SerializationResult(
+        path,
+        len(rows),
+        len(expected),
+        round(best_seconds(lambda: serialize_dicts(path, rows), runs), 4),
+        round(best_seconds(lambda: serialize_tuples(path, rows), runs), 4),
+    )
+
+
+def measure_format(name: str, rows: Rows, runs: int) -> FormatResult:
+    write, decode = formats()[name]
+    body = {"results": rows, "count": len(rows)}
+    data = write(body)
+
+    return FormatResult(
+        name,
+        len(rows),
+        len(data),
+        round(best_seconds(lambda: write(body), runs), 4),
+        round(best_seconds(lambda: decode(data), runs), 4),
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--vehicle", choices=sorted(VEHICLES), default="Car")
+    parser.add_argument(
+        "--rows",
+        type=parse_rows,
+        default=[100, 10000, 100000],
+        help="Comma separated numbers of rows per result",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Runs per size, the best counts"
+    )
+    parser.add_argument(
+        "--label", help="Stored with the results, e.g. the Python version"
+    )
+    parser.add_argument(
+        "--output", help="Write the results to this file instead of stdout"
+    )
+    args = parser.parse_args(argv)
+
+    report = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "vehicle": args.vehicle,
+        "results": [],
+        "formats": [],
+    }
+    app = flask.Flask(__name__)
+    with app.app_context():
+        for count in args.rows:
+            rows = synthetic_rows(args.vehicle, count)
+            for path in PATHS:
+                result = measure(path, rows, args.runs)
+                logging.info(
+                    f"{count} rows {path}: dicts {result.dicts_seconds * 1000:.1f}ms,"
+                    f" tuples {result.tuples_seconds * 1000:.1f}ms, {result.speedup:.1f}x"
+                )
+                report["results"].append(
+                    {**result._asdict(), "speedup": round(result.speedup, 2)}
+                )
+            for name in formats():
+                result = measure_format(name, rows, args.runs)
+                logging.info(
+                    f"{count} rows as {name}: {result.bytes} bytes,"
+                    f" encode {result.encode_seconds * 1000:.1f}ms,"
+                    f" decode {result.decode_seconds * 1000:.1f}ms"
+                )
+                report["formats"].append(result._asdict())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(f"{output}\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Measures how long workers take to boot and serve their first query, started cold or forked from a preloaded app.
+
+A cold worker starts a new interpreter, imports the app, which checks the schema, and serves a query, like a
+gunicorn worker without --preload. A forked worker is forked from this process after it imported the app once,
+like a worker of `gunicorn --preload`, and only opens its own database connections.
+
+    python -m tools.startup_benchmark --workers 1,2,4,8 --runs 3
+
+Workers of a level boot at the same time. The boot time of forked workers should not grow with their number.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+FIRST_REQUEST = "/api/v1/vehicles/cars?limit=1"
+MODES = ["cold", "forked"]
+
+COLD_WORKER = f"""
+import time
+from flask_server import app
+status = app.test_client().get({FIRST_REQUEST!r}).status_code
+print(time.time() if status == 200 else "", flush=True)
+"""
+
+
+class BootResult(NamedTuple):
+    mode: str
+    workers: int
+    runs: int
+    failed: int
+    median_seconds: float
+    max_seconds: float
+
+
+def parse_workers(value: str) -> list[int]:
+    try:
+        workers = sorted({int(w) for w in value.split(",") if w.strip()})
+    except ValueError:
+        workers = []
+    if not workers or workers[0] < 1:
+        raise argparse.ArgumentTypeError(
+            "Workers must be a comma separated list of positive integers."
+        )
+    return workers
+
+
+def boot_cold(workers: int) -> list[Optional[float]]:
+    """
+    Seconds until every new interpreter served its first query, None for the ones that failed.
+    """
+    started = time.time()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", COLD_WORKER],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    seconds = []
+    for process in processes:
+        output = process.communicate()[0].strip().splitlines()
+        ready = output[-1] if output and process.returncode == 0 else ""
+        seconds.append(float(ready) - started if ready else None)
+    return seconds
+
+
+def boot_forked(app, workers: int) -> list[Optional[float]]:
+    """
+    Seconds until every process forked from this one served its first query, None for the ones that failed.
+    """
+    started = time.time()
+    children = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            status = 500
+            try:
+                status = app.test_client().get(FIRST_REQUEST).status_code
+            finally:
+                os.write(write, str(time.time() if status == 200 else "").encode())
+                os._exit(0)
+        os.close(write)
+        children.append((pid, read))
+
+    seconds = []
+    for pid, read in children:
+        with os.fdopen(read) as f:
+            ready = f.read().strip()
+        os.waitpid(pid, 0)
+        seconds.append(float(ready) - started if ready else None)
+    return seconds
+
+
+def summarize(mode: str, workers: int, runs: list[list[Optional[float]]]) -> BootResult:
+    seconds = sorted(s for run in runs for s in run if s is not None)
+    failed = sum(1 for run in runs for s in run if s is None)
+    return BootResult(
+        mode,
+        workers,
+        len(runs),
+        failed,
+        round(statistics.median(seconds), 4) if seconds else 0.0,
+        round(seconds[-1], 4) if seconds else 0.0,
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--workers",
+        type=parse_workers,
+        default=[1, 2, 4],
+        help="Comma separated numbers of workers booted at the same time",
+    )
+    parser.add_argument(
+        "--modes",
+        type=lambda v: v.split(","),
+        default=MODES,
+        help=f"Comma separated ways to start workers, of {', '.join(MODES)}",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Boots per level")
+    parser.add_argument(
+        "--label", help="Stored with the results, e.g. the worker settings"
+    )
+    parser.add_argument(
+        "--output", help="Write the results to this file instead of stdout"
+    )
+    args = parser.parse_args(argv)
+    if set(args.modes) - set(MODES):
+        parser.error(f"--modes must be a comma separated list of {', '.join(MODES)}")
+
+    report = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "request": FIRST_REQUEST,
+        "preload_seconds": None,
+        "results": [],
+    }
+    if "forked" in args.modes:
+        started = time.perf_counter()
+        from flask_server import app
+
+        report["preload_seconds"] = round(time.perf_counter() - started, 4)
+
+    for mode in args.modes:
+        for workers in args.workers:
+            if mode == "cold":
+                runs = [boot_cold(workers) for _ in range(args.runs)]
+            else:
+                runs = [boot_forked(app, workers) for _ in range(args.runs)]
+            result = summarize(mode, workers, runs)
+            logging.info(
+                f"{workers} {mode} workers: median {result.median_seconds * 1000:.0f}ms,"
+                f" max {result.max_seconds * 1000:.0f}ms, {result.failed} failed"
+            )
+            report["results"].append(result._asdict())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(f"{output}\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
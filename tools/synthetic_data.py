@@ -0,0 +1,154 @@
+"""
+Generates any number of synthetic vehicles shaped like the sample data, for benchmarks and load tests.
+
+Text fields and manufacturer/model pairs are drawn with the frequencies they have in `sample_data/*.json`,
+numeric fields uniformly between the smallest and largest sample value with the same precision. The same
+seed always generates the same vehicles.
+
+    python -m tools.synthetic_data Car 1000000 --output cars.ndjson.gz
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+
+from collections import Counter
+from decimal import Decimal
+from typing import Iterator, NamedTuple, Optional
+
+from dal.ingestion import record_fields
+from dal.models.base import Base
+from dal.models.facts import Bike, Car, Spaceship
+
+VEHICLES: dict[str, type[Base]] = {cls.__name__: cls for cls in [Car, Bike, Spaceship]}
+SAMPLE_FILES: dict[type[Base], str] = {
+    Car: "cars.json",
+    Bike: "bikes.json",
+    Spaceship: "spaceships.json",
+}
+SAMPLE_DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_data"
+)
+
+
+class Categorical(NamedTuple):
+    values: list
+    weights: list[int]
+
+
+class Numeric(NamedTuple):
+    low: Decimal
+    high: Decimal
+    # digits after the decimal point, 0 for integers
+    places: int
+
+
+class Distribution(NamedTuple):
+    cls: type[Base]
+    # (manufacturer, model) pairs, drawn together so models keep their manufacturer
+    dimensions: Categorical
+    fields: dict[str, object]
+
+    def common_values(self, field: str, count: int = 1) -> list:
+        """
+        Typical values of field, the most frequent texts or points spread over a numeric range.
+        """
+        if field in (self.manufacturer_field, "model"):
+            index = 0 if field == self.manufacturer_field else 1
+            values = [pair[index] for pair in self.dimensions.values]
+            return list(dict.fromkeys(values))[:count]
+
+        spec = self.fields[field]
+        if isinstance(spec, Categorical):
+            return spec.values[:count]
+        step = (spec.high - spec.low) / (count + 1)
+        values = [round(spec.low + step * (i + 1), spec.places) for i in range(count)]
+        return [int(v) if spec.places == 0 else float(v) for v in values]
+
+    @property
+    def manufacturer_field(self) -> str:
+        return record_fields(self.cls)[0][0]
+
+
+def load_distribution(cls: type[Base], path: Optional[str] = None) -> Distribution:
+    path = path or os.path.join(SAMPLE_DATA_PATH, SAMPLE_FILES[cls])
+    with open(path, encoding="utf-8") as f:
+        # first item in list is schema description
+        samples = json.load(f, parse_float=Decimal)[1:]
+
+    fields = {}
+    for name, model, column in record_fields(cls):
+        if model is not cls:
+            continue
+        values = [s[name] for s in samples]
+        if model.column_types[column] is str:
+            fields[name] = categorical(values)
+        else:
+            places = max(
+                -v.as_tuple().exponent if isinstance(v, Decimal) else 0 for v in values
+            )
+            fields[name] = Numeric(Decimal(min(values)), Decimal(max(values)), places)
+
+    manufacturer = record_fields(cls)[0][0]
+    dimensions = categorical([(s[manufacturer], s["model"]) for s in samples])
+    return Distribution(cls, dimensions, fields)
+
+
+def categorical(values: list) -> Categorical:
+    # most frequent first, ties in order of appearance
+    counts = Counter(values)
+    ordered = sorted(counts, key=lambda v: -counts[v])
+    return Categorical(ordered, [counts[v] for v in ordered])
+
+
+def generate(distribution: Distribution, count: int, seed: int = 0) -> Iterator[dict]:
+    """
+    Yields count vehicles as they would be posted to the bulk load endpoint.
+    """
+    rng = random.Random(f"{distribution.cls.__name__}:{seed}")
+    manufacturer = distribution.manufacturer_field
+    dimensions = distribution.dimensions
+    for _ in range(count):
+        make, model = rng.choices(dimensions.values, dimensions.weights)[0]
+        record = {manufacturer: make, "model": model}
+        for name, spec in distribution.fields.items():
+            if isinstance(spec, Categorical):
+                record[name] = rng.choices(spec.values, spec.weights)[0]
+            elif spec.places == 0:
+                record[name] = rng.randint(int(spec.low), int(spec.high))
+            else:
+                scale = 10**spec.places
+                value = rng.randint(int(spec.low * scale), int(spec.high * scale))
+                record[name] = value / scale
+        yield record
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("vehicle", choices=sorted(VEHICLES))
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="NDJSON file to write, gzip compressed when it ends in .gz"
+    )
+    args = parser.parse_args(argv)
+
+    distribution = load_distribution(VEHICLES[args.vehicle])
+    records = generate(distribution, args.count, args.seed)
+    if not args.output:
+        for record in records:
+            print(json.dumps(record))
+        return 0
+
+    opener = gzip.open if args.output.endswith(".gz") else open
+    with opener(args.output, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(f"{json.dumps(record)}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())